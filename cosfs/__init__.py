@@ -1,2 +1,3 @@
 from .core import COSFileSystem
 from .core import COSFile
+from .exceptions import ChecksumMismatch, FileExpired
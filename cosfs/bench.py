@@ -0,0 +1,406 @@
+"""Throughput and latency benchmark for ``COSFileSystem``.
+
+Runs a set of workloads through the public filesystem API against any COS
+endpoint (or the emulator in ``cosfs.emulator``) and prints the results
+as JSON::
+
+    python -m cosfs.bench mybucket-1250000000/bench --concurrency 1,8,32 \\
+        --part-size 8MiB,32MiB --block-size 5MiB
+
+Every combination of ``--concurrency``, ``--part-size`` and
+``--block-size`` is run against its own scratch prefix, which is removed
+afterwards unless ``--keep`` is given, through a filesystem whose
+``max_concurrency`` and connection pool match the concurrency.  Each result reports the number of
+operations and bytes moved, ``ops_per_sec``, ``mb_per_sec`` (10**6 bytes)
+and the p50/p99/mean/max latency of a single operation in milliseconds.
+
+Workloads
+---------
+``small-put`` / ``small-get``
+    ``pipe_file`` / ``cat_file`` of ``--small-count`` objects of
+    ``--small-size`` bytes.
+``seq-write`` / ``seq-read``
+    One streaming ``open(..., "wb"/"rb")`` of ``--large-size`` bytes per
+    worker, using ``--part-size`` / ``--block-size``.
+``random-read``
+    ``--range-count`` reads of ``--range-size`` bytes at random offsets of
+    the large objects through files opened with ``--block-size``.
+``deep-list``
+    Recursive ``find`` of a tree ``--tree-depth`` levels deep with
+    ``--tree-fanout`` sub-directories and ``--tree-files`` objects per leaf.
+``bulk-delete``
+    ``rm`` of the small objects, split evenly between the workers; latency
+    is per ``rm`` call, ``ops`` counts objects.
+
+Workloads whose inputs were not produced by an earlier selected workload
+create them first, outside of the timed section.
+
+Failed operations are counted in ``errors`` and the first failure of each
+exception type per workload is logged; the command exits with status 1
+when any operation failed.
+"""
+import argparse
+import itertools
+import json
+import logging
+import os
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from .core import COSFileSystem
+
+logger = logging.getLogger("cosfs")
+
+WORKLOADS = ("small-put", "small-get", "seq-write", "seq-read", "random-read", "deep-list", "bulk-delete")
+
+_SIZE_UNITS = {"": 1, "K": 2 ** 10, "M": 2 ** 20, "G": 2 ** 30, "T": 2 ** 40}
+_SIZE_RE = re.compile(r"^\s*(\d+(?:\.\d+)?)\s*([KMGT]?)(?:I?B)?\s*$", re.IGNORECASE)
+
+# Chunk size used by the streaming reads and writes.
+_IO_CHUNK = 2 ** 20
+
+
+def parse_size(text):
+    """Parse a byte count such as ``4096``, ``64KiB``, ``8M`` or ``1GB`` (binary units)."""
+    match = _SIZE_RE.match(str(text))
+    if not match:
+        raise ValueError(f"invalid size: {text!r}")
+    number, unit = match.groups()
+    return int(float(number) * _SIZE_UNITS[unit.upper()])
+
+
+def _csv(convert):
+    def parse(text):
+        try:
+            return [convert(item) for item in text.split(",") if item.strip()]
+        except ValueError as e:
+            raise argparse.ArgumentTypeError(str(e)) from e
+    return parse
+
+
+def _percentile(ordered, q):
+    """Nearest-rank percentile of an already sorted list."""
+    if not ordered:
+        return None
+    rank = max(1, -(-len(ordered) * q // 100))
+    return ordered[int(rank) - 1]
+
+
+class _Recorder:
+    """Collect per-operation latencies for one workload run."""
+
+    def __init__(self, workload=None):
+        self.workload = workload
+        self.latencies = []
+        self.ops = 0
+        self.bytes = 0
+        self.errors = 0
+        self._seen = set()
+        self._lock = threading.Lock()
+
+    def timed(self, func, *args, nbytes=0, ops=1, **kwargs):
+        start = time.perf_counter()
+        try:
+            out = func(*args, **kwargs)
+        except Exception as e:  # pylint: disable=broad-except
+            with self._lock:
+                self.errors += 1
+                first = type(e) not in self._seen
+                self._seen.add(type(e))
+            if first:
+                logger.warning("%s: %s failed: %r", self.workload, getattr(func, "__name__", func), e,
+                               exc_info=True)
+            return None
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            self.latencies.append(elapsed)
+            self.ops += ops
+            self.bytes += nbytes(out) if callable(nbytes) else nbytes
+        return out
+
+    def result(self, workload, seconds, **params):
+        ordered = sorted(self.latencies)
+        ms = [None if v is None else round(v * 1000, 3) for v in (
+            _percentile(ordered, 50), _percentile(ordered, 99),
+            sum(ordered) / len(ordered) if ordered else None, ordered[-1] if ordered else None)]
+        return dict(
+            workload=workload, **params,
+            ops=self.ops, bytes=self.bytes, errors=self.errors, seconds=round(seconds, 6),
+            ops_per_sec=round(self.ops / seconds, 3) if seconds else None,
+            mb_per_sec=round(self.bytes / seconds / 1e6, 3) if seconds else None,
+            latency_ms=dict(zip(("p50", "p99", "mean", "max"), ms)),
+        )
+
+
+class Benchmark:
+    """Run the selected workloads for one (concurrency, part size, block size) point."""
+
+    def __init__(self, fs, root, args, concurrency, part_size, block_size):
+        self.fs = fs
+        self.root = root.rstrip("/")
+        self.args = args
+        self.concurrency = concurrency
+        self.part_size = part_size
+        self.block_size = block_size
+        self.rng = random.Random(args.seed)
+        self.small_paths = None
+        self.large_paths = None
+        self.tree = None
+
+    @property
+    def params(self):
+        return dict(concurrency=self.concurrency, part_size=self.part_size, block_size=self.block_size)
+
+    def _run(self, workload, tasks):
+        """Run ``(func, args, kwargs)`` *tasks* on the worker pool and time the whole batch."""
+        recorder = _Recorder(workload)
+        start = time.perf_counter()
+        with ThreadPoolExecutor(self.concurrency) as pool:
+            for future in [pool.submit(func, recorder, *a, **kw) for func, a, kw in tasks]:
+                future.result()
+        seconds = time.perf_counter() - start
+        self.fs.invalidate_cache()
+        return recorder.result(workload, seconds, **self.params)
+
+    def _untimed(self, tasks):
+        errors = self._run("setup", tasks)["errors"]
+        if errors:
+            raise RuntimeError(f"{errors} setup operation(s) failed")
+
+    # -- inputs ---------------------------------------------------------
+
+    def _small_tasks(self):
+        self.small_paths = [f"{self.root}/small/{i:08d}" for i in range(self.args.small_count)]
+        payload = os.urandom(self.args.small_size)
+        return [(self._put, (path, payload), {}) for path in self.small_paths]
+
+    def _large_tasks(self):
+        self.large_paths = [f"{self.root}/large/{i:04d}" for i in range(self.concurrency)]
+        return [(self._write_stream, (path,), {}) for path in self.large_paths]
+
+    def _ensure_small(self):
+        if self.small_paths is None:
+            self._untimed(self._small_tasks())
+
+    def _ensure_large(self):
+        if self.large_paths is None:
+            self._untimed(self._large_tasks())
+
+    # -- operations -----------------------------------------------------
+
+    def _put(self, recorder, path, payload):
+        recorder.timed(self.fs.pipe_file, path, payload, block_size=self.part_size, nbytes=len(payload))
+
+    def _get(self, recorder, path):
+        recorder.timed(self.fs.cat_file, path, nbytes=len)
+
+    def _write_stream(self, recorder, path):
+        def write():
+            chunk = os.urandom(min(_IO_CHUNK, self.args.large_size) or 1)
+            remaining = self.args.large_size
+            with self.fs.open(path, "wb", block_size=self.part_size) as f:
+                while remaining > 0:
+                    remaining -= f.write(chunk[:remaining])
+        recorder.timed(write, nbytes=self.args.large_size)
+
+    def _read_stream(self, recorder, path):
+        def read():
+            total = 0
+            with self.fs.open(path, "rb", block_size=self.block_size) as f:
+                while True:
+                    data = f.read(_IO_CHUNK)
+                    if not data:
+                        return total
+                    total += len(data)
+        recorder.timed(read, nbytes=lambda n: n or 0)
+
+    def _read_ranges(self, recorder, path, offsets):
+        with self.fs.open(path, "rb", block_size=self.block_size) as f:
+            for offset in offsets:
+                f.seek(offset)
+                recorder.timed(f.read, self.args.range_size, nbytes=len)
+
+    def _find(self, recorder, path):
+        self.fs.invalidate_cache()
+        recorder.timed(self.fs.find, path, ops=1)
+
+    def _rm(self, recorder, paths):
+        recorder.timed(self.fs.rm, paths, ops=len(paths))
+
+    # -- workloads ------------------------------------------------------
+
+    def small_put(self):
+        return self._run("small-put", self._small_tasks())
+
+    def small_get(self):
+        self._ensure_small()
+        return self._run("small-get", [(self._get, (path,), {}) for path in self.small_paths])
+
+    def seq_write(self):
+        return self._run("seq-write", self._large_tasks())
+
+    def seq_read(self):
+        self._ensure_large()
+        return self._run("seq-read", [(self._read_stream, (path,), {}) for path in self.large_paths])
+
+    def random_read(self):
+        self._ensure_large()
+        span = max(self.args.large_size - self.args.range_size, 0)
+        per_file = [[] for _ in self.large_paths]
+        for i in range(self.args.range_count):
+            per_file[i % len(per_file)].append(self.rng.randint(0, span))
+        return self._run("random-read", [
+            (self._read_ranges, (path, offsets), {}) for path, offsets in zip(self.large_paths, per_file)
+        ])
+
+    def deep_list(self):
+        if self.tree is None:
+            self.tree = f"{self.root}/tree"
+            levels = [[f"d{i}" for i in range(self.args.tree_fanout)]] * self.args.tree_depth
+            leaves = ["/".join(parts) for parts in itertools.product(*levels)]
+            self._untimed([
+                (self._put, (f"{self.tree}/{leaf}/f{j:04d}", b"x"), {})
+                for leaf in leaves for j in range(self.args.tree_files)
+            ])
+        return self._run("deep-list", [(self._find, (self.tree,), {}) for _ in range(self.args.list_repeat)])
+
+    def bulk_delete(self):
+        self._ensure_small()
+        chunks = [self.small_paths[i::self.concurrency] for i in range(self.concurrency)]
+        result = self._run("bulk-delete", [(self._rm, (chunk,), {}) for chunk in chunks if chunk])
+        self.small_paths = None
+        return result
+
+    def run(self, workloads):
+        return [getattr(self, name.replace("-", "_"))() for name in workloads]
+
+    def cleanup(self):
+        try:
+            self.fs.rm(self.root, recursive=True)
+        except FileNotFoundError:
+            pass
+
+
+def _start_emulator(bucket, args):
+    """Start the in-process HTTP emulator of ``cosfs.emulator``."""
+    from .emulator import MockCosClient, serve_http
+
+    client = MockCosClient(buckets={bucket}, latency=args.emulator_latency, bandwidth=args.emulator_bandwidth)
+    return serve_http(client)
+
+
+def _target(args, bucket):
+    """``COSFileSystem`` keyword arguments for the target, and the emulator serving it (if any)."""
+    config_kwargs = {}
+    if args.endpoint:
+        config_kwargs["Endpoint"] = args.endpoint
+    if args.scheme:
+        config_kwargs["Scheme"] = args.scheme
+    if args.proxy:
+        config_kwargs["Proxies"] = {"http": args.proxy, "https": args.proxy}
+    server = None
+    credentials = dict(secret_id=args.secret_id, secret_key=args.secret_key, token=args.token, region=args.region)
+    if args.emulator:
+        server = _start_emulator(bucket, args)
+        emulated = server.cos_config_kwargs(args.region or "ap-guangzhou")
+        credentials = dict(secret_id=emulated.pop("SecretId"), secret_key=emulated.pop("SecretKey"),
+                           token=None, region=emulated.pop("Region"))
+        config_kwargs.update(emulated)
+    fs_kwargs = dict(config_kwargs=config_kwargs, skip_instance_cache=True,
+                     **{k: v for k, v in credentials.items() if v is not None})
+    return fs_kwargs, server
+
+
+def _make_fs(fs_kwargs, concurrency):
+    """A filesystem sized for *concurrency*: as many SDK workers, and a connection for each caller and worker."""
+    return COSFileSystem(max_concurrency=concurrency, pool_size=2 * concurrency, **fs_kwargs)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="python -m cosfs.bench", description=__doc__.split("\n\n")[0])
+    parser.add_argument("path", help="bucket/prefix to run under; a unique scratch prefix is created below it")
+    parser.add_argument("--workload", type=_csv(str), default=list(WORKLOADS),
+                        help=f"comma separated subset of: {', '.join(WORKLOADS)}")
+    parser.add_argument("--concurrency", type=_csv(int), default=[1], help="worker threads, e.g. 1,8,32")
+    parser.add_argument("--part-size", type=_csv(parse_size), default=[8 * 2 ** 20], help="write part size(s)")
+    parser.add_argument("--block-size", type=_csv(parse_size), default=[5 * 2 ** 20], help="read block size(s)")
+    parser.add_argument("--small-size", type=parse_size, default=16 * 2 ** 10)
+    parser.add_argument("--small-count", type=int, default=200)
+    parser.add_argument("--large-size", type=parse_size, default=64 * 2 ** 20, help="bytes per seq-write worker")
+    parser.add_argument("--range-size", type=parse_size, default=64 * 2 ** 10)
+    parser.add_argument("--range-count", type=int, default=100)
+    parser.add_argument("--tree-depth", type=int, default=3)
+    parser.add_argument("--tree-fanout", type=int, default=4)
+    parser.add_argument("--tree-files", type=int, default=8)
+    parser.add_argument("--list-repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0, help="seed for the random-read offsets")
+    parser.add_argument("--keep", action="store_true", help="do not delete the scratch prefix")
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+
+    target = parser.add_argument_group("target")
+    target.add_argument("--region")
+    target.add_argument("--secret-id")
+    target.add_argument("--secret-key")
+    target.add_argument("--token")
+    target.add_argument("--endpoint", help="custom COS endpoint (CosConfig Endpoint)")
+    target.add_argument("--scheme", choices=("http", "https"))
+    target.add_argument("--proxy", help="HTTP proxy URL, e.g. an emulator started with 'python -m cosfs.emulator'")
+    target.add_argument("--emulator", action="store_true", help="run against an in-process COS emulator")
+    target.add_argument("--emulator-latency", type=float, default=0.0, help="emulated per-request latency (s)")
+    target.add_argument("--emulator-bandwidth", type=parse_size, default=None,
+                        help="emulated per-request bandwidth (bytes/s)")
+    return parser
+
+
+def run(args):
+    """Run the benchmark described by parsed *args* and return the JSON report as a dict."""
+    unknown = [name for name in args.workload if name not in WORKLOADS]
+    if unknown:
+        raise SystemExit(f"unknown workload(s): {', '.join(unknown)}")
+    workloads = [name for name in WORKLOADS if name in args.workload]
+    bucket = args.path.strip("/").split("/", 1)[0]
+    base = f"{args.path.rstrip('/')}/cosfs-bench-{uuid.uuid4().hex[:8]}"
+
+    fs_kwargs, server = _target(args, bucket)
+    results = []
+    try:
+        points = itertools.product(args.concurrency, args.part_size, args.block_size)
+        for i, (concurrency, part_size, block_size) in enumerate(points):
+            bench = Benchmark(_make_fs(fs_kwargs, concurrency), f"{base}/{i}", args, concurrency, part_size,
+                              block_size)
+            try:
+                results.extend(bench.run(workloads))
+            finally:
+                if not args.keep:
+                    bench.cleanup()
+    finally:
+        if server is not None:
+            server.stop()
+
+    config = {k: v for k, v in vars(args).items() if k not in ("secret_id", "secret_key", "token", "output")}
+    config["prefix"] = base
+    return {"config": config, "results": results}
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    results = run(args)
+    report = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(report + "\n")
+    else:
+        sys.stdout.write(report + "\n")
+    errors = sum(r["errors"] for r in results["results"])
+    if errors:
+        sys.stderr.write(f"{errors} operation(s) failed; see the errors of each result\n")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
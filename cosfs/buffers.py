@@ -0,0 +1,317 @@
+"""Zero-copy part buffers for the write path.
+
+``PartBuffer`` is the write buffer of a ``COSFile``: the subset of
+``io.BytesIO`` that fsspec uses, backed by a ``bytearray`` taken from a
+``BufferPool`` and reused for every part of the file.  Parts are handed to
+the SDK as ``ViewReader`` objects whose reads return ``memoryview`` slices,
+so the HTTP layer sends them straight from the buffer without a copy.
+
+With a ``MemoryBudget`` the bytes held in memory by all the writers of a
+filesystem are bounded: a buffer that cannot reserve more spills to an
+unlinked temporary file and its parts are uploaded from there.  Idle
+buffers kept by the pool are charged to the same budget, and are dropped
+when a writer needs the room.
+
+With ``checksum=True`` a ``PartBuffer`` also keeps the CRC64 of its
+contents up to date as they are written, for upload verification.
+"""
+
+import io
+import tempfile
+import threading
+from typing import List, Optional
+
+from .crc64 import CRC64, crc64
+
+
+class ViewReader:
+    """Read-only, seekable file object over a bytes-like object.
+
+    ``read`` returns ``memoryview`` slices of the original buffer.  The
+    object has ``__len__`` but no ``__iter__``, so ``requests`` sends it
+    with a ``Content-Length`` rather than chunked.
+    """
+
+    def __init__(self, data):
+        self._view = memoryview(data).cast("B")
+        self._pos = 0
+
+    def __len__(self):
+        return len(self._view)
+
+    def read(self, size=-1):
+        end = len(self._view) if size is None or size < 0 else min(self._pos + size, len(self._view))
+        out = self._view[self._pos:end]
+        self._pos = end
+        return out
+
+    def tell(self):
+        return self._pos
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        base = {io.SEEK_SET: 0, io.SEEK_CUR: self._pos, io.SEEK_END: len(self._view)}[whence]
+        self._pos = min(max(base + offset, 0), len(self._view))
+        return self._pos
+
+
+class BufferPool:
+    """Idle ``bytearray`` buffers shared by the writers of one filesystem.
+
+    At most *max_bytes* of idle buffers are kept; ``acquire`` hands out
+    the smallest idle buffer that is large enough.  With a *budget* the
+    idle buffers are reserved from it too: a buffer that does not fit is
+    dropped, and ``trim`` frees idle buffers for a writer.
+    """
+
+    def __init__(self, max_bytes: int = 64 * 2 ** 20, budget: Optional["MemoryBudget"] = None):
+        self.max_bytes = max_bytes
+        self.budget = budget
+        self._free: List[bytearray] = []
+        self._idle = 0
+        self._lock = threading.Lock()
+        self.reused = 0
+        self.allocated = 0
+
+    def acquire(self, size: int) -> bytearray:
+        """A buffer of at least *size* bytes.
+
+        With a budget the caller must hold a reservation of *size*; the
+        rest of a larger pooled buffer stays charged, now to the caller.
+        """
+        with self._lock:
+            fits = [b for b in self._free if len(b) >= size]
+            if fits:
+                buf = min(fits, key=len)
+                self._free.remove(buf)
+                self._idle -= len(buf)
+                self.reused += 1
+                if self.budget is not None:
+                    self.budget.release(size)
+                return buf
+            self.allocated += 1
+        return bytearray(size)
+
+    def release(self, buf: bytearray):
+        """Keep *buf* for reuse if it fits the pool (and the budget, whose reservation it takes)."""
+        with self._lock:
+            if self._idle + len(buf) <= self.max_bytes and (self.budget is None or self.budget.reserve(len(buf))):
+                self._free.append(buf)
+                self._idle += len(buf)
+
+    def trim(self, nbytes: int) -> int:
+        """Drop idle buffers, largest first, until *nbytes* are freed; returns the bytes freed."""
+        freed = 0
+        with self._lock:
+            self._free.sort(key=len)
+            while self._free and freed < nbytes:
+                buf = self._free.pop()
+                freed += len(buf)
+            self._idle -= freed
+            if self.budget is not None:
+                self.budget.release(freed)
+        return freed
+
+    @property
+    def idle_bytes(self) -> int:
+        return self._idle
+
+
+class MemoryBudget:
+    """Byte budget shared by the write buffers of one filesystem."""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.used = 0
+        self.spills = 0
+        self._lock = threading.Lock()
+
+    def reserve(self, nbytes: int) -> bool:
+        """Take *nbytes* from the budget; ``False`` (and nothing taken) if they do not fit."""
+        with self._lock:
+            if self.used + nbytes > self.max_bytes:
+                return False
+            self.used += nbytes
+            return True
+
+    def release(self, nbytes: int):
+        with self._lock:
+            self.used -= nbytes
+
+
+class PartBuffer:
+    """Growable write buffer reused across the parts of a file.
+
+    Capacity doubles from ``initial_size`` but stops at *part_size*, the
+    size at which the file uploads a part.  The backing array is never
+    resized in place (a ``memoryview`` of a previous part may still be
+    alive); growing swaps in a larger array and drops the old one.
+
+    Every array is reserved from *budget* when one is given.  Once a
+    reservation fails the buffer moves to a temporary file in *spill_dir*
+    for the rest of its life, and ``body`` returns that file.
+
+    With *checksum*, sequential writes maintain ``crc``; any other write
+    makes it fall back to reading the contents once.
+    """
+
+    initial_size = 64 * 2 ** 10
+
+    def __init__(self, pool: Optional[BufferPool] = None, part_size: int = 0,
+                 budget: Optional[MemoryBudget] = None, spill_dir: Optional[str] = None, checksum: bool = False):
+        self._pool = pool
+        self._part_size = part_size
+        self._budget = budget
+        self._spill_dir = spill_dir
+        self._data = None
+        self._file = None
+        self._reserved = 0
+        self._pos = 0
+        self._size = 0
+        self._checksum = checksum
+        self._crc: Optional[int] = 0
+        if self._reserve(self.initial_size):
+            self._data = self._acquire(self.initial_size)
+        else:
+            self._spill()
+
+    @property
+    def spilled(self) -> bool:
+        return self._file is not None
+
+    def write(self, data) -> int:
+        view = memoryview(data).cast("B")
+        end = self._pos + len(view)
+        if self._checksum:
+            self._crc = crc64(view, self._crc) if self._crc is not None and self._pos == self._size else None
+        if self._data is not None and end > len(self._data):
+            self._grow(end)
+        if self._file is not None:
+            self._file.seek(self._pos)
+            self._file.write(view)
+        else:
+            if self._pos > self._size:
+                # A seek past the end leaves a gap, which must read as zeros
+                # (as in a file) rather than whatever a reused array held.
+                self._data[self._size:self._pos] = bytes(self._pos - self._size)
+            self._data[self._pos:end] = view
+        self._pos = end
+        self._size = max(self._size, end)
+        return len(view)
+
+    def _reserve(self, size: int) -> bool:
+        if self._budget is None:
+            return True
+        if self._budget.reserve(size):
+            return True
+        # Idle pooled buffers may be what fills the budget.
+        return self._pool is not None and self._pool.trim(size) > 0 and self._budget.reserve(size)
+
+    def _acquire(self, size: int) -> bytearray:
+        data = self._pool.acquire(size) if self._pool is not None else bytearray(size)
+        if self._budget is not None:
+            # A larger pooled buffer brings its remaining charge along.
+            self._reserved += len(data) if self._pool is not None and self._pool.budget is self._budget else size
+        return data
+
+    def _grow(self, needed: int):
+        capacity = 2 * len(self._data)
+        if self._part_size:
+            capacity = min(capacity, self._part_size)
+        capacity = max(capacity, needed)
+        if not self._reserve(capacity):
+            self._spill()
+            return
+        old, reserved = self._data, self._reserved
+        self._reserved = 0
+        self._data = self._acquire(capacity)
+        self._data[:self._size] = memoryview(old)[:self._size]
+        if self._budget is not None:
+            self._budget.release(reserved)
+
+    def _spill(self):
+        """Move the contents to a temporary file and give the memory back."""
+        self._file = tempfile.TemporaryFile(prefix="cosfs-part-", dir=self._spill_dir)
+        if self._budget is not None:
+            self._budget.spills += 1
+        if self._data is not None:
+            self._file.write(memoryview(self._data)[:self._size])
+            self._release()
+            self._data = None
+
+    def tell(self) -> int:
+        return self._pos
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        base = {io.SEEK_SET: 0, io.SEEK_CUR: self._pos, io.SEEK_END: self._size}[whence]
+        self._pos = max(base + offset, 0)
+        return self._pos
+
+    def truncate(self, size: Optional[int] = None) -> int:
+        size = min(self._size, self._pos if size is None else size)
+        if size < self._size:
+            self._crc = 0 if size == 0 else None
+        self._size = size
+        if self._file is not None:
+            self._file.truncate(self._size)
+        return self._size
+
+    def body(self):
+        """The written bytes as an upload body, without copying them.
+
+        A ``memoryview`` of the array, or the spill file rewound to its start.
+        """
+        if self._file is not None:
+            self._file.flush()
+            self._file.seek(0)
+            return self._file
+        return memoryview(self._data)[:self._size]
+
+    @property
+    def crc(self) -> int:
+        """CRC64-ECMA of the contents."""
+        if self._crc is None or not self._checksum:
+            running = CRC64()
+            body = self.body()
+            if self._file is None:
+                running.update(body)
+            else:
+                for chunk in iter(lambda: body.read(2 ** 20), b""):
+                    running.update(chunk)
+            self._crc = running.crc
+        return self._crc
+
+    def getvalue(self) -> bytes:
+        if self._file is not None:
+            return self.body().read()
+        return bytes(self.body())
+
+    def clear(self):
+        """Forget the contents, keeping the array (or spill file) for the next part."""
+        self._pos = self._size = 0
+        self._crc = 0
+        if self._file is not None:
+            self._file.seek(0)
+            self._file.truncate()
+
+    def close(self):
+        """Return the backing array to the pool, or delete the spill file."""
+        if self._data is not None:
+            self._release()
+            self._data = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def _release(self):
+        if self._budget is not None:
+            self._budget.release(self._reserved)
+            self._reserved = 0
+        if self._pool is not None:
+            self._pool.release(self._data)
+
+
+def as_body(data):
+    """Wrap a mutable or sliced buffer as a ``ViewReader``; ``bytes`` pass through."""
+    if isinstance(data, (bytearray, memoryview)):
+        return ViewReader(data)
+    return data
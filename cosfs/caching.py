@@ -0,0 +1,558 @@
+"""Read caches shared between ``COSFile`` instances and processes.
+
+``BlockCache`` is a thread-safe, memory-bounded LRU store of object blocks
+keyed by ``(bucket, key, ETag, block number)``.  One instance hangs off a
+``COSFileSystem`` (``block_cache_size=...``) and every file opened for
+reading through that filesystem is served from it via
+``SharedBlockCache``, so reopening a hot object costs no requests.
+
+Keying by ETag means a rewritten object is never served stale once its new
+ETag is known; writes through the filesystem additionally drop the old
+blocks so they do not linger until evicted.
+
+``PartsCache`` serves the byte ranges a columnar prefetch fetched up
+front and hands every other read to a regular cache.
+
+``DiskCache`` is a persistent tier below it (``disk_cache_dir=...``),
+consulted by ``cat_file``, ``fetch_object`` and ``get_file`` before the
+network and shared by every process using the same directory.
+"""
+import bisect
+import contextlib
+import errno
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from fsspec.caching import BaseCache
+
+from .exceptions import FileExpired
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows
+    fcntl = None
+
+logger = logging.getLogger("cosfs")
+
+BlockKey = Tuple[str, str, str, int]
+
+
+class BlockCache:
+    """Thread-safe LRU cache of object blocks.
+
+    Parameters
+    ----------
+    max_bytes : int
+        Upper bound on the cached payload; least recently used blocks are
+        evicted beyond it.
+    block_size : int
+        Size of a cached block.  Fixed per cache so that every file maps
+        offsets to the same block numbers.
+    """
+
+    def __init__(self, max_bytes: int, block_size: int = 4 * 2 ** 20):
+        if block_size <= 0:
+            raise ValueError("block_size must be positive")
+        self.max_bytes = max_bytes
+        self.block_size = block_size
+        self._blocks: "OrderedDict[BlockKey, bytes]" = OrderedDict()
+        self._by_object: Dict[Tuple[str, str], Set[BlockKey]] = {}
+        self._lock = threading.Lock()
+        # Bumped by every invalidation so blocks fetched before it are not stored.
+        self._epoch = 0
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._blocks)
+
+    def get_blocks(self, bucket: str, key: str, etag: str, indices: Iterable[int],
+                   fetch: Callable[[List[int]], List[bytes]]) -> List[bytes]:
+        """Return the blocks *indices* of an object, fetching the missing ones.
+
+        *fetch* receives the missing block numbers and must return their
+        contents in the same order; it runs without holding the lock.
+        """
+        indices = list(indices)
+        found: Dict[int, bytes] = {}
+        with self._lock:
+            for index in indices:
+                data = self._blocks.get((bucket, key, etag, index))
+                if data is not None:
+                    self._blocks.move_to_end((bucket, key, etag, index))
+                    found[index] = data
+            missing = [i for i in indices if i not in found]
+            self.hits += len(found)
+            self.misses += len(missing)
+            epoch = self._epoch
+        if missing:
+            fetched = fetch(missing)
+            found.update(zip(missing, fetched))
+            with self._lock:
+                if epoch != self._epoch:
+                    return [found[i] for i in indices]
+                for index, data in zip(missing, fetched):
+                    self._store((bucket, key, etag, index), data)
+        return [found[i] for i in indices]
+
+    def _store(self, block_key: BlockKey, data: bytes):
+        if len(data) > self.max_bytes or block_key in self._blocks:
+            return
+        self._blocks[block_key] = data
+        self._by_object.setdefault(block_key[:2], set()).add(block_key)
+        self.nbytes += len(data)
+        while self.nbytes > self.max_bytes:
+            self._drop(next(iter(self._blocks)))
+            self.evictions += 1
+
+    def _drop(self, block_key: BlockKey):
+        self.nbytes -= len(self._blocks.pop(block_key))
+        keys = self._by_object[block_key[:2]]
+        keys.discard(block_key)
+        if not keys:
+            del self._by_object[block_key[:2]]
+
+    def invalidate(self, bucket: str, key: str):
+        """Drop every cached block of ``bucket/key``, whatever its ETag."""
+        with self._lock:
+            self._epoch += 1
+            for block_key in list(self._by_object.get((bucket, key), ())):
+                self._drop(block_key)
+
+    def clear(self):
+        with self._lock:
+            self._epoch += 1
+            self._blocks.clear()
+            self._by_object.clear()
+            self.nbytes = 0
+
+    def after_fork(self):
+        """Make the cache usable in a forked child.
+
+        The blocks are kept, unless the fork caught another thread holding
+        the lock mid-update: then the lock is replaced and the cache emptied.
+        """
+        if self._lock.locked():
+            self._lock = threading.Lock()
+            self.clear()
+
+    def stats(self) -> dict:
+        """Counters since creation plus the current occupancy."""
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "blocks": len(self._blocks),
+                "bytes": self.nbytes,
+                "max_bytes": self.max_bytes,
+            }
+
+
+class SharedBlockCache(BaseCache):
+    """fsspec cache adapter reading one object through a shared ``BlockCache``.
+
+    Missing blocks of a single read are fetched together with
+    *fetch_ranges* (``[(start, end), ...] -> [bytes, ...]``).
+    """
+
+    name = "shared"
+
+    def __init__(self, blocksize, fetcher, size, store: Optional[BlockCache] = None, bucket=None, key=None,
+                 etag=None, fetch_ranges=None):
+        super().__init__(store.block_size, fetcher, size)
+        self.store = store
+        self.object_id = (bucket, key, etag)
+        self.fetch_ranges = fetch_ranges or (lambda ranges: [fetcher(s, e) for s, e in ranges])
+
+    def _fetch_blocks(self, indices):
+        bs = self.blocksize
+        return self.fetch_ranges([(i * bs, min((i + 1) * bs, self.size)) for i in indices])
+
+    def _fetch(self, start, stop):
+        if start is None:
+            start = 0
+        if stop is None:
+            stop = self.size
+        stop = min(stop, self.size)
+        if start >= self.size or start >= stop:
+            return b""
+        bs = self.blocksize
+        first, last = start // bs, (stop - 1) // bs
+        blocks = self.store.get_blocks(*self.object_id, range(first, last + 1), self._fetch_blocks)
+        if len(blocks) == 1:
+            return blocks[0][start - first * bs:stop - first * bs]
+        # Trim the edge blocks before joining so only the requested bytes are copied.
+        blocks[0] = blocks[0][start - first * bs:]
+        blocks[-1] = blocks[-1][:stop - last * bs]
+        return b"".join(blocks)
+
+
+class PartsCache(BaseCache):
+    """fsspec cache adapter over known byte ranges of a file, with a fallback cache.
+
+    Like fsspec's ``parts`` cache, except that a read outside the known
+    parts goes to *fallback* (any fsspec cache over the same file) rather
+    than being fetched uncached with a warning.  A read that starts in a
+    part and runs past its end takes the rest from *fallback*.
+
+    *data* maps ``(start, end)`` offsets to bytes; adjacent parts are joined.
+    """
+
+    name = "cosfs-parts"
+
+    def __init__(self, blocksize, fetcher, size, data=None, fallback: Optional[BaseCache] = None):
+        super().__init__(blocksize, fetcher, size)
+        self.fallback = fallback
+        self.starts: List[int] = []
+        self.parts: List[Tuple[int, bytes]] = []
+        for (start, end), block in sorted((data or {}).items()):
+            if self.parts and self.parts[-1][0] == start:
+                self.parts[-1] = (end, self.parts[-1][1] + block)
+            else:
+                self.starts.append(start)
+                self.parts.append((end, block))
+
+    def _fetch(self, start, stop):
+        if start is None:
+            start = 0
+        if stop is None:
+            stop = self.size
+        stop = min(stop, self.size)
+        if start >= self.size or start >= stop:
+            return b""
+        i = bisect.bisect_right(self.starts, start) - 1
+        if i >= 0 and start < self.parts[i][0]:
+            end, block = self.parts[i]
+            head = block[start - self.starts[i]:stop - self.starts[i]]
+            if stop <= end:
+                return head
+            return head + self._fallback(end, stop)
+        return self._fallback(start, stop)
+
+    def _fallback(self, start, stop):
+        if self.fallback is None:
+            return self.fetcher(start, stop)
+        return self.fallback._fetch(start, stop)
+
+
+class DiskCache:
+    """Persistent, range-granular read cache on local disk.
+
+    Objects are stored as fixed-size block files next to a small metadata
+    file recording the ETag and size they belong to.  Before blocks of an
+    object are served its ETag is revalidated with a HEAD request, unless
+    the last validation is younger than *ttl* seconds.  Least recently used
+    blocks are evicted once the directory grows beyond *max_bytes*; each
+    process keeps an index of the blocks by last use, built from the
+    directory on first write and rebuilt every ``index_refresh`` seconds
+    to pick up the blocks of other processes.
+
+    Several processes may share one directory: files are written to a
+    temporary name and renamed into place, block file names include the
+    ETag they belong to, and eviction runs under an ``flock`` lock.
+
+    Parameters
+    ----------
+    directory : str
+        Cache location, created if needed.
+    max_bytes : int
+        Size limit for cached blocks.
+    block_size : int
+        Size of a cached block; must be the same for every process sharing
+        *directory*.
+    ttl : float
+        Seconds during which a validated ETag is trusted without a HEAD
+        (default 60).  ``0`` revalidates on every read.
+    """
+
+    # Seconds after which the block index is rebuilt from the directory.
+    index_refresh = 600.0
+
+    def __init__(self, directory: str, max_bytes: int = 10 * 2 ** 30, block_size: int = 4 * 2 ** 20,
+                 ttl: float = 60.0):
+        self.directory = os.path.abspath(os.path.expanduser(directory))
+        os.makedirs(self.directory, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.block_size = block_size
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        # Block path -> size, least recently used first; ``None`` until first needed.
+        self._index: Optional["OrderedDict[str, int]"] = None
+        self._index_bytes = 0
+        self._index_time = 0.0
+        self.hits = 0
+        self.misses = 0
+        self.revalidations = 0
+
+    # -- layout -----------------------------------------------------------
+
+    def _object_dir(self, bucket: str, key: str) -> str:
+        digest = hashlib.sha256(f"{bucket}/{key}".encode()).hexdigest()
+        return os.path.join(self.directory, digest[:2], digest)
+
+    @staticmethod
+    def _etag_token(etag: str) -> str:
+        return hashlib.sha1(etag.encode()).hexdigest()[:16]
+
+    def _block_name(self, etag: str, index: int) -> str:
+        return f"{self._etag_token(etag)}.{index}"
+
+    @staticmethod
+    def _write_atomic(path: str, data: bytes):
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=directory, prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp, path)
+        except BaseException:
+            with contextlib.suppress(OSError):
+                os.unlink(tmp)
+            raise
+
+    def _read_meta(self, odir: str) -> Optional[dict]:
+        try:
+            with open(os.path.join(odir, "meta.json")) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    # -- validation -------------------------------------------------------
+
+    def validate(self, bucket: str, key: str, head: Callable[[], Tuple[str, int]], force: bool = False) -> dict:
+        """Return ``{"etag", "size", ...}`` for an object, revalidating via *head* when stale.
+
+        *head* returns ``(etag, size)`` and raises ``FileNotFoundError`` for
+        a missing object, which also drops it from the cache.
+        """
+        odir = self._object_dir(bucket, key)
+        meta = self._read_meta(odir)
+        if meta is not None and not force and time.time() - meta["validated"] < self.ttl:
+            return meta
+        try:
+            etag, size = head()
+        except FileNotFoundError:
+            self.invalidate(bucket, key)
+            raise
+        with self._lock:
+            self.revalidations += 1
+        if meta is None or meta["etag"] != etag:
+            self._remove_blocks(odir, keep=self._etag_token(etag))
+        meta = {"bucket": bucket, "key": key, "etag": etag, "size": size, "validated": time.time()}
+        with contextlib.suppress(OSError):
+            self._write_atomic(os.path.join(odir, "meta.json"), json.dumps(meta).encode())
+        return meta
+
+    def _remove_blocks(self, odir: str, keep: Optional[str] = None):
+        with contextlib.suppress(OSError):
+            for name in os.listdir(odir):
+                if name != "meta.json" and not name.startswith(".tmp-") and name.split(".")[0] != keep:
+                    path = os.path.join(odir, name)
+                    with contextlib.suppress(OSError):
+                        os.unlink(path)
+                    with self._lock:
+                        self._unindex(path)
+
+    def invalidate(self, bucket: str, key: str):
+        """Forget an object; its blocks are deleted."""
+        odir = self._object_dir(bucket, key)
+        with contextlib.suppress(OSError):
+            os.unlink(os.path.join(odir, "meta.json"))
+        self._remove_blocks(odir)
+
+    # -- reads ------------------------------------------------------------
+
+    def read(self, bucket: str, key: str, start: Optional[int], end: Optional[int],
+             head: Callable[[], Tuple[str, int]], fetch: Callable[[int, int], Tuple[bytes, str]],
+             etag: Optional[str] = None) -> bytes:
+        """Return bytes ``[start, end)`` of an object, filling missing blocks with *fetch*.
+
+        *start* / *end* follow slice semantics (``None`` and negatives are
+        allowed).  ``fetch(start, end)`` performs one ranged GET and returns
+        ``(data, etag)``; should the ETag differ from the validated one the
+        object is revalidated and the read restarted once.
+
+        With *etag* the read is pinned to that version: cached metadata with
+        the same ETag is trusted without a HEAD, and ``FileExpired`` is
+        raised if the object now has a different one.
+        """
+        if etag is not None:
+            return self._read_pinned(bucket, key, start, end, head, fetch, etag)
+        meta = self.validate(bucket, key, head)
+        try:
+            return self._read_blocks(bucket, key, meta, start, end, fetch)
+        except _ETagChanged:
+            meta = self.validate(bucket, key, head, force=True)
+        try:
+            return self._read_blocks(bucket, key, meta, start, end, fetch)
+        except _ETagChanged:
+            raise OSError(errno.EIO, f"{bucket}/{key} kept changing while being read") from None
+
+    def _read_pinned(self, bucket, key, start, end, head, fetch, etag) -> bytes:
+        meta = self._read_meta(self._object_dir(bucket, key))
+        if meta is None or meta["etag"] != etag:
+            meta = self.validate(bucket, key, head, force=True)
+        if meta["etag"] != etag:
+            raise FileExpired(f"{bucket}/{key} changed since it was opened", path=f"{bucket}/{key}", etag=etag)
+        try:
+            return self._read_blocks(bucket, key, meta, start, end, fetch)
+        except _ETagChanged:
+            raise FileExpired(f"{bucket}/{key} changed since it was opened", path=f"{bucket}/{key}",
+                              etag=etag) from None
+
+    def copy_to(self, bucket: str, key: str, fileobj, head: Callable[[], Tuple[str, int]],
+                fetch: Callable[[int, int], Tuple[bytes, str]], chunk_blocks: int = 16):
+        """Write a whole object to the seekable *fileobj*, *chunk_blocks* blocks at a time."""
+        step = chunk_blocks * self.block_size
+        for force in (False, True):
+            meta = self.validate(bucket, key, head, force=force)
+            fileobj.seek(0)
+            fileobj.truncate()
+            try:
+                for offset in range(0, meta["size"], step):
+                    fileobj.write(self._read_blocks(bucket, key, meta, offset, offset + step, fetch))
+                return
+            except _ETagChanged:
+                continue
+        raise OSError(errno.EIO, f"{bucket}/{key} kept changing while being read")
+
+    def _read_blocks(self, bucket, key, meta, start, end, fetch) -> bytes:
+        size, etag, bs = meta["size"], meta["etag"], self.block_size
+        start, end, _ = slice(start, end).indices(size)
+        if start >= end:
+            return b""
+        odir = self._object_dir(bucket, key)
+        indices = range(start // bs, (end - 1) // bs + 1)
+        blocks: Dict[int, bytes] = {}
+        missing = []
+        for index in indices:
+            path = os.path.join(odir, self._block_name(etag, index))
+            try:
+                with open(path, "rb") as f:
+                    blocks[index] = f.read()
+                os.utime(path)
+            except OSError:
+                missing.append(index)
+        with self._lock:
+            self.hits += len(blocks)
+            self.misses += len(missing)
+            if self._index is not None:
+                for index in blocks:
+                    path = os.path.join(odir, self._block_name(etag, index))
+                    if path in self._index:
+                        self._index.move_to_end(path)
+
+        # One GET per run of consecutive missing blocks.
+        for run in _runs(missing):
+            run_start, run_end = run[0] * bs, min((run[-1] + 1) * bs, size)
+            data, got_etag = fetch(run_start, run_end)
+            if got_etag != etag:
+                raise _ETagChanged()
+            for index in run:
+                block = data[index * bs - run_start:(index + 1) * bs - run_start]
+                blocks[index] = block
+                self._store(os.path.join(odir, self._block_name(etag, index)), block)
+
+        first = indices[0] * bs
+        return b"".join(blocks[i] for i in indices)[start - first:end - first]
+
+    def _store(self, path: str, data: bytes):
+        try:
+            self._write_atomic(path, data)
+        except OSError as e:
+            logger.debug("Could not write disk cache block %s: %s", path, e)
+            return
+        with self._lock:
+            index = self._indexed()
+            self._unindex(path)
+            index[path] = len(data)
+            self._index_bytes += len(data)
+            due = self._index_bytes > self.max_bytes
+        if due:
+            self.evict()
+
+    # -- eviction ---------------------------------------------------------
+
+    def _indexed(self) -> "OrderedDict[str, int]":
+        """The block index, (re)built from the directory when missing or older than ``index_refresh``."""
+        if self._index is None or time.monotonic() - self._index_time > self.index_refresh:
+            entries = []
+            for root, _, files in os.walk(self.directory):
+                for name in files:
+                    if name in ("meta.json", ".lock") or name.startswith(".tmp-"):
+                        continue
+                    path = os.path.join(root, name)
+                    with contextlib.suppress(OSError):
+                        st = os.stat(path)
+                        entries.append((st.st_mtime, st.st_size, path))
+            self._index = OrderedDict((path, size) for _, size, path in sorted(entries))
+            self._index_bytes = sum(self._index.values())
+            self._index_time = time.monotonic()
+        return self._index
+
+    def _unindex(self, path: str):
+        if self._index is not None:
+            self._index_bytes -= self._index.pop(path, 0)
+
+    def evict(self):
+        """Delete least recently used blocks until the cache is under 90% of ``max_bytes``."""
+        with _file_lock(os.path.join(self.directory, ".lock")), self._lock:
+            index = self._indexed()
+            if self._index_bytes <= self.max_bytes:
+                return
+            target = self.max_bytes * 9 // 10
+            while index and self._index_bytes > target:
+                path, size = index.popitem(last=False)
+                self._index_bytes -= size
+                with contextlib.suppress(OSError):
+                    os.unlink(path)
+
+    def after_fork(self):
+        """Reset the per-process state in a forked child; the files are safe to share."""
+        self._lock = threading.Lock()
+        self._index = None
+        self.hits = self.misses = self.revalidations = 0
+
+    def stats(self) -> dict:
+        """Per-process counters of block hits, misses and ETag revalidations."""
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "revalidations": self.revalidations}
+
+
+class _ETagChanged(Exception):
+    """The object changed between validation and a block fetch."""
+
+
+def _runs(indices: List[int]) -> List[List[int]]:
+    runs: List[List[int]] = []
+    for index in indices:
+        if runs and index == runs[-1][-1] + 1:
+            runs[-1].append(index)
+        else:
+            runs.append([index])
+    return runs
+
+
+@contextlib.contextmanager
+def _file_lock(path: str):
+    """Exclusive inter-process lock (no-op where ``fcntl`` is unavailable)."""
+    if fcntl is None:
+        yield
+        return
+    with open(path, "a") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
@@ -0,0 +1,420 @@
+"""Footer parsing and prefetch planning for columnar file formats.
+
+Used by ``COSFile`` when opened with ``cache_type="columnar"``: the file
+tail is fetched with one GET, the footer is parsed here and the byte
+ranges a reader will need for the selected columns and row groups are
+fetched concurrently up front, so the reader never waits on a round trip.
+
+Supported formats:
+
+``parquet``
+    Column chunks (dictionary and data pages) of the selected columns in
+    the selected row groups.
+``orc``
+    Streams of the selected columns in the selected stripes, located via
+    the stripe footers (uncompressed and zlib-compressed files).
+``feather``
+    Feather v2 / Arrow IPC files; the selected record batches and every
+    dictionary batch (column selection is not applied).
+
+Only the standard library is used; nothing here requires pyarrow.
+"""
+import struct
+import zlib
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+Range = Tuple[int, int]
+RangeFetcher = Callable[[List[Range]], List[bytes]]
+
+FORMATS = ("parquet", "orc", "feather")
+
+
+def detect_format(tail: bytes) -> Optional[str]:
+    """Guess the format from the last bytes of a file."""
+    if tail[-4:] == b"PAR1":
+        return "parquet"
+    if tail[-6:] == b"ARROW1":
+        return "feather"
+    # The ORC PostScript ends with the "ORC" magic, followed by its length byte.
+    if tail[-4:-1] == b"ORC":
+        return "orc"
+    return None
+
+
+# ---------------------------------------------------------------------------
+# Wire-format readers
+# ---------------------------------------------------------------------------
+class _ThriftCompact:
+    """Decode Thrift compact-protocol structs into ``{field_id: value}`` dicts."""
+
+    def __init__(self, buf: bytes, pos: int = 0):
+        self.buf = buf
+        self.pos = pos
+
+    def _byte(self):
+        b = self.buf[self.pos]
+        self.pos += 1
+        return b
+
+    def _varint(self):
+        shift = result = 0
+        while True:
+            b = self._byte()
+            result |= (b & 0x7F) << shift
+            if not b & 0x80:
+                return result
+            shift += 7
+
+    def _zigzag(self):
+        n = self._varint()
+        return (n >> 1) ^ -(n & 1)
+
+    def read_struct(self) -> dict:
+        out = {}
+        field_id = 0
+        while True:
+            header = self._byte()
+            if header == 0:
+                return out
+            delta, ftype = header >> 4, header & 0x0F
+            field_id = field_id + delta if delta else self._zigzag()
+            out[field_id] = self._value(ftype, in_container=False)
+
+    def _value(self, ftype, in_container=True):
+        if ftype in (1, 2):
+            # Booleans live in the field header, but take a byte inside containers.
+            return self._byte() == 1 if in_container else ftype == 1
+        if ftype == 3:
+            return struct.unpack("b", bytes([self._byte()]))[0]
+        if ftype in (4, 5, 6):
+            return self._zigzag()
+        if ftype == 7:
+            self.pos += 8
+            return struct.unpack_from("<d", self.buf, self.pos - 8)[0]
+        if ftype == 8:
+            n = self._varint()
+            self.pos += n
+            return bytes(self.buf[self.pos - n:self.pos])
+        if ftype in (9, 10):
+            header = self._byte()
+            size, etype = header >> 4, header & 0x0F
+            if size == 15:
+                size = self._varint()
+            return [self._value(etype) for _ in range(size)]
+        if ftype == 11:
+            size = self._varint()
+            if not size:
+                return {}
+            types = self._byte()
+            return dict((self._value(types >> 4), self._value(types & 0x0F)) for _ in range(size))
+        if ftype == 12:
+            return self.read_struct()
+        raise ValueError(f"unknown thrift compact type {ftype}")
+
+
+def _protobuf(buf: bytes) -> Dict[int, list]:
+    """Decode one protobuf message into ``{field_number: [raw values]}``.
+
+    Varints are returned as ints, length-delimited fields as bytes.
+    """
+    out: Dict[int, list] = {}
+    pos = 0
+    while pos < len(buf):
+        key, pos = _pb_varint(buf, pos)
+        field, wire = key >> 3, key & 7
+        if wire == 0:
+            value, pos = _pb_varint(buf, pos)
+        elif wire == 1:
+            value, pos = buf[pos:pos + 8], pos + 8
+        elif wire == 2:
+            n, pos = _pb_varint(buf, pos)
+            value, pos = bytes(buf[pos:pos + n]), pos + n
+        elif wire == 5:
+            value, pos = buf[pos:pos + 4], pos + 4
+        else:
+            raise ValueError(f"unsupported protobuf wire type {wire}")
+        out.setdefault(field, []).append(value)
+    return out
+
+
+def _pb_varint(buf, pos):
+    shift = result = 0
+    while True:
+        b = buf[pos]
+        pos += 1
+        result |= (b & 0x7F) << shift
+        if not b & 0x80:
+            return result, pos
+        shift += 7
+
+
+def _pb_packed(values: list) -> List[int]:
+    """Expand a (possibly packed) repeated varint field."""
+    out = []
+    for value in values:
+        if isinstance(value, int):
+            out.append(value)
+            continue
+        pos = 0
+        while pos < len(value):
+            n, pos = _pb_varint(value, pos)
+            out.append(n)
+    return out
+
+
+def _pb_int(message: dict, field: int, default: int = 0) -> int:
+    return message.get(field, [default])[-1]
+
+
+# ---------------------------------------------------------------------------
+# Parquet
+# ---------------------------------------------------------------------------
+def _parquet_footer_length(tail):
+    return struct.unpack("<I", tail[-8:-4])[0] + 8
+
+
+def _selected(items: Sequence, indices: Optional[Iterable[int]]):
+    if indices is None:
+        return list(items)
+    return [items[i] for i in indices]
+
+
+def _column_matches(path: Sequence[str], columns) -> bool:
+    return columns is None or path[0] in columns or ".".join(path) in columns
+
+
+def _parquet_ranges(tail, size, fetch, columns, row_groups) -> List[Range]:
+    length = _parquet_footer_length(tail) - 8
+    meta = _ThriftCompact(tail, len(tail) - 8 - length).read_struct()
+    ranges = []
+    for group in _selected(meta.get(4, []), row_groups):
+        for chunk in group.get(1, []):
+            md = chunk.get(3)
+            if md is None or chunk.get(1):
+                # Encrypted metadata or a chunk stored in another file.
+                continue
+            if not _column_matches([p.decode() for p in md[3]], columns):
+                continue
+            start = md[9]
+            dictionary = md.get(11)
+            if dictionary and dictionary < start:
+                start = dictionary
+            ranges.append((start, start + md[7]))
+    return ranges
+
+
+# ---------------------------------------------------------------------------
+# ORC
+# ---------------------------------------------------------------------------
+_ORC_NONE, _ORC_ZLIB = 0, 1
+
+
+def _orc_postscript(tail):
+    ps_length = tail[-1]
+    return _protobuf(tail[-1 - ps_length:-1]), ps_length
+
+
+def _orc_footer_length(tail):
+    ps, ps_length = _orc_postscript(tail)
+    return 1 + ps_length + _pb_int(ps, 1) + _pb_int(ps, 5)
+
+
+def _orc_decompress(data: bytes, compression: int) -> bytes:
+    if compression == _ORC_NONE:
+        return data
+    if compression != _ORC_ZLIB:
+        raise ValueError(f"unsupported ORC compression kind {compression}")
+    out = []
+    pos = 0
+    while pos < len(data):
+        header = data[pos] | data[pos + 1] << 8 | data[pos + 2] << 16
+        length, original = header >> 1, header & 1
+        chunk = data[pos + 3:pos + 3 + length]
+        out.append(chunk if original else zlib.decompress(chunk, -15))
+        pos += 3 + length
+    return b"".join(out)
+
+
+def _orc_columns(types: List[dict], columns) -> Optional[set]:
+    """Column ids of the selected top-level fields and all their children."""
+    if columns is None:
+        return None
+    root = types[0]
+    names = [n.decode() for n in root.get(3, [])]
+    subtypes = _pb_packed(root.get(2, []))
+    selected = {0}
+    stack = [sub for name, sub in zip(names, subtypes) if name in columns]
+    while stack:
+        column = stack.pop()
+        selected.add(column)
+        stack.extend(_pb_packed(types[column].get(2, [])))
+    return selected
+
+
+def _orc_ranges(tail, size, fetch, columns, row_groups) -> List[Range]:
+    ps, ps_length = _orc_postscript(tail)
+    compression = _pb_int(ps, 2, _ORC_NONE)
+    footer_end = len(tail) - 1 - ps_length
+    footer = _protobuf(_orc_decompress(tail[footer_end - _pb_int(ps, 1):footer_end], compression))
+    stripes = [_protobuf(s) for s in footer.get(3, [])]
+    wanted = _orc_columns([_protobuf(t) for t in footer.get(4, [])], columns)
+
+    ranges = []
+    stripe_footers = []
+    for stripe in _selected(stripes, row_groups):
+        offset = _pb_int(stripe, 1)
+        footer_start = offset + _pb_int(stripe, 2) + _pb_int(stripe, 3)
+        footer_range = (footer_start, footer_start + _pb_int(stripe, 4))
+        if wanted is None:
+            ranges.append((offset, footer_range[1]))
+        else:
+            stripe_footers.append((offset, footer_range))
+    if not stripe_footers:
+        return ranges
+
+    raw_footers = fetch([r for _, r in stripe_footers])
+    for (offset, footer_range), raw in zip(stripe_footers, raw_footers):
+        ranges.append(footer_range)
+        position = offset
+        for stream in _protobuf(_orc_decompress(raw, compression)).get(1, []):
+            stream = _protobuf(stream)
+            length = _pb_int(stream, 3)
+            if _pb_int(stream, 2) in wanted and length:
+                ranges.append((position, position + length))
+            position += length
+    return ranges
+
+
+# ---------------------------------------------------------------------------
+# Feather v2 / Arrow IPC file
+# ---------------------------------------------------------------------------
+def _feather_footer_length(tail):
+    return struct.unpack("<i", tail[-10:-6])[0] + 10
+
+
+def _flatbuffer_blocks(buf: bytes, table: int, field: int) -> List[Tuple[int, int, int]]:
+    """Read a vector of Arrow ``Block`` structs from field *field* of *table*."""
+    vtable = table - struct.unpack_from("<i", buf, table)[0]
+    vtable_size = struct.unpack_from("<H", buf, vtable)[0]
+    if 4 + 2 * field >= vtable_size:
+        return []
+    offset = struct.unpack_from("<H", buf, vtable + 4 + 2 * field)[0]
+    if not offset:
+        return []
+    vector = table + offset + struct.unpack_from("<I", buf, table + offset)[0]
+    count = struct.unpack_from("<I", buf, vector)[0]
+    # Block: int64 offset, int32 metaDataLength, 4 bytes padding, int64 bodyLength.
+    return [struct.unpack_from("<qi4xq", buf, vector + 4 + 24 * i) for i in range(count)]
+
+
+def _feather_ranges(tail, size, fetch, columns, row_groups) -> List[Range]:
+    length = _feather_footer_length(tail) - 10
+    footer = tail[len(tail) - 10 - length:len(tail) - 10]
+    root = struct.unpack_from("<I", footer, 0)[0]
+    dictionaries = _flatbuffer_blocks(footer, root, 2)
+    batches = _selected(_flatbuffer_blocks(footer, root, 3), row_groups)
+    return [(offset, offset + meta + body) for offset, meta, body in dictionaries + batches]
+
+
+_FOOTER_LENGTH = {"parquet": _parquet_footer_length, "orc": _orc_footer_length, "feather": _feather_footer_length}
+_RANGES = {"parquet": _parquet_ranges, "orc": _orc_ranges, "feather": _feather_ranges}
+
+
+# ---------------------------------------------------------------------------
+# Range bookkeeping
+# ---------------------------------------------------------------------------
+def _union(ranges: Iterable[Range]) -> List[Range]:
+    out: List[Range] = []
+    for start, end in sorted(ranges):
+        if out and start <= out[-1][1]:
+            out[-1] = (out[-1][0], max(end, out[-1][1]))
+        elif end > start:
+            out.append((start, end))
+    return out
+
+
+def _subtract(ranges: List[Range], known: List[Range]) -> List[Range]:
+    """Parts of the (sorted, disjoint) *ranges* not covered by *known*."""
+    out = []
+    for start, end in ranges:
+        for k_start, k_end in known:
+            if k_end <= start or k_start >= end:
+                continue
+            if k_start > start:
+                out.append((start, k_start))
+            start = max(start, k_end)
+            if start >= end:
+                break
+        if start < end:
+            out.append((start, end))
+    return out
+
+
+def _consolidate(parts: Dict[Range, bytes]) -> Dict[Range, bytes]:
+    """Merge overlapping or touching parts into disjoint ones."""
+    out: List[list] = []
+    for (start, end), data in sorted(parts.items()):
+        if out and start <= out[-1][1]:
+            if end > out[-1][1]:
+                out[-1][2] += data[out[-1][1] - start:]
+                out[-1][1] = end
+        else:
+            out.append([start, end, bytearray(data)])
+    return {(start, end): bytes(data) for start, end, data in out}
+
+
+def prefetch(tail: bytes, size: int, fetch_ranges: RangeFetcher, format: Optional[str] = None,  # pylint: disable=redefined-builtin
+             columns: Optional[Iterable[str]] = None, row_groups: Optional[Iterable[int]] = None
+             ) -> Dict[Range, bytes]:
+    """Fetch everything a reader needs for the selected columns and row groups.
+
+    Parameters
+    ----------
+    tail : bytes
+        The last bytes of the file, usually fetched with one GET; extended
+        with a second one if the footer turns out to be longer.
+    size : int
+        Total file size.
+    fetch_ranges : callable
+        ``fetch_ranges([(start, end), ...]) -> [bytes, ...]``, expected to
+        fetch concurrently.
+    format : str, optional
+        One of ``FORMATS``; detected from the tail when omitted.
+    columns, row_groups : iterable, optional
+        Top-level (or dotted) column names and row-group / stripe / record
+        batch indices to prefetch; everything when omitted.
+
+    Returns
+    -------
+    dict
+        Disjoint ``{(start, end): bytes}`` parts, including the tail.
+
+    Raises
+    ------
+    ValueError
+        If the format is unknown or the footer cannot be parsed.
+    """
+    format = format or detect_format(tail)
+    if format not in _RANGES:
+        raise ValueError(f"unrecognised columnar format {format!r}")
+    columns = None if columns is None else set(columns)
+    fetched: Dict[Range, bytes] = {}
+
+    def fetch(ranges):
+        data = fetch_ranges(ranges)
+        fetched.update(zip(ranges, data))
+        return data
+
+    try:
+        needed = min(_FOOTER_LENGTH[format](tail), size)
+        if needed > len(tail):
+            tail = fetch([(size - needed, size - len(tail))])[0] + tail
+        ranges = _RANGES[format](tail, size, fetch, columns, row_groups)
+    except (IndexError, KeyError, struct.error, zlib.error) as e:
+        raise ValueError(f"malformed {format} footer: {e!r}") from e
+
+    parts = {**fetched, (size - len(tail), size): tail}
+    missing = _subtract(_union((max(s, 0), min(e, size)) for s, e in ranges), _union(parts))
+    if missing:
+        parts.update(zip(missing, fetch_ranges(missing)))
+    return _consolidate(parts)
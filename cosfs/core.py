@@ -1,18 +1,42 @@
+import asyncio
 import bisect
+import collections
+import contextlib
 import copy
 import errno
+import fnmatch
+import functools
+import hashlib
 import logging
 import math
 import os
+import re
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
 from configparser import ConfigParser
+from glob import has_magic
 from os.path import expanduser
-from typing import Dict, List, Optional, Tuple, Type
-
-import yaml
-from fsspec.asyn import AsyncFileSystem
-from fsspec.spec import AbstractBufferedFile
-from qcloud_cos import CosS3Client, CosConfig, CosServiceError
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple, Type, Union
+
+import fsspec.asyn
+from fsspec.asyn import AsyncFileSystem, _run_coros_in_chunks, get_loop, sync
+from fsspec.caching import caches
+from fsspec.callbacks import _DEFAULT_CALLBACK
+from fsspec.spec import AbstractBufferedFile, make_instance
+
+from . import columnar
+from .buffers import BufferPool, MemoryBudget, PartBuffer, as_body
+from .caching import BlockCache, DiskCache, PartsCache, SharedBlockCache
+from .crc64 import CRC64, crc64, file_crc64
+from .crc64 import parse as parse_crc64
+from .exceptions import ChecksumMismatch, FileExpired
+from .sync import file_md5, local_entries, plan_sync, remote_entries
+from .tracing import _NULL_SPAN, _request_hooks, end_span, start_span
+from .tracing import span as trace_span
+
+if TYPE_CHECKING:
+    from qcloud_cos import CosS3Client
 
 logger = logging.getLogger("cosfs")
 
@@ -22,6 +46,9 @@ COS_MAX_PARTS = 10_000
 # Default part size: 50 MiB.
 _DEFAULT_PART_BYTES = 50 * 2 ** 20
 
+# Request timeout the SDK applies when none is configured, in seconds.
+_SDK_TIMEOUT = 30
+
 
 def _ensure_part_size(total_size, part_size=None, limit=COS_MAX_PARTS):
     """Return a part size that keeps the total number of parts within *limit*.
@@ -36,9 +63,40 @@ def _ensure_part_size(total_size, part_size=None, limit=COS_MAX_PARTS):
         return part_size
     return int(math.ceil(total_size / limit))
 
+
+def _merge_ranges(ranges, max_gap, max_block):
+    """Coalesce ``(start, end)`` byte ranges into fewer fetch windows.
+
+    Ranges are visited in ascending order; a range joins the current window
+    when it starts at most *max_gap* bytes after the window's end and the
+    widened window stays within *max_block* bytes (a single range larger
+    than *max_block* still gets a window of its own).
+
+    Returns a list of ``(start, end, members)`` where *members* holds the
+    indices into *ranges* served by that window.
+    """
+    windows = []
+    for i in sorted(range(len(ranges)), key=lambda i: ranges[i]):
+        start, end = ranges[i]
+        if windows:
+            w_start, w_end, members = windows[-1]
+            if start - w_end <= max_gap and max(end, w_end) - w_start <= max_block:
+                windows[-1] = (w_start, max(end, w_end), members)
+                members.append(i)
+                continue
+        windows.append((start, end, [i]))
+    return windows
+
+
 # ---------------------------------------------------------------------------
 # Error translation: COS error codes -> Python standard exceptions
 # ---------------------------------------------------------------------------
+def _cos_service_error():
+    """``qcloud_cos.CosServiceError``; the SDK is imported on first use, see ``COSFileSystem.client``."""
+    from qcloud_cos import CosServiceError
+    return CosServiceError
+
+
 COS_ERROR_CODE_TO_EXCEPTION: Dict[str, Type[Exception]] = {
     # Not found
     "NoSuchKey": FileNotFoundError,
@@ -52,8 +110,14 @@ COS_ERROR_CODE_TO_EXCEPTION: Dict[str, Type[Exception]] = {
     # Already exists
     "BucketAlreadyExists": FileExistsError,
     "BucketAlreadyOwnedByYou": FileExistsError,
+    # If-Match failed: the object changed since its ETag was pinned
+    "PreconditionFailed": FileExpired,
+    "412": FileExpired,
 }
 
+# ``Content-Range: bytes <first>-<last>/<size>`` of a ranged GET
+_CONTENT_RANGE = re.compile(r"bytes (\d+)-\d+/(\d+)")
+
 # COS error codes that are safe to retry (rate-limiting, transient server errors)
 COS_RETRYABLE_ERROR_CODES = {
     "SlowDown", "ServiceUnavailable", "InternalError",
@@ -61,9 +125,53 @@ COS_RETRYABLE_ERROR_CODES = {
 }
 
 
+def _body_length(body) -> int:
+    """Length of a bytes-like or seekable file-like request body."""
+    if hasattr(body, "seek") and hasattr(body, "tell") and not hasattr(body, "__len__"):
+        position = body.tell()
+        length = body.seek(0, os.SEEK_END) - position
+        body.seek(position)
+        return length
+    return len(body)
+
+
+def _header(resp, name) -> Optional[str]:
+    """Value of the response header *name*, matched case-insensitively."""
+    for key, value in resp.items():
+        if key.lower() == name:
+            return value
+    return None
+
+
+def _crc64_header(resp) -> Optional[int]:
+    """The ``x-cos-hash-crc64ecma`` checksum in a response, if COS sent one."""
+    return parse_crc64(_header(resp, "x-cos-hash-crc64ecma"))
+
+
+def _is_whole_body(resp, body) -> bool:
+    """Whether a GET response carries the whole object rather than a range of it."""
+    m = _CONTENT_RANGE.match(resp.get("Content-Range", ""))
+    return m is None or m.group(1) == "0" and int(m.group(2)) == len(body)
+
+
+def _copy_body(resp, f) -> CRC64:
+    """Stream the body of a GET response into the file *f*; returns its running checksum."""
+    stream = resp["Body"].get_raw_stream()
+    running = CRC64()
+    for chunk in iter(lambda: stream.read(2 ** 20), b""):
+        running.update(chunk)
+        f.write(chunk)
+    return running
+
+
+def _error_code(exc):
+    """COS error code behind a translated exception, or ``None``."""
+    return getattr(exc.__cause__, "get_error_code", lambda: None)()
+
+
 def translate_cos_error(error, message=None):
     """Map a ``CosServiceError`` to the appropriate Python builtin exception."""
-    if not isinstance(error, CosServiceError):
+    if not isinstance(error, _cos_service_error()):
         return error
 
     code = getattr(error, "get_error_code", lambda: None)()
@@ -96,81 +204,518 @@ def _call_cos(func, *args, retries=3, **kwargs):
     into native Python exceptions and raised immediately.
     """
     err = None
+    # A file-like body is rewound before each retry.
+    body = kwargs.get("Body", kwargs.get("Data"))
+    body_start = body.tell() if hasattr(body, "seek") and hasattr(body, "tell") else None
     for attempt in range(retries):
         wait = min(2 ** attempt * 0.5, 15)  # 0.5s, 1s, 2s, ... capped at 15s
+        if attempt and body_start is not None:
+            body.seek(body_start)
+        span = None
+        if _request_hooks:
+            span = start_span(getattr(func, "__name__", repr(func)), kwargs.get("Bucket"), kwargs.get("Key"),
+                              kwargs.get("Range"), attempt)
         try:
-            return func(*args, **kwargs)
+            out = func(*args, **kwargs)
         except COS_RETRYABLE_EXCEPTIONS as e:
             err = e
+            if span is not None:
+                end_span(span, "retry", e)
             logger.debug("Retryable network error (attempt %d/%d): %s", attempt + 1, retries, e)
             time.sleep(wait)
-        except CosServiceError as e:
+        except _cos_service_error() as e:
             err = e
             code = getattr(e, "get_error_code", lambda: None)()
             if code in COS_RETRYABLE_ERROR_CODES:
+                if span is not None:
+                    end_span(span, "retry", e)
                 logger.debug("Retryable COS error %s (attempt %d/%d): %s", code, attempt + 1, retries, e)
                 time.sleep(wait)
             else:
+                if span is not None:
+                    end_span(span, "error", e)
                 # Non-retryable COS error -> translate and raise immediately
                 raise translate_cos_error(e) from e
-        except (OSError, RuntimeError, TypeError, ValueError) as e:
+        except BaseException as e:
+            if span is not None:
+                end_span(span, "error", e)
+            if not isinstance(e, (OSError, RuntimeError, TypeError, ValueError)):
+                raise
             err = e
             logger.debug("Non-retryable error: %s", e)
             break
+        else:
+            if span is not None:
+                end_span(span)
+            return out
 
     # All retries exhausted
-    if isinstance(err, CosServiceError):
+    if isinstance(err, _cos_service_error()):
         raise translate_cos_error(err) from err
     if err is not None:
         raise err
     raise RuntimeError("_call_cos: unexpected state")
 
 
+def _split_listing(path, listing):
+    """Split the listing of directory *path* into ``(dirs, files)`` keyed by base name, as fsspec's walk does."""
+    dirs, files = {}, {}
+    for info in listing:
+        pathname = info["name"].rstrip("/")
+        if pathname == path:
+            if info["type"] != "directory":
+                files[""] = info  # an object with the same name as the directory
+            continue
+        (dirs if info["type"] == "directory" else files)[pathname.rsplit("/", 1)[-1]] = info
+    return dirs, files
+
+
+def _new_stats() -> dict:
+    return {"count": 0, "size": 0, "histogram": {}, "storage_classes": {}}
+
+
+def _add_object_stats(stats, size, storage_class):
+    """Count one object of *size* bytes into *stats*.
+
+    The histogram is keyed by the smallest power of two holding the object
+    (0 for empty objects); storage classes map to their own count and size.
+    """
+    stats["count"] += 1
+    stats["size"] += size
+    upper = 1 << (size - 1).bit_length() if size else 0
+    stats["histogram"][upper] = stats["histogram"].get(upper, 0) + 1
+    by_class = stats["storage_classes"].setdefault(storage_class, {"count": 0, "size": 0})
+    by_class["count"] += 1
+    by_class["size"] += size
+
+
+def _is_dir_marker(obj) -> bool:
+    return obj["Key"].endswith("/") and int(obj.get("Size", 0)) == 0
+
+
+def _read_coscli(path):
+    import yaml  # only needed for coscli configs
+
+    with open(path) as f:
+        cli_config = yaml.load(f.read(), Loader=yaml.FullLoader)['cos']
+    if len(cli_config['buckets']) == 0:
+        raise ValueError("no bucket config found, please check your coscli config file.")
+    base = cli_config['base']
+    return (cli_config['buckets'][0]['region'], base['secretid'], base['secretkey'], base['sessiontoken'],
+            {b['name']: b['region'] for b in cli_config['buckets'] if b.get('name') and b.get('region')})
+
+
+def _read_coscmd(path):
+    with open(path, 'r') as f:
+        cp = ConfigParser()
+        cp.read_file(f)
+    if not cp.has_section('common'):
+        raise ValueError("[common] section couldn't be found, please check your coscmd config file.")
+    secret_id = cp.get('common', 'secret_id', fallback=cp.get('common', 'access_id', fallback=None))
+    return (cp.get('common', 'region'), secret_id, cp.get('common', 'secret_key'),
+            cp.get('common', 'token', fallback=None), {})
+
+
+# Parsed config files: path -> (mtime_ns, settings); an edited file is read again.
+_config_cache: Dict[str, tuple] = {}
+
+
+def _load_config(conf_path):
+    """Region, credentials and bucket regions from a config file in *conf_path* or the environment.
+
+    A coscli ``.cos.yaml`` is tried first, then a coscmd ``.cos.conf``, then
+    the ``TENCENTCLOUD_*`` environment variables.  Returns ``(region,
+    secret_id, secret_key, token, bucket_regions)``.  Parsed files are cached
+    per path until they change, so later instances only ``stat`` them.
+    """
+    for name, read in ((".cos.yaml", _read_coscli), (".cos.conf", _read_coscmd)):
+        path = conf_path + "/" + name
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except OSError:
+            continue
+        cached = _config_cache.get(path)
+        if cached is None or cached[0] != mtime:
+            cached = _config_cache[path] = (mtime, read(path))
+        region, secret_id, secret_key, token, bucket_regions = cached[1]
+        return region, secret_id, secret_key, token, dict(bucket_regions)
+    if os.environ.get("TENCENTCLOUD_SECRETID"):
+        return (os.environ.get("TENCENTCLOUD_REGION"), os.environ.get("TENCENTCLOUD_SECRETID"),
+                os.environ.get("TENCENTCLOUD_SECRETKEY"), os.environ.get("TENCENTCLOUD_SESSIONTOKEN"), {})
+    raise FileNotFoundError("No config file found, see: https://cloud.tencent.com/document/product/436/63144")
+
+
+# Guards lazily created per-filesystem helpers (buffer pool, write budget, region clients).
+_lazy_lock = threading.Lock()
+
+
+# IO loop of the filesystems of a forked child, with an fsspec that keeps the parent's.
+_child_loop: List[Optional[asyncio.AbstractEventLoop]] = [None]
+
+
+def _after_fork_in_child():
+    """Fresh lock in a forked child: the thread holding the parent's may not have survived."""
+    global _lazy_lock
+    _lazy_lock = threading.Lock()
+    _child_loop[0] = None
+
+
+def _loop_after_fork() -> asyncio.AbstractEventLoop:
+    """The IO loop for a filesystem in a forked child (call with ``_lazy_lock`` held).
+
+    fsspec versions with ``reset_lock`` hand the child a fresh default loop.
+    Older ones still return the parent's, whose thread did not survive the
+    fork, so cosfs starts a loop of its own rather than touch fsspec's.
+    """
+    if hasattr(fsspec.asyn, "reset_lock"):
+        return get_loop()
+    if _child_loop[0] is None:
+        loop = asyncio.new_event_loop()
+        threading.Thread(target=loop.run_forever, name="cosfsIO", daemon=True).start()
+        _child_loop[0] = loop
+    return _child_loop[0]
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_after_fork_in_child)
+
+
 # ---------------------------------------------------------------------------
 # COSFileSystem
 # ---------------------------------------------------------------------------
 class COSFileSystem(AsyncFileSystem):
     protocol = "cosn"
     retries = 3
+    # Worker threads running blocking SDK calls for batch operations.
+    max_concurrency = 10
+    # Directory listings ``walk`` may hold ahead of the consumer.
+    walk_lookahead = 256
+    # ``cat_ranges`` merges ranges separated by at most this many bytes ...
+    cat_ranges_max_gap = 512 * 2 ** 10
+    # ... as long as the merged GET stays within this size.
+    cat_ranges_max_block = 32 * 2 ** 20
+    # Files up to this size opened for reading are fetched whole and served from memory.
+    small_object_size = 256 * 2 ** 10
+    # Idle write buffers kept for reuse by this filesystem's writers.
+    buffer_pool_size = 64 * 2 ** 20
+    _buffer_pool = None
+    # Cap on write-buffer memory across open files; beyond it parts are staged in ``staging_dir``.
+    write_memory_budget: Optional[int] = None
+    staging_dir: Optional[str] = None
+    _write_budget = None
+    # Check the CRC64 that COS reports against the bytes sent and received.
+    verify_crc64 = False
+    # Verified downloads fetch parts of this size, this many at once (the defaults of the SDK's ``download_file``).
+    download_part_size = 20 * 2 ** 20
+    download_threads = 5
+    # Default for the ``skip_unchanged`` option of ``put``/``pipe``: leave objects that already hold the data.
+    skip_unchanged = False
+    _executor = None
+    # HTTP connections kept open per COS host; ``None`` sizes the pool from ``max_concurrency``.
+    pool_size: Optional[int] = None
+    # Seconds to wait for a connection, and for data on it (``None``: the SDK's 30 s).
+    connect_timeout: Optional[float] = None
+    read_timeout: Optional[float] = None
+    # Reuse connections between requests.
+    keep_alive = True
+    _session = None
+    _client = None
+    # Region of each bucket, and one client per region, for routing requests (see ``bucket_region``).
+    _bucket_regions: Optional[Dict[str, str]] = None
+    _region_clients: Optional[Dict[str, "CosS3Client"]] = None
+    _credentials: Optional[Tuple[str, str, Optional[str]]] = None
+    # Shared read cache for files opened through this filesystem (see ``block_cache_size``).
+    block_cache: Optional[BlockCache] = None
+    # Persistent read cache consulted before the network (see ``disk_cache_dir``).
+    disk_cache: Optional[DiskCache] = None
 
     def __init__(self, conf_path: Optional[str] = expanduser("~"), secret_id: Optional[str] = None,
-                 secret_key: Optional[str] = None, token: Optional[str] = None, region: Optional[str] = None, **kwargs):
+                 secret_key: Optional[str] = None, token: Optional[str] = None, region: Optional[str] = None,
+                 config_kwargs: Optional[dict] = None, block_cache_size: Optional[int] = None,
+                 disk_cache_dir: Optional[str] = None, disk_cache_options: Optional[dict] = None,
+                 write_memory_budget: Optional[int] = None, staging_dir: Optional[str] = None,
+                 verify_crc64: bool = False, bucket_regions: Optional[Dict[str, str]] = None,
+                 max_concurrency: Optional[int] = None, pool_size: Optional[int] = None,
+                 connect_timeout: Optional[float] = None, read_timeout: Optional[float] = None,
+                 keep_alive: bool = True, prewarm: int = 0, **kwargs):
+        """
+        Parameters
+        ----------
+        conf_path : str
+            Directory holding a coscli ``.cos.yaml`` or coscmd ``.cos.conf``.
+        secret_id, secret_key, token, region : str, optional
+            Explicit credentials; take precedence over config files and the
+            ``TENCENTCLOUD_*`` environment variables.
+        config_kwargs : dict, optional
+            Extra keyword arguments for ``CosConfig``, e.g. ``Endpoint``,
+            ``Scheme`` or ``Proxies`` to target a private endpoint or a local
+            emulator.
+        block_cache_size : int, optional
+            Enable a shared in-memory LRU block cache of this many bytes.
+            Every file opened for reading through this filesystem is served
+            from it, keyed by object ETag; see ``cosfs.caching``.
+        disk_cache_dir : str, optional
+            Enable a persistent local-disk read cache in this directory; it
+            may be shared by several processes.
+        disk_cache_options : dict, optional
+            ``max_bytes``, ``block_size`` and ``ttl`` (seconds an ETag is
+            trusted without revalidation, 60 by default) for the ``DiskCache``.
+        write_memory_budget : int, optional
+            Bytes of write buffers that all files open for writing may hold
+            in memory together.  Past it, a file stages its parts in a
+            temporary file and uploads them from there; ``0`` stages every
+            part on disk.  Idle pooled buffers count towards it as well.
+            Unbounded by default.
+        staging_dir : str, optional
+            Directory for staged parts (default: the system temp directory).
+        verify_crc64 : bool
+            Verify network transfers end to end against the CRC64 that COS
+            reports: whole-object GETs and downloads, single PUTs, and every
+            part of a multipart upload plus the assembled object.  Raises
+            ``ChecksumMismatch`` on a difference.  Ranged reads, appends and
+            anything served from ``disk_cache`` (filled by ranged GETs) are
+            not checked.  Checksumming holds the GIL, so concurrent
+            verified transfers share one core's CRC rate; see ``cosfs.crc64``.
+        bucket_regions : dict, optional
+            Region of each bucket, by name.  Requests go to a client for the
+            bucket's region; buckets missing here (and from a coscli config)
+            have their region discovered once and cached.  Not used when
+            ``config_kwargs`` sets an ``Endpoint``.
+        max_concurrency : int, optional
+            Worker threads for blocking SDK calls (default 10).
+        pool_size : int, optional
+            HTTP connections kept open per COS host.  Defaults to twice
+            ``max_concurrency``: the worker pool plus as many callers making
+            requests from their own threads.  ``PoolMaxSize`` in
+            *config_kwargs* takes precedence.
+        connect_timeout, read_timeout : float, optional
+            Seconds to wait for a connection and between bytes of a
+            response; the SDK waits 30 s for either by default.
+        keep_alive : bool
+            Reuse connections between requests (default ``True``).
+        prewarm : int
+            Open this many connections to each bucket in *bucket_regions*
+            (and the coscli config) in the background, so that the first
+            requests do not pay for TCP and TLS handshakes; see
+            ``prewarm_connections``.
+        """
         super().__init__(**kwargs)
+        self.config_kwargs = dict(config_kwargs or {})
+        if block_cache_size:
+            self.block_cache = BlockCache(block_cache_size)
+        if disk_cache_dir:
+            self.disk_cache = DiskCache(disk_cache_dir, **(disk_cache_options or {}))
+        if write_memory_budget is not None:
+            self.write_memory_budget = write_memory_budget
+        if staging_dir:
+            self.staging_dir = staging_dir
+        self.verify_crc64 = verify_crc64
+        if max_concurrency:
+            self.max_concurrency = max_concurrency
+        self.pool_size = pool_size
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.keep_alive = keep_alive
+
+        self._bucket_regions = {}
+        if not secret_id:
+            region, secret_id, secret_key, token, self._bucket_regions = _load_config(conf_path)
+        self._bucket_regions.update(bucket_regions or {})
+        self._credentials = (secret_id, secret_key, token)
+        self.region = region
+        if prewarm:
+            threading.Thread(target=self._prewarm_buckets, args=(prewarm,), name="cosfs-prewarm", daemon=True).start()
+
+    @property
+    def client(self) -> "CosS3Client":
+        """SDK client for the filesystem's own region, created (and the SDK imported) on first use."""
+        self._check_fork()
+        if self._client is None:
+            with _lazy_lock:
+                if self._client is None:
+                    self._client = self._new_client(self.region, *self._credentials)
+        return self._client
+
+    @client.setter
+    def client(self, client):
+        self._client = client
+
+    @property
+    def loop(self):
+        self._check_fork()
+        return self._loop
+
+    def _check_fork(self):
+        if self._pid != os.getpid():
+            with _lazy_lock:
+                if self._pid != os.getpid():
+                    self._after_fork()
+
+    def _after_fork(self):
+        """Drop what a forked child cannot share with its parent.
+
+        The SDK clients hold the parent's pooled connections and the worker
+        pool its threads; both are rebuilt on first use, as is the IO loop.
+        An injected client (no credentials to rebuild it from) is kept.
+        """
+        if not self.asynchronous:
+            self._loop = _loop_after_fork()
+        if self._credentials is not None:
+            self._client = None
+        self._region_clients = None
+        self._session = None
+        self._executor = None
+        self._buffer_pool = self._write_budget = None
+        for cache in (self.block_cache, self.disk_cache):
+            if cache is not None:
+                cache.after_fork()
+        self._pid = os.getpid()
+
+    def __reduce__(self):
+        # Unpickle from the resolved credentials and bucket regions, so the
+        # receiving process neither reads config files nor discovers regions.
+        if self._credentials is None:
+            return super().__reduce__()
+        secret_id, secret_key, token = self._credentials
+        options = dict(self.storage_options, secret_id=secret_id, secret_key=secret_key, token=token,
+                       region=self.region, bucket_regions=dict(self._bucket_regions or {}))
+        return make_instance, (type(self), self.storage_args, options)
+
+    def _new_client(self, region, secret_id, secret_key, token):
+        from qcloud_cos import CosConfig, CosS3Client
+
+        options = {"KeepAlive": self.keep_alive, "PoolMaxSize": self.connection_pool_size}
+        if self.connect_timeout is not None or self.read_timeout is not None:
+            options["Timeout"] = (self.connect_timeout or _SDK_TIMEOUT, self.read_timeout or _SDK_TIMEOUT)
+        options.update(self.config_kwargs)
+        config = CosConfig(Region=region, SecretId=secret_id, SecretKey=secret_key, Token=token, **options)
+        return CosS3Client(config, session=self._http_session(options))
 
-        if secret_id:
-            self.client = CosS3Client(CosConfig(Region=region, SecretId=secret_id, SecretKey=secret_key, Token=token))
-        # coscli config
-        elif os.path.exists(conf_path + "/.cos.yaml"):
-            with open(conf_path + "/.cos.yaml") as f:
-                cli_config = yaml.load(f.read(), Loader=yaml.FullLoader)['cos']
-                if len(cli_config['buckets']) == 0:
-                    raise ValueError("no bucket config found, please check your coscli config file.")
-                region = cli_config['buckets'][0]['region']
-                self.client = CosS3Client(CosConfig(Region=region, SecretId=cli_config['base']['secretid'],
-                                                    SecretKey=cli_config['base']['secretkey'],
-                                                    Token=cli_config['base']['sessiontoken']))
-        # coscmd config
-        elif os.path.exists(conf_path + "/.cos.conf"):
-            with open(conf_path + "/.cos.conf", 'r') as f:
-                cp = ConfigParser()
-                cp.read_file(f)
-                if not cp.has_section('common'):
-                    raise ValueError("[common] section couldn't be found, please check your coscmd config file.")
-                secret_id = cp.get('common', 'secret_id', fallback=cp.get('common', 'access_id', fallback=None))
-                region = cp.get('common', 'region')
-                self.client = CosS3Client(CosConfig(Region=region, SecretId=secret_id,
-                                                    SecretKey=cp.get('common', 'secret_key'),
-                                                    Token=cp.get('common', 'token', fallback=None)))
-        # env variables
-        elif os.environ.get("TENCENTCLOUD_SECRETID"):
-            self.client = CosS3Client(CosConfig(Region=os.environ.get("TENCENTCLOUD_REGION"),
-                                                SecretId=os.environ.get("TENCENTCLOUD_SECRETID"),
-                                                SecretKey=os.environ.get("TENCENTCLOUD_SECRETKEY"),
-                                                Token=os.environ.get("TENCENTCLOUD_SESSIONTOKEN")))
-        else:
-            raise FileNotFoundError("No config file found, see: https://cloud.tencent.com/document/product/436/63144")
+    # ------------------------------------------------------------------
+    # HTTP connections
+    # ------------------------------------------------------------------
+    @property
+    def connection_pool_size(self) -> int:
+        """HTTP connections kept open per COS host (see ``pool_size``)."""
+        return self.pool_size or 2 * self.max_concurrency
 
-        self.region = region
+    def _http_session(self, options):
+        """The ``requests`` session of this filesystem's clients; called with ``_lazy_lock`` held.
+
+        Without one, the SDK binds every client in the process to a single
+        session whose pool is sized by whichever client came first.
+        """
+        if self._session is None:
+            import requests
+
+            session = requests.Session()
+            for scheme in ("http://", "https://"):
+                session.mount(scheme, requests.adapters.HTTPAdapter(
+                    pool_connections=options.get("PoolConnections", 10), pool_maxsize=options["PoolMaxSize"]))
+            self._session = session
+        return self._session
+
+    def prewarm_connections(self, bucket: str, connections: Optional[int] = None) -> int:
+        """Open *connections* (default: the pool size) keep-alive connections to *bucket*.
+
+        As many HEAD Bucket requests are sent at once; their connections
+        stay in the pool for the requests that follow.  Returns how many
+        were answered, errors included: a 403 still leaves its connection
+        open.
+        """
+        connections = min(connections or self.connection_pool_size, self.connection_pool_size)
+        client = self._client_for(bucket)
+        start = threading.Barrier(connections)
+
+        def head(_):
+            try:
+                start.wait(timeout=10)
+            except threading.BrokenBarrierError:
+                pass
+            try:
+                client.head_bucket(Bucket=bucket)
+            except _cos_service_error():
+                pass
+            except Exception as e:  # pylint: disable=broad-except
+                logger.debug("Pre-warming a connection to %s failed: %s", bucket, e)
+                return False
+            return True
+
+        with ThreadPoolExecutor(connections, thread_name_prefix="cosfs-prewarm") as pool:
+            return sum(pool.map(head, range(connections)))
+
+    def _prewarm_buckets(self, connections):
+        for bucket in list(self._bucket_regions or ()):
+            self.prewarm_connections(bucket, connections)
+
+    # ------------------------------------------------------------------
+    # Region routing
+    # ------------------------------------------------------------------
+    def bucket_region(self, bucket: str) -> Optional[str]:
+        """Region of *bucket*, discovered on first use and cached.
+
+        The region comes from ``bucket_regions`` or the coscli config, else
+        from the ``x-cos-bucket-region`` header of a HEAD Bucket, else from
+        the bucket locations in the account's bucket list.  A bucket that
+        cannot be found is taken to be in the filesystem's own region.
+        """
+        # Entries are only ever added, so a hit needs no lock.
+        region = (self._bucket_regions or {}).get(bucket)
+        if region is None:
+            region = self._discover_region(bucket)
+            with _lazy_lock:
+                if self._bucket_regions is None:
+                    self._bucket_regions = {}
+                region = self._bucket_regions.setdefault(bucket, region)
+        return region
+
+    def _discover_region(self, bucket):
+        try:
+            region = _header(_call_cos(self.client.head_bucket, Bucket=bucket, retries=self.retries),
+                             "x-cos-bucket-region")
+            if region:
+                return region
+        except OSError:
+            pass  # no such bucket at this endpoint, or no permission to HEAD it
+        try:
+            resp = _call_cos(self.client.list_buckets, retries=self.retries)
+        except OSError:
+            return self.region
+        else:
+            self._learn_regions(resp)
+        return self._bucket_regions.get(bucket, self.region)
+
+    def _learn_regions(self, resp):
+        """Cache the bucket locations of a ``list_buckets`` response."""
+        with _lazy_lock:
+            if self._bucket_regions is None:
+                self._bucket_regions = {}
+            for bucket in resp.get("Buckets", {}).get("Bucket", []):
+                if bucket.get("Location"):
+                    self._bucket_regions.setdefault(bucket["Name"], bucket["Location"])
+
+    def _routed_region(self, bucket):
+        # Routing needs credentials for the extra clients, and an explicit endpoint serves every bucket.
+        if self._credentials is None or self.config_kwargs.get("Endpoint"):
+            return self.region
+        return self.bucket_region(bucket)
+
+    def _client_for(self, path):
+        """Client for the region of the bucket of *path* (a full path or a bucket name)."""
+        self._check_fork()
+        region = self._routed_region(self.split_path(path)[0])
+        if not region or region == self.region:
+            return self.client
+        client = (self._region_clients or {}).get(region)
+        if client is not None:
+            return client
+        with _lazy_lock:
+            if self._region_clients is None:
+                self._region_clients = {}
+            client = self._region_clients.get(region)
+            if client is None:
+                client = self._region_clients[region] = self._new_client(region, *self._credentials)
+        return client
 
     # ------------------------------------------------------------------
     # Path helpers
@@ -192,78 +737,331 @@ class COSFileSystem(AsyncFileSystem):
     # ------------------------------------------------------------------
     # Core read methods
     # ------------------------------------------------------------------
-    async def _cat_file(self, path, start=None, end=None, **kwargs):
-        """Fetch the contents (or a byte-range slice) of a COS object."""
-        bucket, key = self.split_path(path)
-        kw = {}
+    async def _cat_file(self, path, start=None, end=None, etag=None, **kwargs):
+        """Fetch the contents (or a byte-range slice) of a COS object.
+
+        With *etag*, the read only succeeds while the object still has that
+        ETag (``If-Match``); otherwise ``FileExpired`` is raised.  The GET
+        runs on the worker pool, so ``cat`` of many small files overlaps.
+        """
+        return await self._run_in_pool(self._get_object, *self.split_path(path), start, end, etag)
+
+    def _get_object(self, bucket, key, start=None, end=None, etag=None):
+        """Blocking GET of a whole object or a slice of it; runs on the worker pool."""
+        if self.disk_cache is not None:
+            return self._disk_read(bucket, key, start, end, etag=etag)
+        kw = {"IfMatch": etag} if etag else {}
         if start is not None or end is not None:
             # COS Range header uses inclusive end: bytes=start-(end-1)
             range_start = start or 0
             range_end = f"{end - 1}" if end is not None else ""
             kw["Range"] = f"bytes={range_start}-{range_end}"
-        res = _call_cos(self.client.get_object, Bucket=bucket, Key=key, **kw, retries=self.retries)
-        return res["Body"].get_raw_stream().read()
+        res = _call_cos(self._client_for(bucket).get_object, Bucket=bucket, Key=key, **kw, retries=self.retries)
+        return self._read_body(bucket, key, res)
+
+    async def _cat_ranges(self, paths, starts, ends, max_gap=None, batch_size=None, *, max_block=None, etag=None,
+                          views=False, **kwargs):
+        """Fetch many byte ranges, coalescing nearby ranges of the same object.
+
+        Ranges of one object are sorted and merged into windows (see
+        ``cat_ranges_max_gap`` / ``cat_ranges_max_block``, overridable per
+        call with *max_gap* / *max_block*); each window is a single ranged
+        GET and the windows are fetched concurrently.  Ranges with an open
+        or negative bound are passed to ``_cat_file`` unmerged.  Results are
+        returned in request order.  *etag* pins every GET with ``If-Match``
+        and is meant for ranges of a single object.
+
+        A range that is a whole response is returned as is; one cut from a
+        merged window is copied out as ``bytes`` so that keeping it does not
+        keep the window alive.  With *views* such ranges are returned as
+        ``memoryview`` slices of the window instead, without a copy.
+        """
+        if not isinstance(paths, list):
+            raise TypeError("paths must be a list")
+        if not isinstance(starts, list):
+            starts = [starts] * len(paths)
+        if not isinstance(ends, list):
+            ends = [ends] * len(paths)
+        if len(starts) != len(paths) or len(ends) != len(paths):
+            raise ValueError("paths, starts and ends must have the same length")
+        max_gap = self.cat_ranges_max_gap if max_gap is None else max_gap
+        max_block = self.cat_ranges_max_block if max_block is None else max_block
+
+        by_path: Dict[str, List[int]] = {}
+        coros, placements = [], []
+        out: List[Optional[Union[bytes, memoryview]]] = [None] * len(paths)
+        for i, (path, start, end) in enumerate(zip(paths, starts, ends)):
+            start = start or 0
+            if end is None or start < 0 or end < 0:
+                coros.append(self._cat_file(path, start=starts[i], end=end, etag=etag, **kwargs))
+                placements.append([(i, 0, None)])
+            elif end <= start:
+                out[i] = b""
+            else:
+                by_path.setdefault(path, []).append(i)
+
+        for path, indices in by_path.items():
+            bucket, key = self.split_path(path)
+            ranges = [(starts[i] or 0, ends[i]) for i in indices]
+            for w_start, w_end, members in _merge_ranges(ranges, max_gap, max_block):
+                coros.append(self._run_in_pool(self._get_range, bucket, key, w_start, w_end, etag))
+                placements.append([(indices[m], ranges[m][0] - w_start, ranges[m][1] - w_start) for m in members])
+
+        results = await _run_coros_in_chunks(coros, batch_size=batch_size or self.batch_size, nofiles=True)
+        for data, members in zip(results, placements):
+            i, lo, hi = members[0]
+            if len(members) == 1 and lo == 0 and (hi is None or hi >= len(data)):
+                # The response is exactly the requested range: hand it over as is.
+                out[i] = data
+                continue
+            view = memoryview(data)
+            for i, lo, hi in members:
+                out[i] = view[lo:hi] if views else bytes(view[lo:hi])
+        return out
+
+    def _get_range(self, bucket, key, start, end, etag=None):
+        """Blocking ranged GET of ``[start, end)``; runs on the worker pool."""
+        if self.disk_cache is not None:
+            return self._disk_read(bucket, key, start, end, etag=etag)
+        kw = {"IfMatch": etag} if etag else {}
+        res = _call_cos(self._client_for(bucket).get_object, Bucket=bucket, Key=key,
+                        Range=f"bytes={start}-{end - 1}", **kw, retries=self.retries)
+        return self._read_body(bucket, key, res)
+
+    def _read_body(self, bucket, key, res):
+        body = res["Body"].get_raw_stream().read()
+        if self.verify_crc64 and _is_whole_body(res, body):
+            self._check_crc64(f"{bucket}/{key}", crc64(body), res)
+        return body
+
+    def _check_crc64(self, path, local, resp):
+        """Raise ``ChecksumMismatch`` if *resp* reports a CRC64 other than *local*."""
+        remote = _crc64_header(resp)
+        if remote is not None and remote != local:
+            raise ChecksumMismatch(f"CRC64 mismatch for {path}: {local} locally, {remote} on COS", path=path,
+                                   local=local, remote=remote)
+
+    @property
+    def buffer_pool(self) -> BufferPool:
+        """Pool of part buffers reused by files opened for writing."""
+        budget = self.write_budget
+        with _lazy_lock:
+            if self._buffer_pool is None:
+                self._buffer_pool = BufferPool(self.buffer_pool_size, budget=budget)
+        return self._buffer_pool
+
+    @property
+    def write_budget(self) -> Optional[MemoryBudget]:
+        """Shared ``MemoryBudget`` of the write buffers, if ``write_memory_budget`` is set."""
+        with _lazy_lock:
+            if self._write_budget is None and self.write_memory_budget is not None:
+                self._write_budget = MemoryBudget(self.write_memory_budget)
+        return self._write_budget
+
+    async def _run_in_pool(self, func, *args, **kwargs):
+        """Run blocking *func* on the worker pool without stalling the event loop."""
+        self._check_fork()
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(self.max_concurrency, thread_name_prefix="cosfs")
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, functools.partial(func, *args, **kwargs))
 
     async def _get_file(self, rpath, lpath, **kwargs):
+        await self._run_in_pool(self._download, rpath, lpath)
+
+    def _download(self, rpath, lpath):
         bucket, key = self.split_path(rpath)
         norm_lpath = lpath.rstrip("/")
         if lpath.endswith("/") or os.path.isdir(lpath):
             norm_lpath += "/" + key.split("/")[-1]
-        _call_cos(self.client.download_file, Bucket=bucket, Key=key, DestFilePath=norm_lpath, retries=self.retries)
+        if self.disk_cache is not None:
+            with open(norm_lpath, "wb") as f:
+                self.disk_cache.copy_to(bucket, key, f, functools.partial(self._disk_head, bucket, key),
+                                        functools.partial(self._disk_fetch, bucket, key))
+            return
+        if self.verify_crc64:
+            self._download_verified(bucket, key, norm_lpath)
+            return
+        _call_cos(self._client_for(bucket).download_file, Bucket=bucket, Key=key, DestFilePath=norm_lpath,
+                  retries=self.retries)
+
+    def _download_verified(self, bucket, key, lpath):
+        """Download an object to *lpath*, checksumming it on the way; a corrupt file is removed.
+
+        The first ``download_part_size`` bytes come with the object's size,
+        ETag and CRC64 (from a HEAD should the ranged GET lack it).  The
+        rest is fetched as ranged GETs pinned to that ETag,
+        ``download_threads`` at a time, and the checksums of the parts are
+        combined.
+        """
+        client = self._client_for(bucket)
+        part_size = self.download_part_size
+        try:
+            first = _call_cos(client.get_object, Bucket=bucket, Key=key, Range=f"bytes=0-{part_size - 1}",
+                              retries=self.retries)
+        except OSError as e:
+            if _error_code(e) != "InvalidRange":
+                raise
+            # Any byte range of an empty object is unsatisfiable.
+            first = _call_cos(client.get_object, Bucket=bucket, Key=key, retries=self.retries)
+        with open(lpath, "wb") as f:
+            running = _copy_body(first, f)
+        m = _CONTENT_RANGE.match(first.get("Content-Range", ""))
+        size = int(m.group(2)) if m else running.length
+        ranges = [(start, min(start + part_size, size)) for start in range(running.length, size, part_size)]
+        if ranges:
+            fetch = functools.partial(self._download_part, client, bucket, key, lpath, etag=first.get("ETag"))
+            with ThreadPoolExecutor(min(self.download_threads, len(ranges)), thread_name_prefix="cosfs-get") as pool:
+                for (start, end), crc in zip(ranges, pool.map(lambda r: fetch(*r), ranges)):
+                    running.append(crc, end - start)
+        checked = first
+        if m is not None and _crc64_header(first) is None:
+            checked = _call_cos(client.head_object, Bucket=bucket, Key=key, retries=self.retries)
+        try:
+            self._check_crc64(f"{bucket}/{key}", running.crc, checked)
+        except ChecksumMismatch:
+            os.remove(lpath)
+            raise
+
+    def _download_part(self, client, bucket, key, lpath, start, end, etag=None):
+        """Write bytes ``[start, end)`` of an object into *lpath* at *start*; returns their CRC64."""
+        kw = {"IfMatch": etag} if etag else {}
+        res = _call_cos(client.get_object, Bucket=bucket, Key=key, Range=f"bytes={start}-{end - 1}", **kw,
+                        retries=self.retries)
+        with open(lpath, "r+b") as f:
+            f.seek(start)
+            return _copy_body(res, f).crc
+
+    # ------------------------------------------------------------------
+    # Disk cache plumbing
+    # ------------------------------------------------------------------
+    def _disk_head(self, bucket, key):
+        out = _call_cos(self._client_for(bucket).head_object, Bucket=bucket, Key=key, retries=self.retries)
+        return out["ETag"], int(out["Content-Length"])
+
+    def _disk_fetch(self, bucket, key, start, end, etag=None):
+        kw = {"IfMatch": etag} if etag else {}
+        res = _call_cos(self._client_for(bucket).get_object, Bucket=bucket, Key=key,
+                        Range=f"bytes={start}-{end - 1}", **kw, retries=self.retries)
+        return res["Body"].get_raw_stream().read(), res.get("ETag")
+
+    def _disk_read(self, bucket, key, start, end, etag=None):
+        """Read ``[start, end)`` (slice semantics) through the disk cache, optionally pinned to *etag*."""
+        return self.disk_cache.read(bucket, key, start, end, functools.partial(self._disk_head, bucket, key),
+                                    functools.partial(self._disk_fetch, bucket, key, etag=etag), etag=etag)
 
     # ------------------------------------------------------------------
     # Core write methods
     # ------------------------------------------------------------------
-    async def _pipe_file(self, path, value, **kwargs):
+    async def _pipe_file(self, path, value, skip_unchanged=None, **kwargs):
         """Upload *value* (bytes) to *path* on COS.
 
         Objects smaller than ``min(5 GB, 2 × block_size)`` are sent in a
-        single PUT request; larger ones use multipart upload.
+        single PUT request; larger ones use multipart upload.  With
+        *skip_unchanged* (default: the ``skip_unchanged`` attribute) nothing
+        is sent when the object already holds *value*; see ``_unchanged``.
         """
+        if self.skip_unchanged if skip_unchanged is None else skip_unchanged:
+            if await self._run_in_pool(self._unchanged, path, len(value), functools.partial(crc64, value),
+                                       lambda: hashlib.md5(value).hexdigest()):
+                return
         bucket, key = self.split_path(path)
+        client = self._client_for(bucket)
         block_size = kwargs.pop("block_size", self.blocksize or 5 * 2 ** 20)
         block_size = _ensure_part_size(len(value), block_size)
 
-        self.invalidate_cache(self._parent(path))
+        self._invalidate_object(path)
 
         # Single PUT for small objects (COS caps a single PUT at 5 GB).
         if len(value) < min(5 * 2 ** 30, 2 * block_size):
-            _call_cos(self.client.put_object, Bucket=bucket, Key=key, Body=value, retries=self.retries, **kwargs)
+            out = await self._run_in_pool(_call_cos, client.put_object, Bucket=bucket, Key=key, Body=value,
+                                          retries=self.retries, **kwargs)
+            if self.verify_crc64:
+                self._check_crc64(path, crc64(value), out)
             return
 
-        # Multipart upload for larger objects
-        mpu = _call_cos(self.client.create_multipart_upload, Bucket=bucket, Key=key, retries=self.retries, **kwargs)
+        # Multipart upload for larger objects; parts are sent as views of *value*.
+        mpu = await self._run_in_pool(_call_cos, client.create_multipart_upload, Bucket=bucket, Key=key,
+                                      retries=self.retries, **kwargs)
         upload_id = mpu["UploadId"]
         parts = []
+        view = memoryview(value)
+        running = CRC64()
         try:
             for i, off in enumerate(range(0, len(value), block_size)):
                 part_number = i + 1
-                data = value[off:off + block_size]
-                out = _call_cos(
-                    self.client.upload_part,
+                data = as_body(view[off:off + block_size])
+                out = await self._run_in_pool(
+                    _call_cos, client.upload_part,
                     Bucket=bucket, Key=key, Body=data,
                     PartNumber=part_number, UploadId=upload_id,
                     retries=self.retries,
                 )
+                if self.verify_crc64:
+                    part_crc = crc64(view[off:off + block_size])
+                    self._check_crc64(f"{path} part {part_number}", part_crc, out)
+                    running.append(part_crc, len(data))
                 parts.append({"ETag": out["ETag"], "PartNumber": part_number})
-            _call_cos(
-                self.client.complete_multipart_upload,
+            out = await self._run_in_pool(
+                _call_cos, client.complete_multipart_upload,
                 Bucket=bucket, Key=key, UploadId=upload_id,
                 MultipartUpload={"Part": parts},
                 retries=self.retries,
             )
-        except (CosServiceError, OSError, RuntimeError):
+            if self.verify_crc64:
+                self._check_crc64(path, running.crc, out)
+        except (_cos_service_error(), OSError, RuntimeError):
             # Clean up failed multipart upload
             try:
-                self.client.abort_multipart_upload(Bucket=bucket, Key=key, UploadId=upload_id)
-            except (CosServiceError, OSError):
+                await self._run_in_pool(client.abort_multipart_upload, Bucket=bucket, Key=key, UploadId=upload_id)
+            except (_cos_service_error(), OSError):
                 logger.warning("Failed to abort multipart upload %s for %s/%s", upload_id, bucket, key)
             raise
 
-    async def _put_file(self, lpath, rpath):
+    async def _put_file(self, lpath, rpath, skip_unchanged=None, **kwargs):
+        skip = self.skip_unchanged if skip_unchanged is None else skip_unchanged
+        await self._run_in_pool(self._upload, lpath, rpath, skip)
+
+    def _upload(self, lpath, rpath, skip_unchanged=False):
         if rpath.endswith("/"):
             rpath += lpath.split("/")[-1]
-        _call_cos(self.client.upload_file, **self.parse_path(rpath), LocalFilePath=lpath, retries=self.retries)
+        if skip_unchanged and self._unchanged(rpath, os.path.getsize(lpath), functools.partial(file_crc64, lpath),
+                                              functools.partial(file_md5, lpath)):
+            return
+        _call_cos(self._client_for(rpath).upload_file, **self.parse_path(rpath), LocalFilePath=lpath,
+                  retries=self.retries)
+        self._invalidate_object(rpath)
+
+    def _unchanged(self, path, size, crc, md5) -> bool:
+        """Whether the object at *path* already holds *size* bytes whose checksums *crc*/*md5* compute.
+
+        *crc* and *md5* are called only when needed.  A cached listing of the
+        parent directory answers without a request when it settles the
+        question: the object is missing, its size differs, or its ETag is a
+        plain MD5.  Otherwise a HEAD fetches the size and the CRC64 COS
+        keeps for every object, multipart ones included; with neither a
+        CRC64 nor a plain-MD5 ETag the object counts as changed.
+        """
+        name = self._strip_protocol(path).rstrip("/")
+        listing = self.dircache.get(self._parent(name))
+        if isinstance(listing, list):
+            entry = next((e for e in listing if e["name"] == name), None)
+            if entry is None or entry["type"] != "file" or entry["size"] != size:
+                return False
+            etag = entry.get("ETag", "").strip('"')
+            if etag and "-" not in etag:
+                return md5() == etag
+        try:
+            out = _call_cos(self._client_for(path).head_object, **self.parse_path(path), retries=self.retries)
+        except FileNotFoundError:
+            return False
+        if int(out["Content-Length"]) != size:
+            return False
+        remote = _crc64_header(out)
+        if remote is not None:
+            return crc() == remote
+        etag = out.get("ETag", "").strip('"')
+        return bool(etag) and "-" not in etag and md5() == etag
 
     # ------------------------------------------------------------------
     # Info / existence
@@ -274,11 +1072,13 @@ class COSFileSystem(AsyncFileSystem):
             # Try as a file first
             if not path.endswith("/"):
                 try:
-                    exists = _call_cos(self.client.object_exists, Bucket=bucket, Key=key, retries=self.retries)
-                except (CosServiceError, OSError):
+                    exists = await self._run_in_pool(_call_cos, self._client_for(bucket).object_exists,
+                                                     Bucket=bucket, Key=key, retries=self.retries)
+                except (_cos_service_error(), OSError):
                     exists = False
                 if exists:
-                    out = _call_cos(self.client.head_object, Bucket=bucket, Key=key, retries=self.retries)
+                    out = await self._run_in_pool(_call_cos, self._client_for(bucket).head_object, Bucket=bucket,
+                                                  Key=key, retries=self.retries)
                     return {
                         "ETag": out["ETag"],
                         "Key": f"{bucket}/{key}",
@@ -292,9 +1092,9 @@ class COSFileSystem(AsyncFileSystem):
 
             # Try as a directory prefix
             prefix = key.rstrip("/") + "/"
-            resp = _call_cos(
-                self.client.list_objects, Bucket=bucket, Prefix=prefix, Delimiter="/", MaxKeys=1,
-                retries=self.retries,
+            resp = await self._run_in_pool(
+                _call_cos, self._client_for(bucket).list_objects, Bucket=bucket, Prefix=prefix, Delimiter="/",
+                MaxKeys=1, retries=self.retries,
             )
             if resp.get("Contents") or resp.get("CommonPrefixes"):
                 return {
@@ -312,7 +1112,8 @@ class COSFileSystem(AsyncFileSystem):
             if bucket:
                 # Verify bucket exists by listing with maxkeys=0
                 try:
-                    _call_cos(self.client.list_objects, Bucket=bucket, MaxKeys=0, retries=self.retries)
+                    await self._run_in_pool(_call_cos, self._client_for(bucket).list_objects, Bucket=bucket,
+                                            MaxKeys=0, retries=self.retries)
                 except FileNotFoundError:
                     raise FileNotFoundError(path)
                 return {
@@ -335,25 +1136,33 @@ class COSFileSystem(AsyncFileSystem):
     # ------------------------------------------------------------------
     # Directory listing (with pagination!)
     # ------------------------------------------------------------------
-    def _paginated_list(self, bucket_name, list_prefix):
-        """Fetch all objects and common prefixes under *list_prefix* with pagination."""
-        all_contents = []
-        all_prefixes = []
+    def _iter_list_pages(self, bucket_name, list_prefix, delimiter="/"):
+        """Yield the ``list_objects`` pages under *list_prefix* as they arrive."""
         marker = ""
         while True:
             resp = _call_cos(
-                self.client.list_objects,
-                Bucket=bucket_name, Prefix=list_prefix, Delimiter="/", Marker=marker,
+                self._client_for(bucket_name).list_objects,
+                Bucket=bucket_name, Prefix=list_prefix, Delimiter=delimiter, Marker=marker,
                 retries=self.retries,
             )
+            yield resp
+            if resp.get("IsTruncated") != "true":
+                break
+            marker = resp.get("NextMarker", "")
+            if not marker:
+                last = [o["Key"] for o in resp.get("Contents", [])[-1:]]
+                last += [p["Prefix"] for p in resp.get("CommonPrefixes", [])[-1:]]
+                if not last:
+                    break
+                marker = max(last)
+
+    def _paginated_list(self, bucket_name, list_prefix):
+        """Fetch all objects and common prefixes under *list_prefix* with pagination."""
+        all_contents = []
+        all_prefixes = []
+        for resp in self._iter_list_pages(bucket_name, list_prefix):
             all_contents.extend(resp.get("Contents", []))
             all_prefixes.extend(resp.get("CommonPrefixes", []))
-            if resp.get("IsTruncated") == "true":
-                marker = resp.get("NextMarker", "")
-                if not marker and all_contents:
-                    marker = all_contents[-1]["Key"]
-            else:
-                break
         return all_contents, all_prefixes
 
     @staticmethod
@@ -375,13 +1184,30 @@ class COSFileSystem(AsyncFileSystem):
             entry["ETag"] = obj["ETag"]
         return entry
 
+    @staticmethod
+    def _prefix_to_entry(bucket_name, prefix):
+        """Convert a COS common prefix into an fsspec directory info dict."""
+        name = f"{bucket_name}/{prefix}".rstrip("/")
+        return {
+            "name": name,
+            "Key": name,
+            "type": "directory",
+            "size": 0,
+            "Size": 0,
+            "StorageClass": "DIRECTORY",
+        }
+
     async def _ls(self, path, detail=True, **kwargs):
+        info = await self._run_in_pool(self._lsdir, path)
+        if detail:
+            return info
+        return [o["name"] for o in info]
+
+    def _lsdir(self, path):
+        """Detailed listing of *path* (the buckets at the root), through the dircache."""
         norm_path = self._strip_protocol(path).strip("/")
-        if norm_path in self.dircache:
-            out = copy.deepcopy(self.dircache[norm_path])
-            if detail:
-                return out
-            return [o["name"] for o in out]
+        if isinstance(self.dircache.get(norm_path), list):
+            return copy.deepcopy(self.dircache[norm_path])
 
         bucket_name, prefix = self.split_path(path)
         if bucket_name:
@@ -389,18 +1215,10 @@ class COSFileSystem(AsyncFileSystem):
             all_contents, all_prefixes = self._paginated_list(bucket_name, list_prefix)
 
             info = [self._obj_to_entry(bucket_name, obj) for obj in all_contents]
-            for obj in all_prefixes:
-                pfx = obj["Prefix"]
-                info.append({
-                    "name": f"{bucket_name}/{pfx}".rstrip("/"),
-                    "Key": f"{bucket_name}/{pfx}".rstrip("/"),
-                    "type": "directory",
-                    "size": 0,
-                    "Size": 0,
-                    "StorageClass": "DIRECTORY",
-                })
+            info += [self._prefix_to_entry(bucket_name, obj["Prefix"]) for obj in all_prefixes]
         else:
             resp = _call_cos(self.client.list_buckets, retries=self.retries)
+            self._learn_regions(resp)
             info = [{
                 "name": bucket["Name"],
                 "Key": bucket["Name"],
@@ -412,9 +1230,77 @@ class COSFileSystem(AsyncFileSystem):
             } for bucket in resp.get("Buckets", {}).get("Bucket", [])]
 
         self.dircache[norm_path] = info
-        if detail:
-            return info
-        return [o["name"] for o in info]
+        return info
+
+    # ------------------------------------------------------------------
+    # Walk — concurrent delimiter listings
+    # ------------------------------------------------------------------
+    async def _walk(self, path, maxdepth=None, ordered=True, **kwargs):
+        """Walk the tree below *path*, listing up to ``max_concurrency`` directories at once.
+
+        Listings of the next ``walk_lookahead`` directories to be yielded are
+        issued ahead of the consumer on the worker pool, and each goes
+        through the dircache.  Results come in the same order as fsspec's
+        depth-first walk; with ``ordered=False`` a directory is yielded as
+        soon as its listing completes instead.
+        """
+        path = self._strip_protocol(path).rstrip("/")
+        detail = kwargs.pop("detail", False)
+        tasks = {}
+
+        def start(dirpath, depth):
+            tasks[dirpath] = asyncio.ensure_future(listed(dirpath, depth))
+
+        async def listed(dirpath, depth):
+            try:
+                listing = await self._run_in_pool(self._lsdir, dirpath)
+            except FileNotFoundError:
+                listing = []
+            dirs, files = _split_listing(dirpath, listing)
+            subdirs = [] if maxdepth is not None and depth >= maxdepth else [info["name"] for info in dirs.values()]
+            # List the children before the consumer gets to them, within the lookahead.
+            for subdir in subdirs:
+                if len(tasks) >= self.walk_lookahead:
+                    break
+                start(subdir, depth + 1)
+            result = (dirpath, dirs, files) if detail else (dirpath, list(dirs), list(files))
+            return result, [(subdir, depth + 1) for subdir in subdirs]
+
+        try:
+            if ordered:
+                order = collections.deque([(path, 1)])
+                while order:
+                    dirpath, depth = order.popleft()
+                    if dirpath not in tasks:
+                        start(dirpath, depth)
+                    result, subdirs = await tasks.pop(dirpath)
+                    yield result
+                    order.extendleft(reversed(subdirs))
+            else:
+                pending = collections.deque([(path, 1)])
+                while pending or tasks:
+                    while pending and len(tasks) < self.walk_lookahead:
+                        start(*pending.popleft())
+                    done, _ = await asyncio.wait(tasks.values(), return_when=asyncio.FIRST_COMPLETED)
+                    for dirpath in sorted(d for d, task in tasks.items() if task in done):
+                        result, subdirs = await tasks.pop(dirpath)
+                        yield result
+                        pending.extend(sub for sub in subdirs if sub[0] not in tasks)
+        finally:
+            for task in tasks.values():
+                task.cancel()
+
+    def walk(self, path, maxdepth=None, **kwargs):
+        """Synchronous ``walk`` driven by the concurrent ``_walk``."""
+        walker = self._walk(path, maxdepth=maxdepth, **kwargs)
+        try:
+            while True:
+                try:
+                    yield sync(self.loop, walker.__anext__)
+                except StopAsyncIteration:
+                    return
+        finally:
+            sync(self.loop, walker.aclose)
 
     # ------------------------------------------------------------------
     # Recursive listing — single-stream flat listing (no Delimiter)
@@ -425,7 +1311,7 @@ class COSFileSystem(AsyncFileSystem):
         marker = ""
         while True:
             resp = _call_cos(
-                self.client.list_objects,
+                self._client_for(bucket).list_objects,
                 Bucket=bucket, Prefix=search_prefix, Marker=marker,
                 retries=self.retries,
             )
@@ -506,7 +1392,7 @@ class COSFileSystem(AsyncFileSystem):
             raise ValueError("Cannot recursively list all buckets")
 
         search_prefix = (key + "/" + prefix) if key else prefix
-        all_objects = self._flat_list(bucket, search_prefix)
+        all_objects = await self._run_in_pool(self._flat_list, bucket, search_prefix)
 
         if withdirs:
             all_objects = self._synthesize_dirs(bucket, all_objects, prefix)
@@ -515,13 +1401,261 @@ class COSFileSystem(AsyncFileSystem):
             return {o["name"]: o for o in all_objects}
         return [o["name"] for o in all_objects]
 
+    # ------------------------------------------------------------------
+    # Usage statistics — streamed over listing pages
+    # ------------------------------------------------------------------
+    def _scan_prefix(self, bucket, prefix, maxdepth=None, sizes=None):
+        """Aggregate every object below *prefix*, one listing page at a time.
+
+        Objects more than *maxdepth* levels below *prefix* are skipped; when
+        *sizes* is a dict, each object's size is also recorded in it by path.
+        """
+        stats = _new_stats()
+        for resp in self._iter_list_pages(bucket, prefix, delimiter=""):
+            for obj in resp.get("Contents", []):
+                key = obj["Key"]
+                if _is_dir_marker(obj) or maxdepth is not None and key.count("/", len(prefix)) >= maxdepth:
+                    continue
+                size = int(obj.get("Size", 0))
+                _add_object_stats(stats, size, obj.get("StorageClass", "STANDARD"))
+                if sizes is not None:
+                    sizes[f"{bucket}/{key}"] = size
+        return stats
+
+    def _scan_level(self, bucket, prefix):
+        """Aggregate the objects directly below *prefix*; also return its common prefixes."""
+        stats = _new_stats()
+        subprefixes = []
+        for resp in self._iter_list_pages(bucket, prefix):
+            for obj in resp.get("Contents", []):
+                if not _is_dir_marker(obj):
+                    _add_object_stats(stats, int(obj.get("Size", 0)), obj.get("StorageClass", "STANDARD"))
+            subprefixes.extend(p["Prefix"] for p in resp.get("CommonPrefixes", []))
+        return stats, subprefixes
+
+    async def _du(self, path, total=True, maxdepth=None, **kwargs):
+        bucket, key = self.split_path(path)
+        if not bucket:
+            raise ValueError("Cannot compute usage of all buckets")
+        key = key.strip("/")
+        sizes = None if total else {}
+        stats = await self._run_in_pool(self._scan_prefix, bucket, key + "/" if key else "", maxdepth, sizes)
+        if not stats["count"] and key:
+            # Not a directory: fsspec's du also accounts for a single file.
+            try:
+                info = await self._info(path)
+            except FileNotFoundError:
+                info = {}
+            if info.get("type") == "file":
+                return info["size"] if total else {info["name"]: info["size"]}
+        return stats["size"] if total else sizes
+
+    def prefix_stats(self, path: str, depth: Optional[int] = None) -> dict:
+        """Object count, bytes, size histogram and storage-class breakdown below *path*.
+
+        The listing is streamed and aggregated page by page, so memory does
+        not grow with the number of objects.
+
+        Parameters
+        ----------
+        path : str
+            Bucket or directory to scan.
+        depth : int, optional
+            Group the statistics by the directories *depth* levels below
+            *path*.  Those partitions are scanned concurrently; objects
+            higher up are counted under the directory that holds them.
+
+        Returns
+        -------
+        dict
+            ``{"count", "size", "histogram", "storage_classes"}``, where
+            ``histogram`` maps the smallest power of two holding an object
+            to a count and ``storage_classes`` maps each class to its own
+            ``{"count", "size"}``.  With *depth*, a dict of those keyed by
+            directory path.
+        """
+        return sync(self.loop, self._prefix_stats, path, depth=depth)
+
+    async def _prefix_stats(self, path, depth=None):
+        bucket, key = self.split_path(path)
+        if not bucket:
+            raise ValueError("Cannot compute usage of all buckets")
+        key = key.strip("/")
+        level = [key + "/" if key else ""]
+        if depth is None:
+            return await self._run_in_pool(self._scan_prefix, bucket, level[0])
+
+        def name(prefix):
+            return f"{bucket}/{prefix}".rstrip("/")
+
+        groups = {}
+        for _ in range(depth):
+            found = await _run_coros_in_chunks([self._run_in_pool(self._scan_level, bucket, p) for p in level],
+                                               batch_size=self.batch_size, nofiles=True)
+            for prefix, (stats, _) in zip(level, found):
+                if stats["count"]:
+                    groups[name(prefix)] = stats
+            level = [sub for _, subprefixes in found for sub in subprefixes]
+        found = await _run_coros_in_chunks([self._run_in_pool(self._scan_prefix, bucket, p) for p in level],
+                                           batch_size=self.batch_size, nofiles=True)
+        groups.update((name(prefix), stats) for prefix, stats in zip(level, found))
+        return {group: groups[group] for group in sorted(groups)}
+
+    # ------------------------------------------------------------------
+    # Incremental sync
+    # ------------------------------------------------------------------
+    def sync(self, src: str, dst: str, delete: bool = False, dry_run: bool = False, checksum: bool = False,
+             callback=_DEFAULT_CALLBACK, batch_size: Optional[int] = None) -> List[dict]:
+        """Bring *dst* in line with *src*, transferring only the files that differ.
+
+        One side is a ``cosn://`` URL, the other a local directory.  Both are
+        listed as streams and merged; see ``cosfs.sync`` for how files are
+        compared.
+
+        Parameters
+        ----------
+        src, dst : str
+            Source and destination; exactly one of them a ``cosn://`` URL.
+        delete : bool
+            Also delete destination files that are missing from *src*.
+        dry_run : bool
+            Only plan: return the actions without running them.
+        checksum : bool
+            Compare files of equal size by content rather than modification
+            time: by MD5 against a plain-MD5 ETag, otherwise by CRC64
+            against the object's (one HEAD per multipart object).
+        callback : fsspec.callbacks.Callback, optional
+            Sized to the number of actions and updated as each completes.
+        batch_size : int, optional
+            Transfers scheduled at once; the worker pool bounds how many run
+            concurrently.
+
+        Returns
+        -------
+        list of dict
+            The actions, each with ``action`` (``"upload"``, ``"download"`` or
+            ``"delete"``), ``src``, ``dst`` and ``size``.
+        """
+        remote_src = src.startswith(f"{self.protocol}://")
+        if remote_src == dst.startswith(f"{self.protocol}://"):
+            raise ValueError(f"sync needs one {self.protocol}:// URL and one local directory")
+        remote, local = (src, dst) if remote_src else (dst, src)
+        local = local[len("file://"):] if local.startswith("file://") else local
+        bucket, key = self.split_path(remote)
+        prefix = key.strip("/") + "/" if key.strip("/") else ""
+        remote_listing = remote_entries(self._iter_list_pages(bucket, prefix, delimiter=""), bucket, prefix)
+        def same_content(remote, local):
+            return self._unchanged(remote["path"], local["size"], functools.partial(file_crc64, local["path"]),
+                                   functools.partial(file_md5, local["path"]))
+
+        if remote_src:
+            actions = plan_sync(remote_listing, local_entries(local), "download",
+                                lambda rel: os.path.join(local, *rel.split("/")), delete, checksum, same_content)
+        else:
+            actions = plan_sync(local_entries(local), remote_listing, "upload",
+                                lambda rel: f"{bucket}/{prefix}{rel}", delete, checksum, same_content)
+        if not dry_run:
+            sync(self.loop, self._run_sync_plan, actions, not remote_src, callback=callback, batch_size=batch_size)
+        return actions
+
+    async def _run_sync_plan(self, actions, remote_dst, callback=_DEFAULT_CALLBACK, batch_size=None):
+        callback.set_size(len(actions))
+
+        async def transfer(action):
+            if action["action"] == "upload":
+                await self._put_file(action["src"], action["dst"])
+            else:
+                os.makedirs(os.path.dirname(action["dst"]), exist_ok=True)
+                await self._get_file(action["src"], action["dst"])
+            callback.relative_update(1)
+
+        copies = [transfer(a) for a in actions if a["action"] != "delete"]
+        await _run_coros_in_chunks(copies, batch_size=batch_size or self.batch_size)
+        deletions = [a["dst"] for a in actions if a["action"] == "delete"]
+        if deletions and remote_dst:
+            await self._rm(deletions)
+        else:
+            for path in deletions:
+                os.remove(path)
+        callback.relative_update(len(deletions))
+
+    # ------------------------------------------------------------------
+    # Glob — literal prefixes pushed down to list_objects
+    # ------------------------------------------------------------------
+    async def _glob(self, path, **kwargs):
+        """Glob one path component at a time.
+
+        Each wildcard component is resolved by listing, with ``Delimiter="/"``,
+        only the keys that start with its literal head under the directories
+        matched so far; those listings run in parallel.  Literal components
+        cost no request.  From a ``**`` component on, the remaining pattern
+        goes through fsspec's generic glob rooted at the matched directories.
+        """
+        bucket, key = self.split_path(path)
+        if not bucket or has_magic(bucket) or not has_magic(key):
+            return await super()._glob(path, **kwargs)
+        detail = kwargs.pop("detail", False)
+        generic_glob = super()._glob
+
+        parts = key.strip("/").split("/")
+        prefixes = [""]
+        out = {}
+        for i, part in enumerate(parts):
+            if "**" in part:
+                rest = "/".join(parts[i:])
+                found = await asyncio.gather(*[
+                    generic_glob(f"{bucket}/{prefix}{rest}", detail=True, **kwargs) for prefix in prefixes
+                ])
+                for matches in found:
+                    out.update(matches)
+                break
+            last = i == len(parts) - 1
+            if not last and not has_magic(part):
+                prefixes = [prefix + part + "/" for prefix in prefixes]
+                continue
+            found = await asyncio.gather(*[
+                self._run_in_pool(self._match_children, bucket, prefix, part) for prefix in prefixes
+            ])
+            if last:
+                for files, dirs in found:
+                    out.update((d, self._prefix_to_entry(bucket, d[len(bucket) + 1:])) for d in dirs)
+                    out.update((f["name"], f) for f in files)
+            prefixes = [d[len(bucket) + 1:] + "/" for _, dirs in found for d in dirs]
+            if not prefixes:
+                break
+
+        out = {name: out[name] for name in sorted(out)}
+        if detail:
+            return out
+        return list(out)
+
+    def _match_children(self, bucket, prefix, pattern):
+        """Children of *prefix* whose names match the glob *pattern*.
+
+        Only keys starting with the literal head of *pattern* are listed, and
+        each page is filtered as it arrives.  Returns the info dicts of the
+        matching objects and the paths of the matching directories.
+        """
+        head = re.split(r"[*?\[]", pattern, maxsplit=1)[0]
+        files, dirs = [], []
+        for resp in self._iter_list_pages(bucket, prefix + head):
+            for obj in resp.get("Contents", []):
+                name = obj["Key"][len(prefix):]
+                if name and not name.endswith("/") and fnmatch.fnmatchcase(name, pattern):
+                    files.append(self._obj_to_entry(bucket, obj))
+            for obj in resp.get("CommonPrefixes", []):
+                if fnmatch.fnmatchcase(obj["Prefix"][len(prefix):-1], pattern):
+                    dirs.append(f"{bucket}/{obj['Prefix']}".rstrip("/"))
+        return files, dirs
+
     # ------------------------------------------------------------------
     # Delete operations
     # ------------------------------------------------------------------
     async def _rm_file(self, path, **kwargs):
         bucket, key = self.split_path(path)
-        _call_cos(self.client.delete_object, Bucket=bucket, Key=key, retries=self.retries)
-        self.invalidate_cache(self._parent(path))
+        await self._run_in_pool(_call_cos, self._client_for(bucket).delete_object, Bucket=bucket, Key=key,
+                                retries=self.retries)
+        self._invalidate_object(path)
 
     async def _rm(self, path, recursive=False, **kwargs):
         """Delete one or more objects, using COS batch-delete (max 1 000 per call)."""
@@ -537,6 +1671,7 @@ class COSFileSystem(AsyncFileSystem):
             bucket, key = self.split_path(f)
             by_bucket.setdefault(bucket, []).append(key)
 
+        batches = []
         for bucket, keys in by_bucket.items():
             # Chunk into batches of 1000 (COS limit)
             for i in range(0, len(keys), 1000):
@@ -545,24 +1680,26 @@ class COSFileSystem(AsyncFileSystem):
                     "Quiet": "true",
                     "Object": [{"Key": k} for k in batch],
                 }
-                _call_cos(
-                    self.client.delete_objects,
+                batches.append(self._run_in_pool(
+                    _call_cos, self._client_for(bucket).delete_objects,
                     Bucket=bucket, Delete=delete_spec,
                     retries=self.retries,
-                )
+                ))
+        await asyncio.gather(*batches)
 
         # Delete empty buckets
         for d in dirs:
             bucket, _ = self.split_path(d)
             try:
-                _call_cos(self.client.delete_bucket, Bucket=bucket, retries=self.retries)
+                await self._run_in_pool(_call_cos, self._client_for(bucket).delete_bucket, Bucket=bucket,
+                                        retries=self.retries)
             except (FileNotFoundError, PermissionError, OSError) as e:
                 logger.debug("Could not delete bucket %s: %s", bucket, e)
 
         # Invalidate caches
         for p in paths:
             self.invalidate_cache(p)
-            self.invalidate_cache(self._parent(p))
+            self._invalidate_object(p)
 
     # ------------------------------------------------------------------
     # File open
@@ -574,13 +1711,15 @@ class COSFileSystem(AsyncFileSystem):
     # Copy
     # ------------------------------------------------------------------
     async def _cp_file(self, path1, path2):
-        _call_cos(
-            self.client.copy,
+        # The copy is sent to the destination's region and names the source's.
+        source = self.parse_path(path1)
+        await self._run_in_pool(
+            _call_cos, self._client_for(path2).copy,
             **self.parse_path(path2),
-            CopySource={**self.parse_path(path1), "Region": self.region},
+            CopySource={**source, "Region": self._routed_region(source["Bucket"])},
             retries=self.retries,
         )
-        self.invalidate_cache(self._parent(path2))
+        self._invalidate_object(path2)
 
     # ------------------------------------------------------------------
     # Directory operations
@@ -601,7 +1740,8 @@ class COSFileSystem(AsyncFileSystem):
 
         # Create bucket
         try:
-            _call_cos(self.client.create_bucket, Bucket=bucket, retries=self.retries, **kwargs)
+            await self._run_in_pool(_call_cos, self._client_for(bucket).create_bucket, Bucket=bucket,
+                                    retries=self.retries, **kwargs)
             self.invalidate_cache("")
         except FileExistsError:
             if not create_parents:
@@ -625,11 +1765,12 @@ class COSFileSystem(AsyncFileSystem):
             raise ValueError("Cannot remove root")
 
         try:
-            _call_cos(self.client.delete_bucket, Bucket=bucket, retries=self.retries)
+            await self._run_in_pool(_call_cos, self._client_for(bucket).delete_bucket, Bucket=bucket,
+                                    retries=self.retries)
         except OSError as e:
             # _call_cos translates COS errors; check if it was BucketNotEmpty
             cause = e.__cause__
-            if isinstance(cause, CosServiceError):
+            if isinstance(cause, _cos_service_error()):
                 code = getattr(cause, "get_error_code", lambda: None)()
                 if code == "BucketNotEmpty":
                     raise OSError(errno.ENOTEMPTY, f"Bucket {bucket} is not empty") from cause
@@ -651,8 +1792,9 @@ class COSFileSystem(AsyncFileSystem):
         if not key:
             raise ValueError("Cannot touch a bucket")
 
-        _call_cos(self.client.put_object, Bucket=bucket, Key=key, Body=b"", retries=self.retries)
-        self.invalidate_cache(self._parent(path))
+        await self._run_in_pool(_call_cos, self._client_for(bucket).put_object, Bucket=bucket, Key=key, Body=b"",
+                                retries=self.retries)
+        self._invalidate_object(path)
 
     # ------------------------------------------------------------------
     # Timestamps
@@ -680,7 +1822,7 @@ class COSFileSystem(AsyncFileSystem):
             How long the URL remains valid, in seconds (default 3600).
         """
         bucket, key = self.split_path(path)
-        return self.client.get_presigned_download_url(
+        return self._client_for(bucket).get_presigned_download_url(
             Bucket=bucket, Key=key, Expired=expiration
         )
 
@@ -691,6 +1833,8 @@ class COSFileSystem(AsyncFileSystem):
         """Drop cached directory listings for *path* and every parent up to root."""
         if path is None:
             self.dircache.clear()
+            if self.block_cache is not None:
+                self.block_cache.clear()
             return
 
         norm_path = self._strip_protocol(path).strip("/")
@@ -702,51 +1846,309 @@ class COSFileSystem(AsyncFileSystem):
         # Invalidate root
         self.dircache.pop("", None)
 
+    def _invalidate_object(self, path):
+        """Forget the parent listings and cached blocks (memory and disk) of a written or deleted object."""
+        self.invalidate_cache(self._parent(path))
+        if self.block_cache is not None:
+            self.block_cache.invalidate(*self.split_path(path))
+        if self.disk_cache is not None:
+            self.disk_cache.invalidate(*self.split_path(path))
+
     # ------------------------------------------------------------------
     # Low-level helpers (kept for backward compatibility with COSFile)
     # ------------------------------------------------------------------
-    def fetch_object(self, path: str, start: int, end: int) -> bytes:
-        res = _call_cos(self.client.get_object, **self.parse_path(path), Range=f"bytes={start}-{end}",
+    def fetch_object(self, path: str, start: int, end: int, etag: Optional[str] = None) -> bytes:
+        """GET bytes ``start``..``end`` (inclusive), with ``If-Match: etag`` when given."""
+        if self.disk_cache is not None:
+            return self._disk_read(*self.split_path(path), start, end + 1, etag=etag)
+        kw = {"IfMatch": etag} if etag else {}
+        res = _call_cos(self._client_for(path).get_object, **self.parse_path(path), Range=f"bytes={start}-{end}", **kw,
                         retries=self.retries)
         return res["Body"].get_raw_stream().read()
 
-    def append_object(self, path: str, value: bytes, location: Optional[int] = None):
+    def probe_object(self, path: str, length: int, tail: bool = False, etag: Optional[str] = None):
+        """GET the first (with *tail*, the last) *length* bytes of an object.
+
+        The size and ETag come from the response's ``Content-Range`` and
+        ``ETag`` headers, so a caller needs no HEAD before reading.  Returns
+        ``(offset, data, info)`` with an ``info``-style dict.
+        """
+        bucket, key = self.split_path(path)
+        kw = {"IfMatch": etag} if etag else {}
+        try:
+            res = _call_cos(self._client_for(bucket).get_object, Bucket=bucket, Key=key, **kw,
+                            Range=f"bytes=-{length}" if tail else f"bytes=0-{length - 1}", retries=self.retries)
+        except OSError as e:
+            # Any byte range of an empty object is unsatisfiable: one HEAD gets its ETag.
+            if _error_code(e) != "InvalidRange":
+                raise
+            res = _call_cos(self._client_for(bucket).head_object, Bucket=bucket, Key=key, **kw,
+                            retries=self.retries)
+            data, offset, size = b"", 0, int(res.get("Content-Length") or 0)
+        else:
+            data = res["Body"].get_raw_stream().read()
+            m = _CONTENT_RANGE.match(res.get("Content-Range", ""))
+            offset, size = (int(m.group(1)), int(m.group(2))) if m else (0, len(data))
+        info = {
+            "ETag": res.get("ETag"),
+            "Key": f"{bucket}/{key}",
+            "name": f"{bucket}/{key}",
+            "LastModified": res.get("Last-Modified"),
+            "Size": size,
+            "size": size,
+            "type": "file",
+            "StorageClass": "OBJECT",
+        }
+        return offset, data, info
+
+    def append_object(self, path: str, value: bytes, location: Optional[int] = None) -> int:
+        """Append *value* at *location* and return the position of the next append."""
         if location is None:
             location = self.info(path)["size"]
-        _call_cos(self.client.append_object, **self.parse_path(path), Position=location, Data=value,
-                  retries=self.retries)
+        res = _call_cos(self._client_for(path).append_object, **self.parse_path(path), Position=location,
+                        Data=as_body(value), retries=self.retries)
+        self._invalidate_object(path)
+        return int((res or {}).get("x-cos-next-append-position") or location + _body_length(value))
+
+    def head_object(self, path: str) -> dict:
+        return _call_cos(self._client_for(path).head_object, **self.parse_path(path), retries=self.retries)
+
+    def put_object(self, path: str, body, crc: Optional[int] = None):
+        """PUT *body*; with *crc*, check it against the CRC64 COS computed."""
+        out = _call_cos(self._client_for(path).put_object, **self.parse_path(path), Body=as_body(body),
+                        retries=self.retries)
+        if crc is not None:
+            self._check_crc64(path, crc, out)
+        return out
 
     def initiate_multipart_upload(self, path: str):
-        return _call_cos(self.client.create_multipart_upload, **self.parse_path(path), retries=self.retries)
+        return _call_cos(self._client_for(path).create_multipart_upload, **self.parse_path(path), retries=self.retries)
 
-    def upload_part(self, path: str, body, upload_id, part_number: int):
-        return _call_cos(self.client.upload_part, **self.parse_path(path), Body=body,
-                         PartNumber=part_number, UploadId=upload_id, retries=self.retries)
+    def upload_part(self, path: str, body, upload_id, part_number: int, crc: Optional[int] = None):
+        out = _call_cos(self._client_for(path).upload_part, **self.parse_path(path), Body=as_body(body),
+                        PartNumber=part_number, UploadId=upload_id, retries=self.retries)
+        if crc is not None:
+            self._check_crc64(f"{path} part {part_number}", crc, out)
+        return out
 
-    def complete_multipart_upload(self, path: str, upload_id, parts: list):
-        _call_cos(self.client.complete_multipart_upload, **self.parse_path(path), UploadId=upload_id,
-                  MultipartUpload={"Part": parts}, retries=self.retries)
+    def complete_multipart_upload(self, path: str, upload_id, parts: list, crc: Optional[int] = None):
+        out = _call_cos(self._client_for(path).complete_multipart_upload, **self.parse_path(path), UploadId=upload_id,
+                        MultipartUpload={"Part": parts}, retries=self.retries)
+        if crc is not None:
+            self._check_crc64(path, crc, out)
 
     def abort_multipart_upload(self, path: str, upload_id: str):
         """Abort an in-progress multipart upload."""
         try:
-            _call_cos(self.client.abort_multipart_upload, **self.parse_path(path), UploadId=upload_id,
+            _call_cos(self._client_for(path).abort_multipart_upload, **self.parse_path(path), UploadId=upload_id,
                       retries=self.retries)
-        except (CosServiceError, OSError):
+        except (_cos_service_error(), OSError):
             logger.warning("Failed to abort multipart upload %s for %s", upload_id, path)
 
 
 # ---------------------------------------------------------------------------
 # COSFile — buffered file implementation
 # ---------------------------------------------------------------------------
+
+# Read cache types replaced by one in-memory copy for small files.
+_WHOLE_CACHES = ("readahead", "bytes", "all")
+
+
 class COSFile(AbstractBufferedFile):
+    """Buffered file on COS.
+
+    Besides the fsspec cache types, read mode accepts
+    ``cache_type="columnar"`` for Parquet, ORC and Feather files: the footer
+    is fetched with a single suffix GET and the byte ranges of the selected
+    columns and row groups are prefetched concurrently at open.  Its
+    ``cache_options`` are ``columns``, ``row_groups``, ``format`` (detected
+    when omitted) and ``footer_size`` (bytes of the first tail GET).
+
+    ``cache_type="shared"`` (the default when the filesystem has a
+    ``block_cache``) reads through the filesystem-wide ``BlockCache``.
+
+    In read mode the ETag seen at open is pinned: every GET carries
+    ``If-Match`` and ``FileExpired`` is raised as soon as the object has
+    been overwritten, rather than returning a mix of old and new bytes.
+
+    Unless a ``cache_type`` is given, files of at most
+    ``fs.small_object_size`` bytes (or any file the probe below happens to
+    return whole) are read with a single GET and served from memory,
+    whatever the seeks and reads that follow.
+
+    In append mode writes are buffered until ``block_size`` bytes are
+    pending or, with ``flush_interval`` (seconds), until the oldest pending
+    byte is that old, whether or not more writes follow: a timer flushes an
+    idle writer.  Each batch is one ``append_object``; an error in a timed
+    flush is raised by the next ``write``, ``flush`` or ``close``.  The position is
+    tracked from the ``x-cos-next-append-position`` of the previous append
+    and re-read once if another writer got there first.
+
+    Opening for reading makes no HEAD request.  The size and ETag are taken
+    from the ``size`` / ``etag`` arguments, the listing cache, or the disk
+    cache metadata; failing those, the first ``probe_size`` bytes (the
+    footer for ``columnar``) are fetched and the size is read from the
+    response's ``Content-Range``.
+    """
+
+    # Bytes fetched from the end of the file when looking for a footer.
+    footer_size = 64 * 2 ** 10
+    # Bytes fetched at open when the size is not known in advance.
+    probe_size = 64 * 2 ** 10
+    # Multipart upload of a write, created once the first full block is flushed.
+    upload_id = None
+    # Append mode: upload pending data once it has waited this many seconds.
+    flush_interval: Optional[float] = None
+    _pending_since = None
+    _flush_timer = None
+    _timer_error = None
+
+    def __init__(self, fs, path, mode="rb", block_size="default", autocommit=True, cache_type=None,
+                 cache_options=None, size=None, etag=None, flush_interval=None, **kwargs):
+        # An explicit cache type is honoured as given; only the default may be
+        # replaced by the in-memory copy of a small object.
+        whole_ok = cache_type is None
+        if cache_type is None:
+            cache_type = "shared" if fs.block_cache is not None else "readahead"
+        custom = mode == "rb" and cache_type in ("columnar", "shared")
+        if flush_interval is not None:
+            self.flush_interval = flush_interval
+        # Serialises writes with the flush timer of append mode.
+        self._lock = threading.RLock()
+        self.etag = None
+        self._probe = None
+        if mode == "rb" and size is None:
+            if cache_type == "columnar":
+                size, etag = self._locate(fs, path, etag, (cache_options or {}).get("footer_size") or self.footer_size,
+                                          tail=True)
+            elif whole_ok and cache_type in _WHOLE_CACHES:
+                # Guess the file is small: if so, the probe fetches all of it.
+                size, etag = self._locate(fs, path, etag, max(self.probe_size, fs.small_object_size))
+            else:
+                size, etag = self._locate(fs, path, etag, self.probe_size)
+        super().__init__(fs, path, mode, block_size, autocommit, cache_type="none" if custom else cache_type,
+                         cache_options=None if custom else cache_options, size=size, **kwargs)
+        if mode == "rb":
+            self.etag = etag
+        else:
+            self.buffer = PartBuffer(fs.buffer_pool, part_size=self.blocksize, budget=fs.write_budget,
+                                     spill_dir=fs.staging_dir, checksum=fs.verify_crc64)
+        if custom and cache_type == "columnar":
+            self.cache = self._columnar_cache(**(cache_options or {}))
+        elif mode == "rb" and whole_ok and self._is_whole(cache_type):
+            self.cache = self._whole_cache()
+        elif custom:
+            self.cache = self._shared_cache()
+
+    def _locate(self, fs, path, etag, length, tail=False):
+        """Return ``(size, etag)`` for a file opened for reading, without a HEAD.
+
+        A probe GET of the first (with *tail*, the last) *length* bytes is
+        kept in ``_probe`` and serves the reads it covers.
+        """
+        try:
+            listing = fs._ls_from_cache(path) or []
+        except FileNotFoundError:
+            listing = []  # the listing may predate the object
+        for entry in listing:
+            if entry["name"] == path and entry["type"] == "file":
+                self._details = entry
+                return entry["size"], etag or entry.get("ETag")
+        bucket, key = fs.split_path(path)
+        if fs.disk_cache is not None:
+            meta = fs.disk_cache.validate(bucket, key, functools.partial(fs._disk_head, bucket, key))
+            return meta["size"], etag or meta["etag"]
+        with trace_span("COSFile.probe", bucket, key):
+            offset, data, info = fs.probe_object(path, length, tail=tail, etag=etag)
+        self._details = info
+        self._probe = (offset, data)
+        return info["size"], etag or info["ETag"]
+
+    def _probed_whole(self):
+        return self._probe is not None and self._probe[0] == 0 and len(self._probe[1]) >= self.size
+
+    def _is_whole(self, cache_type):
+        """Whether the object is small enough (or already probed whole) to keep in memory."""
+        return self._probed_whole() or (self.size <= self.fs.small_object_size and cache_type in _WHOLE_CACHES)
+
+    def _whole_cache(self):
+        """Serve every read from one in-memory copy of the object, fetched with a single GET."""
+        if self._probed_whole():
+            data = self._probe[1]
+        elif self.size == 0:
+            data = b""
+        else:
+            with self._trace("COSFile.fetch_whole"), self._pinned():
+                data = self.fs.cat_file(self.path, etag=self.etag)
+        self._probe = None
+        return caches["all"](self.blocksize, self._fetch_range, self.size, data=data)
+
+    def _shared_cache(self):
+        """Read through the filesystem's ``BlockCache``; falls back to readahead without one or an ETag."""
+        etag = self.etag
+        if self.fs.block_cache is None or not etag:
+            return caches["readahead"](self.blocksize, self._fetch_range, self.size)
+        bucket, key = self.fs.split_path(self.path)
+        return SharedBlockCache(self.blocksize, self._fetch_range, self.size, store=self.fs.block_cache,
+                                bucket=bucket, key=key, etag=etag, fetch_ranges=self._fetch_ranges)
+
+    def _columnar_cache(self, columns=None, row_groups=None, format=None,  # pylint: disable=redefined-builtin
+                        footer_size=None):
+        """Prefetch the footer and selected column chunks into a ``PartsCache``.
+
+        Reads outside the prefetched parts go through the cache of
+        ``cache_type="shared"`` (``readahead`` without a block cache), as do
+        all reads of files whose format cannot be planned for.
+        """
+        footer_size = footer_size or self.footer_size
+        with self._trace("COSFile.prefetch"):
+            tail = self._fetch_range(max(self.size - footer_size, 0), self.size)
+            try:
+                parts = columnar.prefetch(tail, self.size, self._fetch_ranges, format=format,
+                                          columns=columns, row_groups=row_groups)
+            except ValueError as e:
+                # Not a format we can plan reads for: read it as any other file.
+                logger.warning("Columnar prefetch disabled for %s: %s", self.path, e)
+                return self._shared_cache()
+        return PartsCache(self.blocksize, self._fetch_range, self.size, data=parts, fallback=self._shared_cache())
+
+    def _fetch_ranges(self, ranges):
+        """Fetch several ``(start, end)`` ranges concurrently via ``cat_ranges``."""
+        with self._pinned():
+            return self.fs.cat_ranges([self.path] * len(ranges), [s for s, _ in ranges], [e for _, e in ranges],
+                                      etag=self.etag)
 
     def _fetch_range(self, start, end):
         start = max(start, 0)
         end = min(self.size, end)
         if start >= end or start >= self.size:
             return b""
-        return self.fs.fetch_object(self.path, start, end)
+        if self._probe is not None:
+            offset, data = self._probe
+            if offset <= start < offset + len(data):
+                head = data[start - offset:end - offset]
+                if start + len(head) == end:
+                    return head
+                return head + self._fetch_range(start + len(head), end)
+        # Only cache misses reach this point, so each span is one block fetch.
+        with self._trace("COSFile.fetch_range", start, end), self._pinned():
+            return self.fs.fetch_object(self.path, start, end - 1, etag=self.etag)
+
+    def _trace(self, operation, start=None, end=None):
+        """``trace_span`` over this file; the span target is only built while a hook is registered."""
+        if not _request_hooks:
+            return _NULL_SPAN
+        return trace_span(operation, *self.fs.split_path(self.path), None if start is None else (start, end))
+
+    @contextlib.contextmanager
+    def _pinned(self):
+        """Turn an ``If-Match`` failure into ``FileExpired`` naming this file, dropping stale caches."""
+        try:
+            yield
+        except FileExpired as e:
+            self.fs._invalidate_object(self.path)
+            raise FileExpired(f"{self.path} changed since it was opened (ETag {self.etag})",
+                              path=self.path, etag=self.etag) from e
 
     def _upload_chunk(self, final=False):
         """Write one part of a multi-block file upload.
@@ -756,22 +2158,148 @@ class COSFile(AbstractBufferedFile):
         final : bool
             If True, this is the last block; complete the file if autocommit is True.
         """
-        if "a" in self.mode:
-            self.fs.append_object(self.path, self.buffer.getvalue(), self.offset)
-        else:
-            part_number = len(self.parts) + 1
-            self.parts.append({
-                **self.fs.upload_part(self.path, self.buffer.getvalue(), self.upload_id, part_number),
-                "PartNumber": part_number,
-            })
-            if final and self.autocommit:
-                self.commit()
+        with self._trace("COSFile.upload_chunk", self.offset, self.offset + self.buffer.tell()):
+            if "a" in self.mode:
+                # An empty append only matters for creating the object.
+                if self.buffer.tell() or not self.offset:
+                    self._append()
+            elif final and self.autocommit and self.upload_id is None:
+                # The whole file fits in the buffer: one PUT, no multipart upload.
+                self.fs.put_object(self.path, self.buffer.body(), crc=self._buffer_crc())
+                self.fs._invalidate_object(self.path)
+            else:
+                if self.upload_id is None:
+                    self.upload_id = self.fs.initiate_multipart_upload(self.path)["UploadId"]
+                part_number = len(self.parts) + 1
+                crc = self._buffer_crc()
+                out = self.fs.upload_part(self.path, self.buffer.body(), self.upload_id, part_number, crc=crc)
+                self.parts.append({"ETag": out["ETag"], "PartNumber": part_number})
+                if crc is not None:
+                    self._crc64.append(crc, self.buffer.tell())
+                if final and self.autocommit:
+                    self.commit()
         return True
 
+    def _append(self):
+        """Append the buffer at the tracked position, re-reading the position once if it is stale."""
+        try:
+            position = self.fs.append_object(self.path, self.buffer.body(), self.offset)
+        except OSError as e:
+            if _error_code(e) != "PositionNotEqualToLength":
+                raise
+            logger.debug("Append position of %s is stale; re-reading it", self.path)
+            self.offset = self._object_length()
+            position = self.fs.append_object(self.path, self.buffer.body(), self.offset)
+        # ``flush`` advances ``offset`` by the bytes written; keep it on the server's position.
+        self.offset = position - self.buffer.tell()
+        self._pending_since = None
+        self._cancel_timer()
+
+    def _object_length(self):
+        try:
+            return int(self.fs.head_object(self.path)["Content-Length"])
+        except FileNotFoundError:
+            return 0
+
+    def write(self, data):
+        with self._lock:
+            self._raise_timer_error()
+            if "a" in self.mode and self._pending_since is None and data:
+                self._pending_since = time.monotonic()
+                self._arm_timer()
+            out = super().write(data)
+            if self._flush_due():
+                self.flush()
+            return out
+
+    def flush(self, force=False):
+        """Upload the buffer once it holds a block (or is due, or *force*), then reuse it.
+
+        Mirrors ``AbstractBufferedFile.flush`` except that the part buffer
+        is cleared and kept instead of being replaced by a new ``BytesIO``.
+        """
+        with self._lock:
+            self._raise_timer_error()
+            self._flush(force)
+
+    def _flush(self, force):
+        if self.closed:
+            raise ValueError("Flush on closed file")
+        if force and self.forced:
+            raise ValueError("Force flush cannot be called more than once")
+        if force:
+            self.forced = True
+        if self.mode not in {"wb", "ab"}:
+            return
+        if not force and self.buffer.tell() < self.blocksize and not self._flush_due():
+            return
+        if self.offset is None:
+            self.offset = 0
+            try:
+                self._initiate_upload()
+            except:  # noqa: E722
+                self.closed = True
+                raise
+        if self._upload_chunk(final=force) is not False:
+            self.offset += self.buffer.seek(0, 2)
+            self.buffer.clear()
+
+    def close(self):
+        with self._lock:
+            self._cancel_timer()
+            if self.mode != "rb" and self.buffer is None:
+                self.closed = True  # discarded: nothing to upload
+                return
+            if not self.closed:
+                self._raise_timer_error()
+            super().close()
+            if isinstance(getattr(self, "buffer", None), PartBuffer):
+                self.buffer.close()
+
+    def _flush_due(self):
+        return (self.flush_interval is not None and self._pending_since is not None and not self.closed
+                and time.monotonic() - self._pending_since >= self.flush_interval)
+
+    # -- append mode: timed flushes ---------------------------------------
+
+    def _arm_timer(self):
+        if self.flush_interval is None or self.flush_interval <= 0:
+            return  # zero flushes within ``write`` itself
+        self._flush_timer = threading.Timer(self.flush_interval, self._timed_flush)
+        self._flush_timer.daemon = True
+        self._flush_timer.start()
+
+    def _cancel_timer(self):
+        if self._flush_timer is not None:
+            self._flush_timer.cancel()
+            self._flush_timer = None
+
+    def _timed_flush(self):
+        with self._lock:
+            if self.closed or self._pending_since is None or self._timer_error is not None:
+                return
+            self._flush_timer = None
+            # The timer may fire a hair early by the clock ``_flush_due`` reads.
+            self._pending_since = min(self._pending_since, time.monotonic() - self.flush_interval)
+            try:
+                self._flush(force=False)
+            except Exception as e:  # pylint: disable=broad-except
+                logger.warning("Timed flush of %s failed: %s", self.path, e)
+                self._timer_error = e
+
+    def _raise_timer_error(self):
+        if self._timer_error is not None:
+            e, self._timer_error = self._timer_error, None
+            raise e
+
+    def _buffer_crc(self) -> Optional[int]:
+        return self.buffer.crc if self.fs.verify_crc64 else None
+
     def commit(self):
         """Finalise the multipart upload and refresh the parent listing cache."""
-        self.fs.complete_multipart_upload(self.path, self.upload_id, self.parts)
-        self.fs.invalidate_cache(self.fs._parent(self.path))
+        crc = self._crc64.crc if self.fs.verify_crc64 else None
+        self.fs.complete_multipart_upload(self.path, self.upload_id, self.parts, crc=crc)
+        self.fs._invalidate_object(self.path)
 
     def discard(self):
         """Cancel a write that has not been committed.
@@ -779,23 +2307,32 @@ class COSFile(AbstractBufferedFile):
         Aborts the in-flight multipart upload so that partially-written
         parts do not linger on the server and incur storage charges.
         """
+        self._cancel_timer()
         if hasattr(self, "upload_id") and self.upload_id:
             self.fs.abort_multipart_upload(self.path, self.upload_id)
             self.upload_id = None
+        if isinstance(self.buffer, PartBuffer):
+            self.buffer.close()
         self.buffer = None
 
     def _initiate_upload(self):
         """Prepare the remote side for writing.
 
+        The multipart upload is only created once a full block has to be
+        sent; a file that fits in one block is written with a single PUT on
+        close.  An existing object is simply overwritten.
+
         NOTE: appendable objects in COS cannot be copied afterwards.
         """
         if "a" in self.mode:
-            if self.fs.exists(self.path):
-                self.offset = self.fs.info(self.path)["size"]
-            else:
-                self.offset = 0
+            # Start from the listed size when known; a stale one is corrected on the first append.
+            try:
+                listing = self.fs._ls_from_cache(self.path) or []
+            except FileNotFoundError:
+                listing = []
+            sizes = [e["size"] for e in listing if e["name"] == self.path and e["type"] == "file"]
+            self.offset = sizes[0] if sizes else self._object_length()
         else:
             self.parts = []
-            self.upload_id = self.fs.initiate_multipart_upload(self.path)["UploadId"]
-            if self.fs.exists(self.path):
-                self.fs.rm_file(self.path)
+            self.upload_id = None
+            self._crc64 = CRC64()
@@ -0,0 +1,106 @@
+"""CRC64-ECMA checksums, as reported by COS in ``x-cos-hash-crc64ecma``.
+
+COS uses the reflected ECMA-182 polynomial with an all-ones initial value
+and final XOR (also known as CRC-64/XZ).  Checksums are computed by
+crcmod's table-driven C extension, a dependency of the COS SDK, and fed
+incrementally as data passes through, so verifying a transfer costs no
+second pass over the bytes.  The extension holds the GIL while it runs
+(a few hundred MB/s per core), so checksums of concurrent transfers are
+computed one at a time: with ``verify_crc64`` on, aggregate throughput
+is capped by a single core's CRC rate.
+
+``combine`` derives the checksum of a concatenation from the checksums
+of its pieces without touching the data, as zlib's ``crc32_combine``
+does; a multipart upload is verified from the checksums of its parts.
+"""
+
+import threading
+from typing import List, Optional
+
+import crcmod
+
+_crc64 = crcmod.mkCrcFun(0x142F0E1EBA9EA3693, initCrc=0, xorOut=0xFFFFFFFFFFFFFFFF, rev=True)
+
+# The polynomial in reflected bit order.
+_POLY = 0xC96C5795D7870F42
+
+# _zero_ops[k] maps a CRC register to its value after 2**k zero bytes.
+_zero_ops: List[List[int]] = []
+_zero_ops_lock = threading.Lock()
+
+
+def crc64(data, crc: int = 0) -> int:
+    """Checksum of *data*, continuing from *crc*, the checksum of what precedes it."""
+    return _crc64(data, crc)
+
+
+def file_crc64(path: str, blocksize: int = 2 ** 20) -> int:
+    """Checksum of the local file at *path*."""
+    running = CRC64()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(blocksize), b""):
+            running.update(block)
+    return running.crc
+
+
+def _gf2_times(matrix, vector):
+    out = 0
+    for row in matrix:
+        if not vector:
+            break
+        if vector & 1:
+            out ^= row
+        vector >>= 1
+    return out
+
+
+def _gf2_square(matrix):
+    return [_gf2_times(matrix, row) for row in matrix]
+
+
+def _zero_operators():
+    with _zero_ops_lock:
+        if not _zero_ops:
+            op = [_POLY] + [1 << n for n in range(63)]  # one zero bit
+            for _ in range(3):
+                op = _gf2_square(op)
+            for _ in range(64):
+                _zero_ops.append(op)
+                op = _gf2_square(op)
+    return _zero_ops
+
+
+def combine(crc1: int, crc2: int, len2: int) -> int:
+    """Checksum of ``A + B`` from ``crc64(A)``, ``crc64(B)`` and ``len(B)``."""
+    ops = _zero_operators()
+    k = 0
+    while len2:
+        if len2 & 1:
+            crc1 = _gf2_times(ops[k], crc1)
+        len2 >>= 1
+        k += 1
+    return crc1 ^ crc2
+
+
+def parse(value: Optional[str]) -> Optional[int]:
+    """The checksum in a ``x-cos-hash-crc64ecma`` header value, or ``None``."""
+    if value is None or value == "":
+        return None
+    return int(value)
+
+
+class CRC64:
+    """Running checksum of a stream, fed with data or with pre-computed pieces."""
+
+    def __init__(self):
+        self.crc = 0
+        self.length = 0
+
+    def update(self, data):
+        self.crc = _crc64(data, self.crc)
+        self.length += len(data)
+
+    def append(self, crc: int, length: int):
+        """Extend the stream by a piece of *length* bytes whose checksum is *crc*."""
+        self.crc = combine(self.crc, crc, length)
+        self.length += length
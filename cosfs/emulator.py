@@ -0,0 +1,905 @@
+"""In-process emulator of ``CosS3Client`` for testing and benchmarking cosfs.
+
+Every public method that ``cosfs/core.py`` calls on the COS SDK client is
+replicated here with pure-Python logic.  Objects live in a dict with a
+per-bucket sorted key index, so listings seek to a prefix or marker in
+O(log n) instead of scanning the bucket.  All state is guarded by a lock,
+so one client can be shared by many threads.
+
+Besides correctness testing the emulator can model a slow or unreliable
+service: a fixed per-request latency, per-request and aggregate bandwidth
+caps, random ``SlowDown`` throttling and network failures, and scripted
+faults via :meth:`MockCosClient.fail_next`.
+
+:func:`serve_http` exposes the same client over the COS XML API so that a
+real ``CosS3Client`` can be pointed at it, either as an HTTP proxy (all
+requests, including copies) or through ``CosConfig(IP=..., Port=...)``.
+Run ``python -m cosfs.emulator --help`` to start a standalone server.
+"""
+# pylint: disable=invalid-name
+# Parameter names (Bucket, Key, …) intentionally match the COS SDK's PascalCase API.
+
+import argparse
+import bisect
+import functools
+import hashlib
+import io
+import os
+import random
+import re
+import socket
+import threading
+import time
+import uuid
+import xml.etree.ElementTree as ET
+from collections import Counter
+from datetime import datetime, timezone
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, quote, unquote, urlsplit
+
+import crcmod
+from qcloud_cos import CosServiceError
+
+
+# ---------------------------------------------------------------------------
+# Helper: construct CosServiceError
+# ---------------------------------------------------------------------------
+def make_cos_error(code, status_code=400, message="mock error"):
+    """Build a ``CosServiceError`` the same way the real SDK does."""
+    # CosServiceError.__init__(self, method, msg_dict, status_code)
+    return CosServiceError(
+        "MOCK",
+        {
+            "code": code,
+            "message": message,
+            "resource": "/",
+            "requestid": "mock-request-id",
+            "traceid": "mock-trace-id",
+        },
+        status_code,
+    )
+
+
+# ---------------------------------------------------------------------------
+# FakeStreamBody: simulates qcloud_cos.StreamBody
+# ---------------------------------------------------------------------------
+class _FakeRawStream:
+    """Minimal file-like wrapper returned by ``FakeStreamBody.get_raw_stream()``."""
+
+    def __init__(self, data: bytes):
+        self._stream = io.BytesIO(data)
+
+    def read(self, amt=-1):
+        return self._stream.read(amt)
+
+
+class FakeStreamBody:
+    """Drop-in replacement for ``qcloud_cos.StreamBody``.
+
+    Supports the ``get_raw_stream().read()`` call chain used by cosfs.
+    """
+
+    def __init__(self, data: bytes):
+        self._data = data
+
+    def __len__(self):
+        return len(self._data)
+
+    def get_raw_stream(self):
+        return _FakeRawStream(self._data)
+
+
+# COS's CRC64-ECMA, computed independently of ``cosfs.crc64``.
+_crc64 = crcmod.mkCrcFun(0x142F0E1EBA9EA3693, initCrc=0, xorOut=0xFFFFFFFFFFFFFFFF, rev=True)
+
+CRC64_HEADER = "x-cos-hash-crc64ecma"
+
+
+# ---------------------------------------------------------------------------
+# Object store with a sorted key index
+# ---------------------------------------------------------------------------
+def _successor(prefix):
+    """Smallest string greater than every string starting with *prefix*."""
+    return prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+
+def _to_bytes(body):
+    """Normalise the body types accepted by the SDK (bytes, str, file, view)."""
+    if isinstance(body, str):
+        return body.encode("utf-8")
+    if hasattr(body, "read"):
+        body = body.read()
+    if isinstance(body, (bytearray, memoryview)):
+        return bytes(body)
+    return body
+
+
+class _ObjectStore(dict):
+    """``dict`` of ``(bucket, key) -> bytes`` keeping a sorted key list per bucket.
+
+    Tests may assign to or pop from the store directly; the index and the
+    per-object metadata (ETag, modification time) follow along.  Deleted
+    keys stay in the index as tombstones (readers skip keys missing from the
+    dict) until they make up half of it, which keeps bulk deletes linear.
+    """
+
+    def __init__(self, objects=None):
+        super().__init__(objects or {})
+        by_bucket = {}
+        for bucket, key in self:
+            by_bucket.setdefault(bucket, []).append(key)
+        self._index = {bucket: sorted(keys) for bucket, keys in by_bucket.items()}
+        # bucket -> number of tombstones in its index
+        self._stale = {}
+        # (bucket, key) -> {"ETag": str, "mtime": float}; filled lazily
+        self._meta = {}
+
+    def __setitem__(self, item, value):
+        if item not in self:
+            keys = self._index.setdefault(item[0], [])
+            pos = bisect.bisect_left(keys, item[1])
+            if pos < len(keys) and keys[pos] == item[1]:
+                self._stale[item[0]] -= 1  # revive a tombstone
+            else:
+                keys.insert(pos, item[1])
+        super().__setitem__(item, value)
+        self._meta.pop(item, None)
+
+    def __delitem__(self, item):
+        super().__delitem__(item)
+        self._meta.pop(item, None)
+        bucket = item[0]
+        stale = self._stale[bucket] = self._stale.get(bucket, 0) + 1
+        keys = self._index[bucket]
+        if stale > 1024 and stale * 2 > len(keys):
+            keys[:] = [k for k in keys if (bucket, k) in self]
+            self._stale[bucket] = 0
+
+    def pop(self, item, *default):
+        if item in self:
+            value = self[item]
+            del self[item]
+            return value
+        if default:
+            return default[0]
+        raise KeyError(item)
+
+    def update(self, *args, **kwargs):
+        for item, value in dict(*args, **kwargs).items():
+            self[item] = value
+
+    def setdefault(self, item, default=None):
+        if item not in self:
+            self[item] = default
+        return self[item]
+
+    def clear(self):
+        super().clear()
+        self._index.clear()
+        self._stale.clear()
+        self._meta.clear()
+
+    def put(self, item, value, etag=None):
+        """Store *value* and, optionally, a precomputed ETag."""
+        self[item] = value
+        if etag is not None:
+            self._meta[item] = {"ETag": etag, "mtime": time.time()}
+
+    def keys_of(self, bucket):
+        """Sorted key index of *bucket*; may contain tombstones (do not mutate)."""
+        return self._index.get(bucket, [])
+
+    def count(self, bucket):
+        """Number of live objects in *bucket*."""
+        return len(self._index.get(bucket, ())) - self._stale.get(bucket, 0)
+
+    def meta(self, item):
+        meta = self._meta.get(item)
+        if meta is None:
+            data = self[item]
+            if isinstance(data, bytes):
+                etag = f'"{hashlib.md5(data).hexdigest()}"'
+            else:
+                etag = f'"{uuid.uuid4().hex}"'
+            meta = self._meta[item] = {"ETag": etag, "mtime": time.time()}
+        return meta
+
+
+# ---------------------------------------------------------------------------
+# Request accounting and fault injection
+# ---------------------------------------------------------------------------
+class InjectedConnectionError(ConnectionError):
+    """Network failure raised by the emulator's fault injection."""
+
+
+def _transfer_size(kwargs, out):
+    """Bytes moved over the wire by one request, for bandwidth throttling."""
+    size = 0
+    for name in ("Body", "Data"):
+        body = kwargs.get(name)
+        if body is not None and hasattr(body, "__len__"):
+            size += len(body)
+    if isinstance(out, dict) and isinstance(out.get("Body"), FakeStreamBody):
+        size += len(out["Body"])
+    for name in ("LocalFilePath", "DestFilePath"):
+        if name in kwargs and os.path.exists(kwargs[name]):
+            size += os.path.getsize(kwargs[name])
+    return size
+
+
+def _api(method):
+    """Mark *method* as one COS request.
+
+    The request is counted, may be failed by fault injection, is delayed by
+    the configured latency and bandwidth, and runs under the client lock.
+    """
+
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        name = method.__name__
+        start = time.perf_counter()
+        try:
+            with self._lock:
+                self.calls[name] += 1
+                fault = self._draw_fault(name)
+            if self.latency:
+                time.sleep(self.latency)
+            if fault is not None:
+                raise fault
+            with self._lock:
+                out = method(self, *args, **kwargs)
+            self._throttle(_transfer_size(kwargs, out))
+            return out
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                self.busy += elapsed
+
+    return wrapper
+
+
+# ---------------------------------------------------------------------------
+# MockCosClient
+# ---------------------------------------------------------------------------
+class MockCosClient:
+    """Pure-Python emulator of ``qcloud_cos.CosS3Client``.
+
+    Parameters
+    ----------
+    buckets : set[str] | None
+        Pre-existing bucket names.
+    objects : dict[(str, str), bytes] | None
+        Pre-existing objects keyed by ``(bucket, key)``.
+    latency : float
+        Seconds slept before serving each request (default 0).
+    bandwidth : float | None
+        Per-request transfer rate cap in bytes/second.
+    total_bandwidth : float | None
+        Aggregate transfer rate cap shared by all concurrent requests.
+    slowdown_rate : float
+        Probability that a request fails with a ``SlowDown`` (503) error.
+    failure_rate : float
+        Probability that a request fails with a network ``ConnectionError``.
+    seed : int | None
+        Seed for the fault-injection random generator.
+    region : str
+        Region reported for the buckets (``x-cos-bucket-region``, ``Location``).
+
+    Every request is counted in ``calls``, keyed by SDK method name, and the
+    time spent serving requests is accumulated in ``busy`` (seconds).
+    """
+
+    MAX_LIST_KEYS = 1000
+
+    def __init__(self, buckets=None, objects=None, latency=0.0, bandwidth=None, total_bandwidth=None,
+                 slowdown_rate=0.0, failure_rate=0.0, seed=None, region="ap-guangzhou"):
+        self.latency = latency
+        self.region = region
+        self.bandwidth = bandwidth
+        self.total_bandwidth = total_bandwidth
+        self.slowdown_rate = slowdown_rate
+        self.failure_rate = failure_rate
+        self.calls: Counter = Counter()
+        self.busy = 0.0
+        self._lock = threading.RLock()
+        self._random = random.Random(seed)
+        self._scripted_faults = []
+        self._link_free_at = 0.0
+        self._buckets: set = set(buckets or [])
+        # (bucket, key) -> bytes
+        self._objects = _ObjectStore(objects)
+        # upload_id -> {"bucket": str, "key": str, "parts": {part_no: bytes}}
+        self._pending_uploads: dict = {}
+
+    # ------------------------------------------------------------------
+    # Fault injection and throttling
+    # ------------------------------------------------------------------
+    def fail_next(self, error="SlowDown", count=1, methods=None):
+        """Make the next *count* matching requests fail.
+
+        *error* is a COS error code (raised as ``CosServiceError``) or an
+        exception instance.  *methods* restricts the fault to the given SDK
+        method names.
+        """
+        with self._lock:
+            for _ in range(count):
+                self._scripted_faults.append((error, set(methods) if methods else None))
+
+    def _draw_fault(self, name):
+        for i, (error, methods) in enumerate(self._scripted_faults):
+            if methods is None or name in methods:
+                del self._scripted_faults[i]
+                if isinstance(error, str):
+                    status = 503 if error in ("SlowDown", "ServiceUnavailable") else 500
+                    return make_cos_error(error, status, f"injected {error}")
+                return error
+        if self.slowdown_rate or self.failure_rate:
+            draw = self._random.random()
+            if draw < self.slowdown_rate:
+                return make_cos_error("SlowDown", 503, "Please reduce your request rate.")
+            if draw < self.slowdown_rate + self.failure_rate:
+                return InjectedConnectionError("injected network failure")
+        return None
+
+    def _throttle(self, nbytes):
+        if not nbytes:
+            return
+        delay = nbytes / self.bandwidth if self.bandwidth else 0.0
+        if self.total_bandwidth:
+            # Requests share one link: each reserves its slot after the previous one.
+            with self._lock:
+                now = time.monotonic()
+                start = max(now, self._link_free_at)
+                self._link_free_at = start + nbytes / self.total_bandwidth
+                delay = max(delay, self._link_free_at - now)
+        if delay > 0:
+            time.sleep(delay)
+
+    # ------------------------------------------------------------------
+    # Internal helpers
+    # ------------------------------------------------------------------
+    def _require_bucket(self, bucket):
+        if bucket not in self._buckets:
+            raise make_cos_error("NoSuchBucket", 404, f"Bucket {bucket} does not exist")
+
+    def _require_key(self, bucket, key):
+        self._require_bucket(bucket)
+        if (bucket, key) not in self._objects:
+            raise make_cos_error("NoSuchKey", 404, f"{bucket}/{key} not found")
+
+    @staticmethod
+    def _now_str():
+        return datetime.now(timezone.utc).strftime("%a, %d %b %Y %H:%M:%S GMT")
+
+    @staticmethod
+    def _etag():
+        return f'"{uuid.uuid4().hex}"'
+
+    def _object_headers(self, bucket, key):
+        data = self._objects[(bucket, key)]
+        meta = self._objects.meta((bucket, key))
+        headers = {
+            "Content-Length": str(len(data)),
+            "ETag": meta["ETag"],
+            "Last-Modified": formatdate(meta["mtime"], usegmt=True),
+            "Content-Type": "application/octet-stream",
+        }
+        if isinstance(data, bytes):
+            if "crc64" not in meta:
+                meta["crc64"] = str(_crc64(data))
+            headers[CRC64_HEADER] = meta["crc64"]
+        return headers
+
+    # ------------------------------------------------------------------
+    # Read methods
+    # ------------------------------------------------------------------
+    @_api
+    def get_object(self, Bucket, Key, **kwargs):
+        self._require_key(Bucket, Key)
+        data = self._objects[(Bucket, Key)]
+        headers = self._object_headers(Bucket, Key)
+        if_match = kwargs.get("IfMatch")
+        if if_match and if_match.strip('"') != headers["ETag"].strip('"'):
+            raise make_cos_error("PreconditionFailed", 412, "If-Match precondition failed")
+        start, end = 0, len(data)
+        range_header = kwargs.get("Range")
+        if range_header:
+            m = re.match(r"bytes=(\d*)-(\d*)", range_header)
+            if m and m.group(1):
+                start = int(m.group(1))
+                end = min(int(m.group(2)) + 1, len(data)) if m.group(2) else len(data)
+            elif m and m.group(2):  # suffix range: the last N bytes
+                start = max(len(data) - int(m.group(2)), 0)
+            if m and (m.group(1) or m.group(2)):
+                if start >= len(data):  # every range of an empty object, as on COS
+                    raise make_cos_error("InvalidRange", 416, "The requested range is not satisfiable")
+                headers["Content-Range"] = f"bytes {start}-{max(end - 1, start)}/{len(data)}"
+                headers["Content-Length"] = str(max(end - start, 0))
+        headers["Body"] = FakeStreamBody(data[start:end])
+        return headers
+
+    @_api
+    def head_object(self, Bucket, Key, **kwargs):
+        self._require_key(Bucket, Key)
+        return self._object_headers(Bucket, Key)
+
+    @_api
+    def object_exists(self, Bucket, Key, **kwargs):
+        self._require_bucket(Bucket)
+        return (Bucket, Key) in self._objects
+
+    # ------------------------------------------------------------------
+    # List methods
+    # ------------------------------------------------------------------
+    def _list_entry(self, bucket, key):
+        meta = self._objects.meta((bucket, key))
+        return {
+            "Key": key,
+            "Size": str(len(self._objects[(bucket, key)])),
+            "LastModified": datetime.fromtimestamp(meta["mtime"], timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.000Z"),
+            "ETag": meta["ETag"],
+            "StorageClass": "STANDARD",
+        }
+
+    @_api
+    def list_objects(self, Bucket, Prefix="", Delimiter="", Marker="", MaxKeys=1000, **kwargs):
+        self._require_bucket(Bucket)
+        max_keys = self.MAX_LIST_KEYS if MaxKeys is None else min(int(MaxKeys), self.MAX_LIST_KEYS)
+        keys = self._objects.keys_of(Bucket)
+
+        # Seek to the first candidate: after the marker, or at the prefix.
+        pos = bisect.bisect_left(keys, Prefix)
+        if Marker and Marker >= Prefix:
+            if Delimiter and Marker.endswith(Delimiter) and Delimiter in Marker[len(Prefix):]:
+                # The marker is a common prefix: skip everything rolled up under it.
+                pos = bisect.bisect_left(keys, _successor(Marker))
+            else:
+                pos = bisect.bisect_right(keys, Marker)
+
+        contents = []
+        common_prefixes = []
+        next_marker = ""
+        is_truncated = False
+        while pos < len(keys):
+            key = keys[pos]
+            if not key.startswith(Prefix):
+                break
+            if (Bucket, key) not in self._objects:
+                pos += 1  # tombstone
+                continue
+            if len(contents) + len(common_prefixes) >= max_keys:
+                is_truncated = True
+                break
+            if Delimiter:
+                delim_pos = key.find(Delimiter, len(Prefix))
+                if delim_pos >= 0:
+                    # This key belongs under a common prefix; jump past all of them.
+                    cpfx = key[: delim_pos + len(Delimiter)]
+                    common_prefixes.append({"Prefix": cpfx})
+                    next_marker = cpfx
+                    pos = bisect.bisect_left(keys, _successor(cpfx), pos)
+                    continue
+            contents.append(self._list_entry(Bucket, key))
+            next_marker = key
+            pos += 1
+
+        result = {
+            "Name": Bucket,
+            "Prefix": Prefix,
+            "Marker": Marker,
+            "MaxKeys": str(max_keys),
+            "IsTruncated": "true" if is_truncated else "false",
+            "NextMarker": next_marker if is_truncated else "",
+        }
+        if Delimiter:
+            result["Delimiter"] = Delimiter
+        if contents:
+            result["Contents"] = contents
+        if common_prefixes:
+            result["CommonPrefixes"] = common_prefixes
+        return result
+
+    @_api
+    def list_buckets(self, **kwargs):
+        buckets = [
+            {"Name": b, "Location": self.region, "CreationDate": self._now_str()} for b in sorted(self._buckets)
+        ]
+        return {"Buckets": {"Bucket": buckets}}
+
+    @_api
+    def head_bucket(self, Bucket, **kwargs):
+        self._require_bucket(Bucket)
+        return {"x-cos-bucket-region": self.region}
+
+    # ------------------------------------------------------------------
+    # Write methods
+    # ------------------------------------------------------------------
+    @_api
+    def put_object(self, Bucket, Key, Body=b"", **kwargs):
+        self._require_bucket(Bucket)
+        self._objects[(Bucket, Key)] = data = _to_bytes(Body)
+        return {"ETag": self._objects.meta((Bucket, Key))["ETag"], CRC64_HEADER: str(_crc64(data))}
+
+    @_api
+    def create_multipart_upload(self, Bucket, Key, **kwargs):
+        self._require_bucket(Bucket)
+        upload_id = uuid.uuid4().hex
+        self._pending_uploads[upload_id] = {
+            "bucket": Bucket,
+            "key": Key,
+            "parts": {},
+        }
+        return {"Bucket": Bucket, "Key": Key, "UploadId": upload_id}
+
+    @_api
+    def upload_part(self, Bucket, Key, Body, PartNumber, UploadId, **kwargs):
+        if UploadId not in self._pending_uploads:
+            raise make_cos_error("NoSuchUpload", 404, f"Upload {UploadId} not found")
+        Body = _to_bytes(Body)
+        self._pending_uploads[UploadId]["parts"][int(PartNumber)] = Body
+        return {"ETag": f'"{hashlib.md5(Body).hexdigest()}"', CRC64_HEADER: str(_crc64(Body))}
+
+    @_api
+    def complete_multipart_upload(self, Bucket, Key, UploadId, MultipartUpload, **kwargs):
+        if UploadId not in self._pending_uploads:
+            raise make_cos_error("NoSuchUpload", 404, f"Upload {UploadId} not found")
+        upload = self._pending_uploads.pop(UploadId)
+        # Assemble parts in order
+        part_numbers = sorted(upload["parts"].keys())
+        data = b"".join(upload["parts"][n] for n in part_numbers)
+        digest = hashlib.md5(b"".join(hashlib.md5(upload["parts"][n]).digest() for n in part_numbers))
+        etag = f'"{digest.hexdigest()}-{len(part_numbers)}"'
+        self._objects.put((Bucket, Key), data, etag=etag)
+        return {"Bucket": Bucket, "Key": Key, "ETag": etag, CRC64_HEADER: str(_crc64(data))}
+
+    @_api
+    def abort_multipart_upload(self, Bucket, Key, UploadId, **kwargs):
+        self._pending_uploads.pop(UploadId, None)
+
+    # ------------------------------------------------------------------
+    # Delete methods
+    # ------------------------------------------------------------------
+    @_api
+    def delete_object(self, Bucket, Key, **kwargs):
+        self._require_bucket(Bucket)
+        self._objects.pop((Bucket, Key), None)
+        return {}
+
+    @_api
+    def delete_objects(self, Bucket, Delete, **kwargs):
+        self._require_bucket(Bucket)
+        deleted = []
+        for obj in Delete.get("Object", []):
+            self._objects.pop((Bucket, obj["Key"]), None)
+            deleted.append({"Key": obj["Key"]})
+        return {"Deleted": deleted} if str(Delete.get("Quiet", "false")).lower() != "true" else {}
+
+    # ------------------------------------------------------------------
+    # Bucket management
+    # ------------------------------------------------------------------
+    @_api
+    def create_bucket(self, Bucket, **kwargs):
+        if Bucket in self._buckets:
+            raise make_cos_error("BucketAlreadyOwnedByYou", 409, f"Bucket {Bucket} already exists")
+        self._buckets.add(Bucket)
+
+    @_api
+    def delete_bucket(self, Bucket, **kwargs):
+        self._require_bucket(Bucket)
+        if self._objects.count(Bucket):
+            raise make_cos_error("BucketNotEmpty", 409, f"Bucket {Bucket} is not empty")
+        self._buckets.discard(Bucket)
+
+    # ------------------------------------------------------------------
+    # File transfer helpers
+    # ------------------------------------------------------------------
+    @_api
+    def download_file(self, Bucket, Key, DestFilePath, **kwargs):
+        self._require_key(Bucket, Key)
+        data = self._objects[(Bucket, Key)]
+        with open(DestFilePath, "wb") as f:
+            f.write(data)
+
+    @_api
+    def upload_file(self, Bucket, Key, LocalFilePath, **kwargs):
+        self._require_bucket(Bucket)
+        with open(LocalFilePath, "rb") as f:
+            data = f.read()
+        self._objects[(Bucket, Key)] = data
+        return {"ETag": self._objects.meta((Bucket, Key))["ETag"]}
+
+    # ------------------------------------------------------------------
+    # Copy
+    # ------------------------------------------------------------------
+    @_api
+    def copy(self, Bucket, Key, CopySource, **kwargs):
+        src_bucket = CopySource["Bucket"]
+        src_key = CopySource["Key"]
+        self._require_key(src_bucket, src_key)
+        self._require_bucket(Bucket)
+        src_meta = self._objects.meta((src_bucket, src_key))
+        self._objects.put((Bucket, Key), self._objects[(src_bucket, src_key)], etag=src_meta["ETag"])
+        return {"ETag": src_meta["ETag"]}
+
+    # ------------------------------------------------------------------
+    # Presigned URL
+    # ------------------------------------------------------------------
+    def get_presigned_download_url(self, Bucket, Key, Expired=3600, **kwargs):
+        return f"https://{Bucket}.cos.ap-guangzhou.myqcloud.com/{Key}?sign=mock&expired={Expired}"
+
+    # ------------------------------------------------------------------
+    # Append (used by COSFile in append mode)
+    # ------------------------------------------------------------------
+    @_api
+    def append_object(self, Bucket, Key, Position=0, Data=b"", **kwargs):
+        self._require_bucket(Bucket)
+        existing = self._objects.get((Bucket, Key), b"")
+        Data = _to_bytes(Data)
+        if Position != len(existing):
+            raise make_cos_error("PositionNotEqualToLength", 409,
+                                 "Position is not equal to the length of the object")
+        self._objects[(Bucket, Key)] = existing + Data
+        return {
+            "ETag": self._objects.meta((Bucket, Key))["ETag"],
+            "x-cos-next-append-position": str(Position + len(Data)),
+        }
+
+
+# ---------------------------------------------------------------------------
+# HTTP front-end speaking the COS XML API
+# ---------------------------------------------------------------------------
+def _xml(root_tag, fields):
+    """Serialise a nested dict / list structure as a COS XML document."""
+    def build(parent, value):
+        if isinstance(value, dict):
+            for tag, child in value.items():
+                for item in child if isinstance(child, list) else [child]:
+                    build(ET.SubElement(parent, tag), item)
+        elif value is not None:
+            parent.text = str(value)
+
+    root = ET.Element(root_tag)
+    build(root, fields)
+    return b'<?xml version="1.0" encoding="UTF-8"?>\n' + ET.tostring(root)
+
+
+class _CosRequestHandler(BaseHTTPRequestHandler):
+    """Translate COS XML API requests into ``MockCosClient`` calls."""
+
+    protocol_version = "HTTP/1.1"
+    # Headers and body go out in separate writes; without TCP_NODELAY every
+    # keep-alive response stalls on the peer's delayed ACK (~40 ms).
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):  # pylint: disable=redefined-builtin
+        pass
+
+    # -- plumbing -------------------------------------------------------
+    def _target(self):
+        """Return ``(bucket, key, query)`` for the current request."""
+        url = urlsplit(self.path)
+        # Proxy-style requests carry an absolute URL; direct ones use Host.
+        host = url.hostname or self.headers.get("Host", "").split(":")[0]
+        bucket = None
+        if ".cos." in host and not host.startswith("service.cos."):
+            bucket = host.split(".cos.", 1)[0]
+        key = unquote(url.path.lstrip("/"))
+        return bucket, key, parse_qs(url.query, keep_blank_values=True)
+
+    def _body(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        if not length:
+            return b""
+        # Clients without TCP_NODELAY (the SDK's proxy connections) hold the
+        # body back until the header segment is ACKed; ACK it immediately.
+        if hasattr(socket, "TCP_QUICKACK"):
+            self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_QUICKACK, 1)
+        return self.rfile.read(length)
+
+    def _send(self, status=200, headers=None, body=b""):
+        self.send_response(status)
+        headers = dict(headers or {})
+        headers.setdefault("x-cos-request-id", uuid.uuid4().hex)
+        for name, value in headers.items():
+            if name not in ("Body", "Content-Length"):
+                self.send_header(name, str(value))
+        length = headers.get("Content-Length", len(body))
+        self.send_header("Content-Length", str(length))
+        self.end_headers()
+        if self.command != "HEAD" and body:
+            self.wfile.write(body)
+
+    def _send_error(self, error):
+        digest = error.get_digest_msg()
+        body = _xml("Error", {
+            "Code": digest["code"],
+            "Message": digest["message"],
+            "Resource": self.path,
+            "RequestId": digest.get("requestid", "mock-request-id"),
+            "TraceId": digest.get("traceid", "mock-trace-id"),
+        })
+        self._send(int(error.get_status_code()), {"Content-Type": "application/xml"}, body)
+
+    def _dispatch(self):
+        client = self.server.client
+        bucket, key, query = self._target()
+        payload = self._body()
+        try:
+            handler = getattr(self, f"_{self.command.lower()}_{'object' if key else 'bucket' if bucket else 'service'}")
+            handler(client, bucket, key, query, payload)
+        except CosServiceError as e:
+            self._send_error(e)
+        except ConnectionError:
+            # Injected network failure: drop the connection without a response.
+            self.close_connection = True
+
+    do_GET = do_HEAD = do_PUT = do_POST = do_DELETE = _dispatch
+
+    # -- service and bucket requests ------------------------------------
+    def _get_service(self, client, bucket, key, query, payload):
+        buckets = client.list_buckets()["Buckets"]["Bucket"]
+        self._send(200, {"Content-Type": "application/xml"},
+                   _xml("ListAllMyBucketsResult", {"Buckets": {"Bucket": buckets}}))
+
+    def _get_bucket(self, client, bucket, key, query, payload):
+        if "uploads" in query:
+            self._send(200, {"Content-Type": "application/xml"},
+                       _xml("ListMultipartUploadsResult", {"Bucket": bucket, "IsTruncated": "false"}))
+            return
+        arg = lambda name, default="": query.get(name, [default])[0]  # noqa: E731
+        resp = client.list_objects(Bucket=bucket, Prefix=arg("prefix"), Delimiter=arg("delimiter"),
+                                   Marker=arg("marker"), MaxKeys=int(arg("max-keys", "1000")))
+        if arg("encoding-type") == "url":
+            for name in ("Prefix", "Marker", "NextMarker"):
+                resp[name] = quote(resp.get(name, ""), safe="/")
+            for obj in resp.get("Contents", []):
+                obj["Key"] = quote(obj["Key"], safe="/")
+            for obj in resp.get("CommonPrefixes", []):
+                obj["Prefix"] = quote(obj["Prefix"], safe="/")
+            resp["EncodingType"] = "url"
+        if not resp.get("NextMarker"):
+            resp.pop("NextMarker", None)
+        self._send(200, {"Content-Type": "application/xml"}, _xml("ListBucketResult", resp))
+
+    def _head_bucket(self, client, bucket, key, query, payload):
+        self._send(200, client.head_bucket(Bucket=bucket))
+
+    def _put_bucket(self, client, bucket, key, query, payload):
+        client.create_bucket(Bucket=bucket)
+        self._send(200)
+
+    def _delete_bucket(self, client, bucket, key, query, payload):
+        client.delete_bucket(Bucket=bucket)
+        self._send(204)
+
+    def _post_bucket(self, client, bucket, key, query, payload):
+        root = ET.fromstring(payload)
+        spec = {
+            "Quiet": root.findtext("Quiet", "false"),
+            "Object": [{"Key": obj.findtext("Key")} for obj in root.iter("Object")],
+        }
+        resp = client.delete_objects(Bucket=bucket, Delete=spec)
+        self._send(200, {"Content-Type": "application/xml"}, _xml("DeleteResult", resp))
+
+    # -- object requests ------------------------------------------------
+    def _get_object(self, client, bucket, key, query, payload):
+        kwargs = {arg: self.headers[name] for name, arg in (("Range", "Range"), ("If-Match", "IfMatch"))
+                  if self.headers.get(name)}
+        resp = client.get_object(Bucket=bucket, Key=key, **kwargs)
+        body = resp.pop("Body")._data[:]
+        self._send(206 if "Content-Range" in resp else 200, resp, body)
+
+    def _head_object(self, client, bucket, key, query, payload):
+        self._send(200, client.head_object(Bucket=bucket, Key=key))
+
+    def _put_object(self, client, bucket, key, query, payload):
+        if "partNumber" in query:
+            resp = client.upload_part(Bucket=bucket, Key=key, Body=payload, PartNumber=int(query["partNumber"][0]),
+                                      UploadId=query["uploadId"][0])
+            self._send(200, resp)
+        elif self.headers.get("x-cos-copy-source"):
+            source = urlsplit("http://" + self.headers["x-cos-copy-source"])
+            src_bucket = source.hostname.split(".cos.", 1)[0]
+            resp = client.copy(Bucket=bucket, Key=key,
+                               CopySource={"Bucket": src_bucket, "Key": unquote(source.path.lstrip("/"))})
+            body = _xml("CopyObjectResult", {"ETag": resp["ETag"], "LastModified": client._now_str()})
+            self._send(200, {"Content-Type": "application/xml"}, body)
+        else:
+            self._send(200, client.put_object(Bucket=bucket, Key=key, Body=payload))
+
+    def _post_object(self, client, bucket, key, query, payload):
+        if "uploads" in query:
+            resp = client.create_multipart_upload(Bucket=bucket, Key=key)
+            self._send(200, {"Content-Type": "application/xml"}, _xml("InitiateMultipartUploadResult", resp))
+        elif "uploadId" in query:
+            parts = [{"PartNumber": int(p.findtext("PartNumber")), "ETag": p.findtext("ETag")}
+                     for p in ET.fromstring(payload).iter("Part")]
+            resp = client.complete_multipart_upload(Bucket=bucket, Key=key, UploadId=query["uploadId"][0],
+                                                    MultipartUpload={"Part": parts})
+            headers = {"Content-Type": "application/xml", CRC64_HEADER: resp.pop(CRC64_HEADER)}
+            self._send(200, headers, _xml("CompleteMultipartUploadResult", resp))
+        elif "append" in query:
+            resp = client.append_object(Bucket=bucket, Key=key, Position=int(query["position"][0]), Data=payload)
+            self._send(200, resp)
+        else:
+            raise make_cos_error("MethodNotAllowed", 405, "unsupported POST")
+
+    def _delete_object(self, client, bucket, key, query, payload):
+        if "uploadId" in query:
+            client.abort_multipart_upload(Bucket=bucket, Key=key, UploadId=query["uploadId"][0])
+        else:
+            client.delete_object(Bucket=bucket, Key=key)
+        self._send(204)
+
+
+class CosEmulatorServer(ThreadingHTTPServer):
+    """Threaded HTTP server exposing a ``MockCosClient`` over the COS XML API."""
+
+    daemon_threads = True
+
+    def __init__(self, client, host="127.0.0.1", port=0):
+        super().__init__((host, port), _CosRequestHandler)
+        self.client = client
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def cos_config_kwargs(self, region="ap-guangzhou"):
+        """Keyword arguments for ``CosConfig`` that route every request here."""
+        return {
+            "Region": region,
+            "SecretId": "emulator",
+            "SecretKey": "emulator",
+            "Scheme": "http",
+            "Proxies": {"http": self.url},
+        }
+
+    def start(self):
+        """Serve from a daemon thread and return ``self``."""
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+def serve_http(client, host="127.0.0.1", port=0):
+    """Start a background HTTP emulator for *client* and return the server."""
+    return CosEmulatorServer(client, host, port).start()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m cosfs.emulator",
+                                     description="Run a local COS emulator over HTTP.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9000)
+    parser.add_argument("--bucket", action="append", default=[], help="bucket to create (repeatable)")
+    parser.add_argument("--latency", type=float, default=0.0, help="per-request latency in seconds")
+    parser.add_argument("--bandwidth", type=float, default=None, help="per-request bytes/second cap")
+    parser.add_argument("--total-bandwidth", type=float, default=None, help="aggregate bytes/second cap")
+    parser.add_argument("--slowdown-rate", type=float, default=0.0)
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args(argv)
+
+    client = MockCosClient(buckets=set(args.bucket), latency=args.latency, bandwidth=args.bandwidth,
+                           total_bandwidth=args.total_bandwidth, slowdown_rate=args.slowdown_rate,
+                           failure_rate=args.failure_rate, seed=args.seed)
+    server = CosEmulatorServer(client, args.host, args.port)
+    print(f"COS emulator listening on {server.url} (use it as the HTTP proxy with Scheme='http')", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
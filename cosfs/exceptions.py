@@ -0,0 +1,30 @@
+"""Exceptions raised by cosfs."""
+
+import errno
+
+
+class FileExpired(OSError):
+    """The object changed after it was opened: its ETag no longer matches.
+
+    Raised instead of returning a mix of old and new bytes; reopen the
+    file to read the current version.
+    """
+
+    def __init__(self, message="The object changed since it was opened", path=None, etag=None):
+        super().__init__(errno.EBUSY, message)
+        self.path = path
+        self.etag = etag
+
+
+class ChecksumMismatch(OSError):
+    """Data did not arrive intact: its CRC64 differs from the one COS reports.
+
+    ``local`` is the checksum of the bytes cosfs sent or received,
+    ``remote`` the ``x-cos-hash-crc64ecma`` value returned by COS.
+    """
+
+    def __init__(self, message="CRC64 mismatch", path=None, local=None, remote=None):
+        super().__init__(errno.EIO, message)
+        self.path = path
+        self.local = local
+        self.remote = remote
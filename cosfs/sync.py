@@ -0,0 +1,128 @@
+"""Incremental, rsync-style synchronisation between local directories and COS.
+
+``COSFileSystem.sync`` compares a local directory tree with a COS prefix
+and copies only what differs.  Both sides are listed as streams in the
+same (lexicographic key) order and merged, so memory holds the diff plan
+rather than either listing: a flat ``list_objects`` walk for COS, sorted
+``os.scandir`` recursion for the local tree.
+
+A file is copied when it is missing at the destination, when the sizes
+differ, or when the source is newer (at whole-second resolution, the
+precision of COS's ``LastModified``).  With ``checksum=True`` files of the
+same size are compared by content instead of time: against the object's
+ETag when it is a plain MD5, otherwise (multipart objects) against the
+CRC64 COS reports for the object.
+"""
+
+import calendar
+import hashlib
+import os
+import time
+from typing import Callable, Iterable, Iterator, List, Optional, Tuple
+
+Entry = Tuple[str, dict]
+
+
+def local_entries(root: str) -> Iterator[Entry]:
+    """Files below *root* as ``(relative path, info)``, in key order."""
+
+    def scan(directory, rel):
+        try:
+            with os.scandir(directory) as it:
+                # A directory sorts as "name/" so that its files are ordered as COS keys are.
+                entries = sorted(it, key=lambda e: e.name + "/" if e.is_dir() else e.name)
+        except FileNotFoundError:
+            return
+        for entry in entries:
+            if entry.is_dir():
+                yield from scan(entry.path, rel + entry.name + "/")
+            elif entry.is_file():
+                st = entry.stat()
+                yield rel + entry.name, {"path": entry.path, "size": st.st_size, "mtime": st.st_mtime}
+
+    yield from scan(root, "")
+
+
+def remote_entries(pages: Iterable[dict], bucket: str, prefix: str) -> Iterator[Entry]:
+    """Objects of flat ``list_objects`` *pages* below *prefix*, as ``(relative path, info)``."""
+    for resp in pages:
+        for obj in resp.get("Contents", []):
+            key = obj["Key"]
+            if key.endswith("/"):
+                continue  # directory markers
+            yield key[len(prefix):], {
+                "path": f"{bucket}/{key}",
+                "size": int(obj.get("Size", 0)),
+                "mtime": parse_last_modified(obj.get("LastModified")),
+                "ETag": obj.get("ETag", "").strip('"'),
+            }
+
+
+def parse_last_modified(value: Optional[str]) -> float:
+    """Seconds since the epoch of a COS ``LastModified`` timestamp (0 when missing)."""
+    if not value:
+        return 0.0
+    return float(calendar.timegm(time.strptime(value[:19], "%Y-%m-%dT%H:%M:%S")))
+
+
+def merge(src: Iterator[Entry], dst: Iterator[Entry]) -> Iterator[Tuple[str, Optional[dict], Optional[dict]]]:
+    """Join two listings sorted by relative path into ``(path, src info, dst info)``."""
+    missing = object()
+    s, d = next(src, missing), next(dst, missing)
+    while s is not missing or d is not missing:
+        if d is missing or s is not missing and s[0] < d[0]:
+            yield s[0], s[1], None
+            s = next(src, missing)
+        elif s is missing or d[0] < s[0]:
+            yield d[0], None, d[1]
+            d = next(dst, missing)
+        else:
+            yield s[0], s[1], d[1]
+            s, d = next(src, missing), next(dst, missing)
+
+
+def file_md5(path: str, blocksize: int = 2 ** 20) -> str:
+    md5 = hashlib.md5()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(blocksize), b""):
+            md5.update(block)
+    return md5.hexdigest()
+
+
+def differs(src: dict, dst: dict, checksum: bool = False,
+            same_content: Optional[Callable[[dict, dict], bool]] = None) -> bool:
+    """Whether *src* has to be copied over *dst*.
+
+    With *checksum*, an object whose ETag is not a plain MD5 is compared by
+    ``same_content(remote, local)``, which checks its CRC64.
+    """
+    if src["size"] != dst["size"]:
+        return True
+    if checksum:
+        remote, local = (src, dst) if "ETag" in src else (dst, src)
+        etag = remote.get("ETag")
+        if etag and "-" not in etag:
+            return file_md5(local["path"]) != etag
+        if same_content is not None:
+            return not same_content(remote, local)
+    return int(src["mtime"]) > int(dst["mtime"])
+
+
+def plan_sync(src: Iterator[Entry], dst: Iterator[Entry], copy_action: str, dst_path: Callable[[str], str],
+              delete: bool = False, checksum: bool = False,
+              same_content: Optional[Callable[[dict, dict], bool]] = None) -> List[dict]:
+    """The actions that bring *dst* in line with *src*.
+
+    Each action is a dict with ``action`` (*copy_action* or ``"delete"``),
+    ``src`` and ``dst`` paths (``src`` is ``None`` for deletions) and the
+    ``size`` of the file concerned.  *dst_path* maps a relative path to its
+    destination; *same_content* is passed on to ``differs``.
+    """
+    actions = []
+    for rel, s, d in merge(src, dst):
+        if s is None:
+            if delete:
+                actions.append({"action": "delete", "src": None, "dst": d["path"], "size": d["size"]})
+        elif d is None or differs(s, d, checksum, same_content):
+            actions.append({"action": copy_action, "src": s["path"], "dst": dst_path(rel), "size": s["size"]})
+    return actions
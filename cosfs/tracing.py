@@ -0,0 +1,196 @@
+"""Request tracing hooks for span-level profiling of COS calls.
+
+Hooks are registered process-wide with :func:`add_request_hook` and receive a
+*span* dict at the start and at the end of every COS SDK request issued via
+``_call_cos`` (one span per attempt, so retries are visible) and of every
+block fetched or uploaded by ``COSFile``.
+
+A span carries the following keys:
+
+``operation``
+    SDK method name (``get_object``, ``upload_part`` …) or a ``COSFile.*``
+    name for file-level spans.
+``bucket`` / ``key`` / ``range``
+    Target of the request; ``range`` is the ``Range`` header or a
+    ``(start, end)`` tuple for file-level spans, ``None`` otherwise.
+``attempt``
+    Zero-based retry attempt (always 0 for file-level spans).
+``start`` / ``end`` / ``duration``
+    ``time.perf_counter()`` timestamps and elapsed seconds.
+``outcome`` / ``error``
+    ``"ok"``, ``"retry"`` (a retryable failure) or ``"error"``, plus the
+    exception raised, if any.
+
+Hooks may store their own state in the span dict between the two events.
+When no hook is registered the instrumentation costs a single truthiness
+check per request.
+"""
+import logging
+import time
+from typing import Callable, List, Optional, Union
+
+logger = logging.getLogger("cosfs")
+
+
+class RequestHook:
+    """Base class for request hooks; override either method."""
+
+    def on_start(self, span: dict) -> None:
+        pass
+
+    def on_end(self, span: dict) -> None:
+        pass
+
+
+class _CallbackHook(RequestHook):
+    """Adapt a plain ``callback(event, span)`` function to ``RequestHook``."""
+
+    def __init__(self, callback: Callable[[str, dict], None]):
+        self.callback = callback
+
+    def on_start(self, span):
+        self.callback("start", span)
+
+    def on_end(self, span):
+        self.callback("end", span)
+
+
+class OpenTelemetryHook(RequestHook):
+    """Emit one OpenTelemetry span per COS request.
+
+    Requires the ``opentelemetry-api`` package.  When *tracer* is omitted
+    the global tracer provider is used.
+    """
+
+    def __init__(self, tracer=None):
+        try:
+            from opentelemetry import trace
+        except ImportError as e:
+            raise ImportError("OpenTelemetryHook requires the 'opentelemetry-api' package") from e
+        self._trace = trace
+        self.tracer = tracer or trace.get_tracer("cosfs")
+
+    def on_start(self, span):
+        attributes = {"cos.attempt": span["attempt"]}
+        for name in ("bucket", "key"):
+            if span[name]:
+                attributes[f"cos.{name}"] = span[name]
+        if span["range"] is not None:
+            attributes["cos.range"] = str(span["range"])
+        span["otel_span"] = self.tracer.start_span(f"cos.{span['operation']}", attributes=attributes)
+
+    def on_end(self, span):
+        otel_span = span.pop("otel_span", None)
+        if otel_span is None:
+            return
+        otel_span.set_attribute("cos.outcome", span["outcome"])
+        if span["error"] is not None:
+            otel_span.record_exception(span["error"])
+            otel_span.set_status(self._trace.Status(self._trace.StatusCode.ERROR, str(span["error"])))
+        otel_span.end()
+
+
+# Registered hooks; kept as a plain list so the disabled check is a truthiness test.
+_request_hooks: List[RequestHook] = []
+
+
+def add_request_hook(hook: Union[RequestHook, Callable[[str, dict], None]]) -> RequestHook:
+    """Register *hook* for every subsequent COS request.
+
+    *hook* is either a ``RequestHook`` or a plain ``callback(event, span)``
+    function, where *event* is ``"start"`` or ``"end"``.  The registered
+    object is returned so it can later be passed to
+    :func:`remove_request_hook`.
+    """
+    if not isinstance(hook, RequestHook):
+        hook = _CallbackHook(hook)
+    _request_hooks.append(hook)
+    return hook
+
+
+def remove_request_hook(hook: Union[RequestHook, Callable[[str, dict], None]]) -> None:
+    """Unregister a hook previously passed to :func:`add_request_hook`."""
+    for registered in list(_request_hooks):
+        if registered is hook or getattr(registered, "callback", None) is hook:
+            _request_hooks.remove(registered)
+
+
+def clear_request_hooks() -> None:
+    """Unregister every hook."""
+    _request_hooks.clear()
+
+
+def start_span(operation: str, bucket: Optional[str] = None, key: Optional[str] = None,
+               byte_range=None, attempt: int = 0) -> dict:
+    """Open a span and notify every registered hook."""
+    span = {
+        "operation": operation,
+        "bucket": bucket,
+        "key": key,
+        "range": byte_range,
+        "attempt": attempt,
+        "start": time.perf_counter(),
+        "end": None,
+        "duration": None,
+        "outcome": None,
+        "error": None,
+    }
+    for hook in _request_hooks:
+        try:
+            hook.on_start(span)
+        except Exception:  # pylint: disable=broad-except
+            logger.warning("Request hook %r failed on start", hook, exc_info=True)
+    return span
+
+
+def end_span(span: dict, outcome: str = "ok", error: Optional[BaseException] = None) -> None:
+    """Close *span* with *outcome* and notify every registered hook."""
+    span["end"] = time.perf_counter()
+    span["duration"] = span["end"] - span["start"]
+    span["outcome"] = outcome
+    span["error"] = error
+    for hook in _request_hooks:
+        try:
+            hook.on_end(span)
+        except Exception:  # pylint: disable=broad-except
+            logger.warning("Request hook %r failed on end", hook, exc_info=True)
+
+
+class _Span:
+    """Context manager form of :func:`start_span` / :func:`end_span`."""
+
+    __slots__ = ("args", "span")
+
+    def __init__(self, *args):
+        self.args = args
+        self.span = None
+
+    def __enter__(self):
+        self.span = start_span(*self.args)
+        return self.span
+
+    def __exit__(self, exc_type, exc, tb):
+        end_span(self.span, "ok" if exc is None else "error", exc)
+        return False
+
+
+class _NullSpan:
+    """No-op stand-in returned by :func:`span` while tracing is disabled."""
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return None
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+def span(operation: str, bucket: Optional[str] = None, key: Optional[str] = None, byte_range=None):
+    """Return a context manager tracing the enclosed block as one span."""
+    if not _request_hooks:
+        return _NULL_SPAN
+    return _Span(operation, bucket, key, byte_range)
@@ -7,7 +7,7 @@ import fsspec.asyn
 from fsspec.asyn import mirror_sync_methods
 
 from cosfs.core import COSFileSystem
-from tests.mock_cos import MockCosClient
+from cosfs.emulator import MockCosClient
 
 TEST_BUCKET = "test-bucket-1250000000"
 
@@ -0,0 +1,117 @@
+"""Fixtures for the request-count / complexity budget suite.
+
+Every test builds a ``COSFileSystem`` on top of ``MockCosClient`` and runs
+one fsspec operation through :func:`measure`, which records
+
+* wall time (seconds),
+* client time — wall time minus the time spent inside the mock, i.e. the
+  cost of cosfs itself,
+* the number of COS requests per SDK method,
+* peak traced memory (bytes).
+
+Set ``COSFS_PERF_LATENCY`` (seconds) to add a fixed per-request latency to
+the mock; request-count budgets are unaffected, wall times grow with it.
+Measurements are attached to each test's ``user_properties`` so they show
+up in ``--junitxml`` reports.
+
+The suite is deselected by default; run it with ``pytest -m perf``.
+"""
+
+import math
+import os
+import time
+import tracemalloc
+
+import pytest
+
+from cosfs.emulator import MockCosClient
+from tests.conftest import TEST_BUCKET, _make_fs
+
+MiB = 2 ** 20
+GiB = 2 ** 30
+
+PERF_LATENCY = float(os.environ.get("COSFS_PERF_LATENCY", "0"))
+
+
+class SyntheticBlob:
+    """Bytes-like object of *size* deterministic bytes, generated on slicing.
+
+    Lets the mock hold multi-GB objects without allocating them; only the
+    slices actually requested are materialised.
+    """
+
+    _PATTERN = bytes(range(256)) * 4096  # 1 MiB
+
+    def __init__(self, size):
+        self.size = size
+
+    def __len__(self):
+        return self.size
+
+    def __getitem__(self, item):
+        start, stop, _ = item.indices(self.size)
+        if stop <= start:
+            return b""
+        period = len(self._PATTERN)
+        offset = start % period
+        n = stop - start
+        reps = math.ceil((offset + n) / period)
+        return (self._PATTERN * reps)[offset:offset + n]
+
+
+class Measurement:
+    """Result of one :func:`measure` call."""
+
+    def __init__(self, result, wall, client_time, calls, peak):
+        self.result = result
+        self.wall = wall
+        self.client_time = client_time
+        self.calls = calls
+        self.peak = peak
+
+    @property
+    def requests(self):
+        return sum(self.calls.values())
+
+    def as_dict(self):
+        return {
+            "wall": round(self.wall, 6),
+            "client_time": round(self.client_time, 6),
+            "requests": self.requests,
+            "calls": dict(self.calls),
+            "peak_bytes": self.peak,
+        }
+
+
+def measure(fs, func, *args, trace_memory=True, **kwargs):
+    """Run ``func(*args, **kwargs)`` and return a :class:`Measurement`."""
+    client = fs.client
+    client.calls.clear()
+    client.busy = 0.0
+    if trace_memory:
+        tracemalloc.start()
+    start = time.perf_counter()
+    try:
+        result = func(*args, **kwargs)
+        wall = time.perf_counter() - start
+        peak = tracemalloc.get_traced_memory()[1] if trace_memory else 0
+    finally:
+        if trace_memory:
+            tracemalloc.stop()
+    return Measurement(result, wall, max(wall - client.busy, 0.0), client.calls.copy(), peak)
+
+
+def make_perf_fs(n_keys=0, prefix="data", objects=None):
+    """A filesystem whose bucket holds *n_keys* one-byte keys under *prefix*."""
+    objs = {(TEST_BUCKET, f"{prefix}/key{i:07d}"): b"x" for i in range(n_keys)}
+    objs.update(objects or {})
+    return _make_fs(MockCosClient(buckets={TEST_BUCKET}, objects=objs, latency=PERF_LATENCY))
+
+
+@pytest.fixture
+def record(request):
+    """Attach a ``Measurement`` to the running test's report."""
+    def _record(label, measurement):
+        request.node.user_properties.append((label, measurement.as_dict()))
+        return measurement
+    return _record
@@ -0,0 +1,265 @@
+"""Request-count, complexity and memory budgets for fsspec operations.
+
+Budgets are upper bounds: a change that makes an operation cheaper passes,
+one that adds requests or degrades scaling fails.  Large scales are marked
+``slow``; run them with ``pytest -m "perf and slow"``.
+"""
+
+import math
+
+import pytest
+
+from tests.conftest import TEST_BUCKET
+from tests.perf.conftest import GiB, MiB, SyntheticBlob, make_perf_fs, measure
+
+pytestmark = pytest.mark.perf
+
+# COS returns at most 1 000 entries per list_objects page.
+PAGE = 1000
+
+KEY_SCALES = [
+    1_000,
+    10_000,
+    pytest.param(100_000, marks=pytest.mark.slow),
+    pytest.param(1_000_000, marks=pytest.mark.slow),
+]
+
+READ_SIZES = [1 * MiB, 16 * MiB, pytest.param(256 * MiB, marks=pytest.mark.slow)]
+
+RANDOM_READ_SIZES = [1 * MiB, 1 * GiB, 10 * GiB]
+
+WRITE_SIZES = [1 * MiB, 16 * MiB, pytest.param(256 * MiB, marks=pytest.mark.slow)]
+
+# Scaling a listing tenfold may cost at most this factor in cosfs-side time
+# (10 would be perfectly linear; quadratic code lands near 100).
+MAX_SCALING_FACTOR = 30
+
+
+def pages(n):
+    return max(1, math.ceil(n / PAGE))
+
+
+# ======================================================================
+# Listing
+# ======================================================================
+
+class TestListingBudgets:
+
+    @pytest.mark.parametrize("n", KEY_SCALES)
+    def test_ls(self, n, record):
+        fs = make_perf_fs(n)
+        m = record("ls", measure(fs, fs.ls, f"{TEST_BUCKET}/data", detail=False, trace_memory=False))
+        assert len(m.result) == n
+        assert m.calls["list_objects"] <= pages(n)
+        assert m.requests == m.calls["list_objects"]
+
+        # A second listing is served from the dircache.
+        again = measure(fs, fs.ls, f"{TEST_BUCKET}/data", detail=False, trace_memory=False)
+        assert again.requests == 0
+
+    @pytest.mark.parametrize("n", KEY_SCALES)
+    def test_find(self, n, record):
+        fs = make_perf_fs(n)
+        m = record("find", measure(fs, fs.find, f"{TEST_BUCKET}/data", trace_memory=False))
+        assert len(m.result) == n
+        assert m.requests <= pages(n)
+
+    def test_find_withdirs(self, record):
+        n = 10_000
+        objects = {(TEST_BUCKET, f"tree/d{i % 100:03d}/f{i:06d}"): b"x" for i in range(n)}
+        fs = make_perf_fs(objects=objects)
+        m = record("find_withdirs", measure(fs, fs.find, f"{TEST_BUCKET}/tree", withdirs=True,
+                                            trace_memory=False))
+        assert len(m.result) == n + 100 + 1  # files, subdirectories and the root
+        assert m.requests <= pages(n)
+
+    def test_find_memory(self, record):
+        n = 5_000
+        fs = make_perf_fs(n)
+        m = record("find_memory", measure(fs, fs.find, f"{TEST_BUCKET}/data", detail=True))
+        # One info dict per entry plus a single listing page in flight.
+        assert m.peak <= n * 2048 + PAGE * 4096
+
+    @pytest.mark.parametrize("n", KEY_SCALES)
+    def test_du(self, n, record):
+        fs = make_perf_fs(n)
+        m = record("du", measure(fs, fs.du, f"{TEST_BUCKET}/data", trace_memory=False))
+        assert m.result == n
+        assert m.requests == pages(n)
+
+    def test_prefix_stats_memory(self, record):
+        n = 20_000
+        fs = make_perf_fs(n)
+        fs.prefix_stats(f"{TEST_BUCKET}/data")  # let the mock build its per-object metadata
+        m = record("prefix_stats_memory", measure(fs, fs.prefix_stats, f"{TEST_BUCKET}/data"))
+        assert m.result["count"] == n
+        # Only the listing page in flight, whatever the number of objects.
+        assert m.peak <= PAGE * 4096
+
+    def test_glob_partition(self, record):
+        days = [f"2026-{m:02d}-{d:02d}" for m in range(1, 13) for d in range(1, 29)]
+        objects = {(TEST_BUCKET, f"logs/{day}/part-{i:03d}.parquet"): b"x" for day in days for i in range(30)}
+        fs = make_perf_fs(objects=objects)
+        m = record("glob_partition", measure(fs, fs.glob, f"{TEST_BUCKET}/logs/2026-10-*/part-*.parquet",
+                                             trace_memory=False))
+        assert len(m.result) == 28 * 30
+        # One page of matching day prefixes, then one page per day: nothing outside October is listed.
+        assert m.requests <= 1 + 28
+
+    @pytest.mark.parametrize("op", ["ls", "find"])
+    def test_listing_scales_linearly(self, op):
+        def best_client_time(n):
+            fs = make_perf_fs(n)
+            func = getattr(fs, op)
+            timings = []
+            for _ in range(3):
+                fs.invalidate_cache()
+                timings.append(measure(fs, func, f"{TEST_BUCKET}/data", trace_memory=False).client_time)
+            return min(timings)
+
+        small, large = best_client_time(1_000), best_client_time(10_000)
+        assert large <= max(small, 1e-3) * MAX_SCALING_FACTOR
+
+
+# ======================================================================
+# Metadata
+# ======================================================================
+
+class TestInfoBudgets:
+
+    def test_info_file(self, record):
+        fs = make_perf_fs(objects={(TEST_BUCKET, "obj"): b"x"})
+        m = record("info_file", measure(fs, fs.info, f"{TEST_BUCKET}/obj"))
+        assert m.result["type"] == "file"
+        assert m.requests <= 2
+
+    def test_info_directory(self, record):
+        fs = make_perf_fs(10)
+        m = record("info_dir", measure(fs, fs.info, f"{TEST_BUCKET}/data"))
+        assert m.result["type"] == "directory"
+        assert m.requests <= 2
+
+    @pytest.mark.parametrize("n", [1_000, 10_000])
+    def test_info_independent_of_listing_size(self, n):
+        fs = make_perf_fs(n)
+        m = measure(fs, fs.info, f"{TEST_BUCKET}/data/key{n - 1:07d}", trace_memory=False)
+        assert m.requests <= 2
+
+
+# ======================================================================
+# Reads
+# ======================================================================
+
+class TestReadBudgets:
+
+    @pytest.mark.parametrize("size", READ_SIZES)
+    def test_cat(self, size, record):
+        fs = make_perf_fs(objects={(TEST_BUCKET, "obj"): SyntheticBlob(size)})
+        m = record("cat", measure(fs, fs.cat_file, f"{TEST_BUCKET}/obj"))
+        assert len(m.result) == size
+        assert m.requests == 1
+        # The payload, one copy on the way through and some slack.
+        assert m.peak <= 3 * size + MiB
+
+    @pytest.mark.parametrize("size", RANDOM_READ_SIZES)
+    def test_cat_range(self, size, record):
+        fs = make_perf_fs(objects={(TEST_BUCKET, "obj"): SyntheticBlob(size)})
+        m = record("cat_range", measure(fs, fs.cat_file, f"{TEST_BUCKET}/obj",
+                                        start=size // 2, end=size // 2 + 4096))
+        assert len(m.result) == 4096
+        assert m.requests == 1
+
+    @pytest.mark.parametrize("size", RANDOM_READ_SIZES)
+    def test_cat_ranges_coalesced(self, size, record):
+        # Parquet/Zarr-style access: 200 small ranges a few KB apart, plus a far one.
+        fs = make_perf_fs(objects={(TEST_BUCKET, "obj"): SyntheticBlob(size)})
+        starts = [i * 4096 for i in range(200)] + [size - 4096]
+        ends = [s + 512 for s in starts]
+        m = record("cat_ranges", measure(fs, fs.cat_ranges, [f"{TEST_BUCKET}/obj"] * len(starts), starts, ends))
+        assert [len(r) for r in m.result] == [512] * len(starts)
+        assert m.requests <= 2
+
+    def test_open_read_small(self, record):
+        fs = make_perf_fs(objects={(TEST_BUCKET, "obj"): b"x" * 100_000})
+
+        def read_all():
+            with fs.open(f"{TEST_BUCKET}/obj", "rb") as f:
+                return f.read()
+
+        m = record("open_read_small", measure(fs, read_all))
+        assert len(m.result) == 100_000
+        # A single GET fetches the whole file; its Content-Range gives the size.
+        assert m.requests == 1
+
+    @pytest.mark.parametrize("size", READ_SIZES)
+    def test_open_read_sequential(self, size, record):
+        fs = make_perf_fs(objects={(TEST_BUCKET, "obj"): SyntheticBlob(size)})
+
+        def read_all():
+            with fs.open(f"{TEST_BUCKET}/obj", "rb") as f:
+                return f.read()
+
+        m = record("open_read", measure(fs, read_all))
+        assert len(m.result) == size
+        assert m.requests <= 1 + math.ceil(size / fs.blocksize)
+
+    @pytest.mark.parametrize("size", RANDOM_READ_SIZES)
+    def test_open_read_random(self, size, record):
+        fs = make_perf_fs(objects={(TEST_BUCKET, "obj"): SyntheticBlob(size)})
+        offsets = [0, size // 3, size // 2, size - 4096]
+
+        def read_at_offsets():
+            with fs.open(f"{TEST_BUCKET}/obj", "rb") as f:
+                for off in offsets:
+                    f.seek(off)
+                    f.read(4096)
+
+        m = record("open_random", measure(fs, read_at_offsets))
+        assert m.requests <= 1 + len(offsets)
+
+
+# ======================================================================
+# Writes, copies and deletes
+# ======================================================================
+
+class TestWriteBudgets:
+
+    @pytest.mark.parametrize("size", WRITE_SIZES)
+    def test_pipe(self, size, record):
+        fs = make_perf_fs()
+        value = SyntheticBlob(size)[0:size]
+        block = fs.blocksize
+        m = record("pipe", measure(fs, fs.pipe_file, f"{TEST_BUCKET}/obj", value, trace_memory=False))
+        if size < 2 * block:
+            assert m.requests == 1
+        else:
+            assert m.requests <= 2 + math.ceil(size / block)
+
+    def test_open_write_small(self, record):
+        fs = make_perf_fs()
+
+        def write_small():
+            with fs.open(f"{TEST_BUCKET}/obj", "wb") as f:
+                f.write(b"x" * 1024)
+
+        m = record("open_write_small", measure(fs, write_small))
+        assert fs.cat_file(f"{TEST_BUCKET}/obj") == b"x" * 1024
+        # A single PUT on close: no multipart upload, existence check or delete.
+        assert m.requests == 1
+
+    def test_cp(self, record):
+        fs = make_perf_fs(objects={(TEST_BUCKET, "src"): b"x" * 1024})
+        m = record("cp", measure(fs, fs.cp_file, f"{TEST_BUCKET}/src", f"{TEST_BUCKET}/dst"))
+        assert m.requests == 1
+
+
+class TestDeleteBudgets:
+
+    @pytest.mark.parametrize("n", KEY_SCALES)
+    def test_rm_recursive(self, n, record):
+        fs = make_perf_fs(n)
+        m = record("rm", measure(fs, fs.rm, f"{TEST_BUCKET}/data", recursive=True, trace_memory=False))
+        assert m.calls["list_objects"] <= pages(n)
+        # Batch deletes of at most 1 000 keys; the prefix itself may ride along.
+        assert m.calls["delete_objects"] <= pages(n + 1)
+        assert m.calls["delete_object"] == 0
@@ -0,0 +1,94 @@
+import json
+from unittest.mock import patch
+
+import pytest
+
+from cosfs import COSFileSystem, bench
+
+from .conftest import TEST_BUCKET
+
+
+class TestHelpers:
+
+    @pytest.mark.parametrize("text, expected", [
+        ("4096", 4096),
+        ("64KiB", 64 * 2 ** 10),
+        ("8M", 8 * 2 ** 20),
+        ("1GB", 2 ** 30),
+        ("1.5k", 1536),
+    ])
+    def test_parse_size(self, text, expected):
+        assert bench.parse_size(text) == expected
+
+    def test_parse_size_invalid(self):
+        with pytest.raises(ValueError):
+            bench.parse_size("lots")
+
+    def test_percentile(self):
+        ordered = list(range(1, 101))
+        assert bench._percentile(ordered, 50) == 50
+        assert bench._percentile(ordered, 99) == 99
+        assert bench._percentile([7], 99) == 7
+        assert bench._percentile([], 50) is None
+
+    def test_filesystem_sized_for_concurrency(self):
+        fs = bench._make_fs(dict(secret_id="id", secret_key="key", region="ap-guangzhou",
+                                 skip_instance_cache=True), 32)
+        assert fs.max_concurrency == 32 and fs.connection_pool_size == 64
+
+    def test_sweep_arguments(self):
+        args = bench.build_parser().parse_args(
+            ["b/p", "--concurrency", "1,8", "--part-size", "5MiB,16MiB", "--workload", "small-put"])
+        assert args.concurrency == [1, 8]
+        assert args.part_size == [5 * 2 ** 20, 16 * 2 ** 20]
+        assert args.workload == ["small-put"]
+
+
+class TestEmulatorRun:
+
+    def test_all_workloads(self, tmp_path):
+        out = tmp_path / "report.json"
+        bench.main([
+            f"{TEST_BUCKET}/bench", "--emulator", "--concurrency", "1,2", "--small-count", "6",
+            "--small-size", "1KiB", "--large-size", "300KiB", "--part-size", "100KiB",
+            "--block-size", "64KiB", "--range-size", "1KiB", "--range-count", "8",
+            "--tree-depth", "2", "--tree-fanout", "2", "--tree-files", "2", "--list-repeat", "2",
+            "--output", str(out),
+        ])
+        report = json.loads(out.read_text())
+        results = report["results"]
+        assert [r["workload"] for r in results] == list(bench.WORKLOADS) * 2
+        assert [r["concurrency"] for r in results] == [1] * 7 + [2] * 7
+        by_name = {(r["workload"], r["concurrency"]): r for r in results}
+        assert all(r["errors"] == 0 for r in results)
+        assert by_name["small-get", 1]["bytes"] == 6 * 1024
+        assert by_name["seq-read", 2]["bytes"] == 2 * 300 * 1024
+        assert by_name["random-read", 1]["ops"] == 8
+        assert by_name["bulk-delete", 2]["ops"] == 6
+        latency = by_name["small-put", 1]["latency_ms"]
+        assert 0 < latency["p50"] <= latency["p99"] <= latency["max"]
+        assert report["config"]["prefix"].startswith(f"{TEST_BUCKET}/bench/cosfs-bench-")
+        assert "secret_key" not in report["config"]
+
+    def test_prerequisites_created_untimed(self, tmp_path, capsys):
+        bench.main([
+            f"{TEST_BUCKET}/bench", "--emulator", "--workload", "small-get,random-read",
+            "--small-count", "3", "--large-size", "10KiB", "--range-size", "1KiB", "--range-count", "4",
+        ])
+        results = json.loads(capsys.readouterr().out)["results"]
+        assert [(r["workload"], r["ops"]) for r in results] == [("small-get", 3), ("random-read", 4)]
+
+    def test_errors_logged_and_exit_status(self, capsys, caplog):
+        def fail(*args, **kwargs):
+            raise PermissionError("denied")
+
+        with patch.object(COSFileSystem, "cat_file", fail):
+            with pytest.raises(SystemExit) as exc:
+                bench.main([f"{TEST_BUCKET}/bench", "--emulator", "--workload", "small-get", "--small-count", "3"])
+        assert exc.value.code == 1
+        assert json.loads(capsys.readouterr().out)["results"][0]["errors"] == 3
+        assert len([r for r in caplog.records if "denied" in r.getMessage()]) == 1
+
+    def test_unknown_workload(self):
+        with pytest.raises(SystemExit):
+            bench.main([f"{TEST_BUCKET}/bench", "--emulator", "--workload", "bogus"])
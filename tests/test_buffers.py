@@ -0,0 +1,235 @@
+"""Tests for the zero-copy write buffers and disk staging."""
+
+import io
+import threading
+from unittest.mock import patch
+
+from cosfs import COSFileSystem
+from cosfs.buffers import BufferPool, MemoryBudget, PartBuffer, ViewReader, as_body
+from cosfs.core import _call_cos
+from cosfs.crc64 import crc64
+
+from .conftest import TEST_BUCKET
+
+
+class TestViewReader:
+
+    def test_read_seek_tell(self):
+        data = bytearray(b"0123456789")
+        r = ViewReader(data)
+        assert len(r) == 10
+        chunk = r.read(4)
+        assert isinstance(chunk, memoryview) and chunk.obj is data and bytes(chunk) == b"0123"
+        assert r.tell() == 4
+        assert bytes(r.read()) == b"456789"
+        assert bytes(r.read(3)) == b""
+        assert r.seek(-2, io.SEEK_END) == 8
+        assert bytes(r.read(5)) == b"89"
+        r.seek(0)
+        assert bytes(r.read(-1)) == b"0123456789"
+
+    def test_as_body(self):
+        assert as_body(b"abc") == b"abc"
+        assert isinstance(as_body(bytearray(b"abc")), ViewReader)
+        assert isinstance(as_body(memoryview(b"abc")[1:]), ViewReader)
+
+
+class TestPartBuffer:
+
+    def test_write_grow_and_clear(self):
+        pool = BufferPool()
+        buf = PartBuffer(pool)
+        for i in range(30_000):
+            buf.write(b"%03d" % (i % 1000))
+        assert buf.tell() == buf.seek(0, io.SEEK_END) == 90_000
+        assert buf.getvalue() == b"".join(b"%03d" % (i % 1000) for i in range(30_000))
+        data = buf._data
+        buf.clear()
+        buf.write(b"again")
+        assert buf.getvalue() == b"again" and buf._data is data
+        assert pool.allocated == 2  # grew once past initial_size, the old array went back
+
+    def test_growth_keeps_live_views_valid(self):
+        buf = PartBuffer()
+        buf.write(b"a" * 10)
+        view = buf.body()
+        buf.write(b"b" * PartBuffer.initial_size * 2)  # must not resize under *view*
+        assert bytes(view) == b"a" * 10
+        assert buf.getvalue() == b"a" * 10 + b"b" * PartBuffer.initial_size * 2
+
+    def test_pool_reuse_and_bound(self):
+        pool = BufferPool(max_bytes=2 * PartBuffer.initial_size)
+        bufs = [PartBuffer(pool) for _ in range(3)]
+        for b in bufs:
+            b.close()
+        assert pool.idle_bytes == 2 * PartBuffer.initial_size
+        PartBuffer(pool)
+        assert pool.reused == 1 and pool.allocated == 3
+
+    def test_seek_past_end_of_dirty_pooled_buffer(self):
+        pool = BufferPool()
+        dirty = PartBuffer(pool)
+        dirty.write(b"\xff" * 100)
+        dirty.close()
+        buf = PartBuffer(pool, checksum=True)
+        assert pool.reused == 1
+        buf.write(b"ab")
+        buf.seek(50)
+        buf.write(b"cd")
+        assert buf.getvalue() == b"ab" + bytes(48) + b"cd"
+        buf.clear()
+        buf.seek(10)
+        buf.write(b"e")
+        assert buf.getvalue() == bytes(10) + b"e" and buf.crc == crc64(bytes(10) + b"e")
+        spilled = PartBuffer(pool, budget=MemoryBudget(0))
+        spilled.seek(5)
+        spilled.write(b"f")
+        assert spilled.getvalue() == bytes(5) + b"f"
+
+    def test_pool_charged_to_budget(self):
+        budget = MemoryBudget(3 * PartBuffer.initial_size)
+        pool = BufferPool(budget=budget)
+        first, second = PartBuffer(pool, budget=budget), PartBuffer(pool, budget=budget)
+        first.close()
+        second.close()
+        assert pool.idle_bytes == budget.used == 2 * PartBuffer.initial_size
+        # Idle buffers give way to a writer that needs the room.
+        big = PartBuffer(pool, budget=budget)
+        big.write(b"x" * (PartBuffer.initial_size + 1))
+        assert not big.spilled and budget.used <= budget.max_bytes
+        big.close()
+        assert budget.used == pool.idle_bytes <= budget.max_bytes
+
+
+class TestZeroCopyWrites:
+
+    def test_parts_sent_from_one_reused_buffer(self, fs):
+        bodies = []
+        upload_part = fs.client.upload_part
+
+        def spy(**kwargs):
+            body = kwargs["Body"]
+            bodies.append((type(body), body._view.obj))
+            return upload_part(**kwargs)
+
+        fs.client.upload_part = spy
+        data = bytes(range(256)) * 100
+        with fs.open(f"{TEST_BUCKET}/parts.bin", "wb", block_size=4096) as f:
+            for i in range(0, len(data), 1000):
+                f.write(data[i:i + 1000])
+        assert fs.cat_file(f"{TEST_BUCKET}/parts.bin") == data
+        assert {t for t, _ in bodies} == {ViewReader}
+        # After growing to hold one block, every part comes from the same array.
+        assert len({id(obj) for _, obj in bodies[1:]}) == 1
+        assert fs.buffer_pool.idle_bytes > 0
+
+    def test_pipe_parts_are_views(self, fs):
+        objs = []
+        upload_part = fs.client.upload_part
+
+        def spy(**kwargs):
+            objs.append(kwargs["Body"]._view.obj)
+            return upload_part(**kwargs)
+
+        fs.client.upload_part = spy
+        value = b"z" * 35
+        fs.pipe_file(f"{TEST_BUCKET}/piped.bin", value, block_size=10)
+        assert len(objs) == 4 and all(o is value for o in objs)
+        assert fs.cat_file(f"{TEST_BUCKET}/piped.bin") == value
+
+    def test_retry_rewinds_body(self):
+        sent = []
+
+        def flaky(Body):
+            sent.append(bytes(Body.read()))
+            if len(sent) == 1:
+                raise ConnectionError("reset")
+            return {}
+
+        with patch("cosfs.core.time.sleep"):
+            _call_cos(flaky, Body=ViewReader(b"payload"))
+        assert sent == [b"payload", b"payload"]
+
+    def test_discard_returns_buffer(self, fs):
+        f = fs.open(f"{TEST_BUCKET}/gone.bin", "wb")
+        f.write(b"x")
+        f.discard()
+        assert f.buffer is None
+        assert fs.buffer_pool.idle_bytes == PartBuffer.initial_size
+
+
+class TestStaging:
+
+    DATA = bytes(range(256)) * 400  # 102 400 bytes
+
+    def _write(self, fs, path, block_size=32 * 1024):
+        with fs.open(path, "wb", block_size=block_size) as f:
+            for i in range(0, len(self.DATA), 5000):
+                f.write(self.DATA[i:i + 5000])
+            return f
+
+    def test_zero_budget_stages_every_part(self, fs, tmp_path):
+        fs.write_memory_budget = 0
+        fs.staging_dir = str(tmp_path)
+        bodies = []
+        upload_part = fs.client.upload_part
+
+        def spy(**kwargs):
+            bodies.append(kwargs["Body"])
+            return upload_part(**kwargs)
+
+        fs.client.upload_part = spy
+        f = self._write(fs, f"{TEST_BUCKET}/staged.bin")
+        assert fs.cat_file(f"{TEST_BUCKET}/staged.bin") == self.DATA
+        assert len(bodies) == 3 and all(hasattr(b, "fileno") for b in bodies)
+        assert f.buffer._file is None and fs.write_budget.used == 0
+
+    def test_budget_shared_between_writers(self, fs):
+        fs.write_memory_budget = 100 * 1024
+        first = fs.open(f"{TEST_BUCKET}/a.bin", "wb", block_size=64 * 1024)
+        first.write(b"a" * 60_000)
+        second = fs.open(f"{TEST_BUCKET}/b.bin", "wb", block_size=64 * 1024)
+        second.write(b"b" * 60_000)
+        assert not first.buffer.spilled and second.buffer.spilled
+        assert fs.write_budget.used <= fs.write_memory_budget
+        first.close()
+        second.close()
+        assert fs.write_budget.used == fs.buffer_pool.idle_bytes and fs.write_budget.spills == 1
+        assert fs.cat_file(f"{TEST_BUCKET}/b.bin") == b"b" * 60_000
+
+    def test_concurrent_writers_stay_within_budget(self, fs):
+        fs.write_memory_budget = 256 * 1024
+        peak = []
+        reserve = MemoryBudget.reserve
+
+        def tracking(budget, nbytes):
+            ok = reserve(budget, nbytes)
+            peak.append(budget.used)
+            return ok
+
+        def writer(n):
+            self._write(fs, f"{TEST_BUCKET}/w{n}.bin", block_size=128 * 1024)
+
+        with patch.object(MemoryBudget, "reserve", tracking):
+            threads = [threading.Thread(target=writer, args=(n,)) for n in range(8)]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+        assert max(peak) <= 256 * 1024
+        assert fs.write_budget.used == fs.buffer_pool.idle_bytes
+        assert all(fs.cat_file(f"{TEST_BUCKET}/w{n}.bin") == self.DATA for n in range(8))
+
+    def test_spilled_append(self, fs):
+        fs.write_memory_budget = 0
+        with fs.open(f"{TEST_BUCKET}/file1.txt", "ab", block_size=4) as f:
+            f.write(b" one")
+            f.write(b" two")
+        assert fs.cat_file(f"{TEST_BUCKET}/file1.txt") == b"hello, world! one two"
+
+    def test_constructor_options(self, tmp_path):
+        fs = COSFileSystem(secret_id="id", secret_key="key", region="ap-guangzhou", write_memory_budget=2 ** 20,
+                           staging_dir=str(tmp_path), skip_instance_cache=True)
+        assert fs.write_budget.max_bytes == 2 ** 20 and fs.staging_dir == str(tmp_path)
+        assert COSFileSystem(secret_id="id", secret_key="key", region="ap-guangzhou",
+                             skip_instance_cache=True).write_budget is None
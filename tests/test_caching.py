@@ -0,0 +1,341 @@
+"""Tests for the shared block cache and the disk cache."""
+
+import os
+import threading
+from unittest.mock import patch
+
+import pytest
+
+from cosfs import COSFileSystem
+from cosfs.caching import BlockCache, DiskCache, PartsCache
+from cosfs.exceptions import FileExpired
+
+from .conftest import TEST_BUCKET, _make_fs
+
+
+def _fetcher(log):
+    def fetch(indices):
+        log.append(list(indices))
+        return [bytes([i]) * 10 for i in indices]
+    return fetch
+
+
+class TestBlockCache:
+
+    def test_hits_and_misses(self):
+        cache = BlockCache(1000, block_size=10)
+        log = []
+        assert cache.get_blocks("b", "k", "e1", [0, 1], _fetcher(log)) == [b"\x00" * 10, b"\x01" * 10]
+        assert cache.get_blocks("b", "k", "e1", [1, 2], _fetcher(log)) == [b"\x01" * 10, b"\x02" * 10]
+        assert log == [[0, 1], [2]]
+        assert cache.stats() == {"hits": 1, "misses": 3, "evictions": 0, "blocks": 3, "bytes": 30,
+                                 "max_bytes": 1000}
+
+    def test_etag_is_part_of_the_key(self):
+        cache = BlockCache(1000, block_size=10)
+        log = []
+        cache.get_blocks("b", "k", "e1", [0], _fetcher(log))
+        cache.get_blocks("b", "k", "e2", [0], _fetcher(log))
+        assert log == [[0], [0]]
+
+    def test_lru_eviction(self):
+        cache = BlockCache(30, block_size=10)
+        log = []
+        cache.get_blocks("b", "k", "e", [0, 1, 2], _fetcher(log))
+        cache.get_blocks("b", "k", "e", [0], _fetcher(log))  # refresh block 0
+        cache.get_blocks("b", "k", "e", [3], _fetcher(log))  # evicts block 1
+        assert cache.nbytes == 30 and cache.evictions == 1
+        log.clear()
+        cache.get_blocks("b", "k", "e", [0, 1, 2, 3], _fetcher(log))
+        assert log == [[1]]
+
+    def test_oversized_block_not_stored(self):
+        cache = BlockCache(5, block_size=10)
+        cache.get_blocks("b", "k", "e", [0], _fetcher([]))
+        assert len(cache) == 0 and cache.nbytes == 0
+
+    def test_invalidate_object(self):
+        cache = BlockCache(1000, block_size=10)
+        cache.get_blocks("b", "k", "e1", [0], _fetcher([]))
+        cache.get_blocks("b", "k", "e2", [0], _fetcher([]))
+        cache.get_blocks("b", "other", "e1", [0], _fetcher([]))
+        cache.invalidate("b", "k")
+        assert len(cache) == 1 and cache.nbytes == 10
+
+    def test_invalidation_during_fetch_discards_result(self):
+        cache = BlockCache(1000, block_size=10)
+
+        def fetch(indices):
+            cache.invalidate("b", "k")
+            return [b"x" * 10 for _ in indices]
+
+        assert cache.get_blocks("b", "k", "e", [0], fetch) == [b"x" * 10]
+        assert len(cache) == 0
+
+    def test_thread_safety(self):
+        cache = BlockCache(50 * 10, block_size=10)
+
+        def worker(seed):
+            for i in range(300):
+                index = (seed * 7 + i) % 80
+                assert cache.get_blocks("b", "k", "e", [index], _fetcher([])) == [bytes([index]) * 10]
+
+        threads = [threading.Thread(target=worker, args=(n,)) for n in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        stats = cache.stats()
+        assert stats["hits"] + stats["misses"] == 8 * 300
+        assert stats["bytes"] == stats["blocks"] * 10 <= 500
+
+
+class TestSharedFileCache:
+
+    DATA = bytes(range(256)) * 40  # 10 240 bytes
+
+    @pytest.fixture
+    def cfs(self, fs):
+        fs.block_cache = BlockCache(2 ** 20, block_size=1024)
+        fs.pipe_file(f"{TEST_BUCKET}/hot.bin", self.DATA)
+        fs.ls(TEST_BUCKET)  # sizes come from the listing, as after find()
+        fs.client.calls.clear()
+        return fs
+
+    def test_reopen_served_from_cache(self, cfs):
+        path = f"{TEST_BUCKET}/hot.bin"
+        for _ in range(3):
+            with cfs.open(path) as f:
+                f.seek(1000)
+                assert f.read(3000) == self.DATA[1000:4000]
+        # Blocks 0-3 fetched once, in a single coalesced GET.
+        assert cfs.client.calls["get_object"] == 1
+        assert cfs.block_cache.stats()["hits"] == 8
+
+    def test_full_read_and_tail(self, cfs):
+        with cfs.open(f"{TEST_BUCKET}/hot.bin") as f:
+            assert f.read() == self.DATA
+            f.seek(-5, 2)
+            assert f.read() == self.DATA[-5:]
+
+    def test_write_invalidates(self, cfs):
+        path = f"{TEST_BUCKET}/hot.bin"
+        with cfs.open(path) as f:
+            f.read()
+        assert len(cfs.block_cache) == 10
+        cfs.pipe_file(path, b"new content")
+        assert len(cfs.block_cache) == 0
+        with cfs.open(path) as f:
+            assert f.read() == b"new content"
+
+    def test_rm_and_invalidate_cache_drop_blocks(self, cfs):
+        path = f"{TEST_BUCKET}/hot.bin"
+        with cfs.open(path) as f:
+            f.read(10)
+        cfs.rm(path)
+        assert len(cfs.block_cache) == 0
+
+        cfs.pipe_file(path, self.DATA)
+        with cfs.open(path) as f:
+            f.read(10)
+        cfs.invalidate_cache()
+        assert len(cfs.block_cache) == 0
+
+    def test_explicit_cache_type_bypasses(self, cfs):
+        with cfs.open(f"{TEST_BUCKET}/hot.bin", cache_type="bytes") as f:
+            assert f.read(10) == self.DATA[:10]
+        assert len(cfs.block_cache) == 0
+
+    def test_constructor_option(self):
+        fs = COSFileSystem(secret_id="id", secret_key="key", region="ap-guangzhou", block_cache_size=2 ** 20,
+                           skip_instance_cache=True)
+        assert fs.block_cache.max_bytes == 2 ** 20
+        assert COSFileSystem(secret_id="id", secret_key="key", region="ap-guangzhou",
+                             skip_instance_cache=True).block_cache is None
+
+
+class TestPartsCache:
+
+    DATA = bytes(range(256)) * 4
+
+    def _cache(self, log):
+        def fetch(start, stop):
+            log.append((start, stop))
+            return self.DATA[start:stop]
+
+        parts = {(100, 200): self.DATA[100:200], (200, 300): self.DATA[200:300], (500, 600): self.DATA[500:600]}
+        return PartsCache(64, fetch, len(self.DATA), data=parts)
+
+    def test_known_parts_joined_and_served(self):
+        log = []
+        cache = self._cache(log)
+        assert cache.starts == [100, 500]
+        assert cache._fetch(150, 250) == self.DATA[150:250]
+        assert log == []
+
+    def test_reads_outside_parts_use_fallback(self):
+        log = []
+        cache = self._cache(log)
+        assert cache._fetch(0, 50) == self.DATA[0:50]
+        assert cache._fetch(550, 700) == self.DATA[550:700]
+        assert log == [(0, 50), (600, 700)]
+
+
+class TestDiskCache:
+
+    DATA = bytes(range(256)) * 40  # 10 240 bytes
+
+    @pytest.fixture
+    def dfs(self, fs, tmp_path):
+        fs.disk_cache = DiskCache(str(tmp_path / "cache"), block_size=1024, ttl=0)
+        fs.pipe_file(f"{TEST_BUCKET}/big.bin", self.DATA)
+        fs.client.calls.clear()
+        return fs
+
+    def test_cat_file_cached_and_revalidated(self, dfs):
+        path = f"{TEST_BUCKET}/big.bin"
+        assert dfs.cat_file(path) == self.DATA
+        assert dfs.client.calls["get_object"] == 1
+        assert dfs.cat_file(path, start=100, end=5000) == self.DATA[100:5000]
+        assert dfs.cat_file(path, start=-10) == self.DATA[-10:]
+        assert dfs.client.calls["get_object"] == 1
+        # ttl=0: every read revalidates the ETag with one HEAD.
+        assert dfs.client.calls["head_object"] == 3
+
+    def test_ttl_skips_revalidation(self, dfs):
+        dfs.disk_cache.ttl = 60
+        path = f"{TEST_BUCKET}/big.bin"
+        dfs.cat_file(path)
+        dfs.client.calls.clear()
+        assert dfs.cat_file(path) == self.DATA
+        assert sum(dfs.client.calls.values()) == 0
+
+    def test_range_granular(self, dfs):
+        path = f"{TEST_BUCKET}/big.bin"
+        assert dfs.cat_file(path, start=5000, end=5100) == self.DATA[5000:5100]
+        assert dfs.disk_cache.stats()["misses"] == 1
+        # Blocks 0-3 and 5-9 are missing: two GETs, block 4 comes from disk.
+        assert dfs.cat_file(path) == self.DATA
+        assert dfs.client.calls["get_object"] == 3
+        assert dfs.disk_cache.stats()["hits"] == 1
+
+    def test_external_change_detected(self, dfs):
+        path = f"{TEST_BUCKET}/big.bin"
+        dfs.cat_file(path)
+        dfs.client.put_object(Bucket=TEST_BUCKET, Key="big.bin", Body=b"changed")
+        assert dfs.cat_file(path) == b"changed"
+
+    def test_change_between_validation_and_fetch(self, dfs):
+        dfs.disk_cache.ttl = 60
+        path = f"{TEST_BUCKET}/big.bin"
+        dfs.cat_file(path, start=0, end=10)
+        new = b"x" * 3000
+        dfs.client.put_object(Bucket=TEST_BUCKET, Key="big.bin", Body=new)
+        # The cached ETag is still trusted, but the GET reveals the change.
+        assert dfs.cat_file(path, start=2000, end=2100) == new[2000:2100]
+        assert dfs.cat_file(path) == new
+
+    def test_writes_and_deletes_invalidate(self, dfs):
+        path = f"{TEST_BUCKET}/big.bin"
+        dfs.disk_cache.ttl = 60
+        dfs.cat_file(path)
+        dfs.pipe_file(path, b"rewritten")
+        assert dfs.cat_file(path) == b"rewritten"
+        dfs.rm(path)
+        with pytest.raises(FileNotFoundError):
+            dfs.cat_file(path)
+
+    def test_shared_between_instances(self, dfs, tmp_path):
+        path = f"{TEST_BUCKET}/big.bin"
+        dfs.cat_file(path)
+        other = _make_fs(dfs.client)
+        other.disk_cache = DiskCache(str(tmp_path / "cache"), block_size=1024)
+        dfs.client.calls.clear()
+        assert other.cat_file(path) == self.DATA
+        assert dfs.client.calls["get_object"] == 0
+
+    def test_get_file_and_open(self, dfs, tmp_path):
+        path = f"{TEST_BUCKET}/big.bin"
+        dest = tmp_path / "out.bin"
+        dfs.get_file(path, str(dest))
+        assert dest.read_bytes() == self.DATA
+        dfs.client.calls.clear()
+        with dfs.open(path, block_size=2048) as f:
+            f.seek(3000)
+            assert f.read(100) == self.DATA[3000:3100]
+        assert dfs.client.calls["get_object"] == 0
+
+    def test_cat_ranges_through_disk(self, dfs):
+        path = f"{TEST_BUCKET}/big.bin"
+        dfs.cat_file(path)
+        dfs.client.calls.clear()
+        assert dfs.cat_ranges([path, path], [0, 8000], [10, 8010]) == [self.DATA[:10], self.DATA[8000:8010]]
+        assert dfs.client.calls["get_object"] == 0
+
+    def test_eviction(self, fs, tmp_path):
+        cache_dir = tmp_path / "cache"
+        fs.disk_cache = DiskCache(str(cache_dir), max_bytes=4096, block_size=1024)
+        for i in range(5):
+            fs.pipe_file(f"{TEST_BUCKET}/obj{i}", bytes([i]) * 2048)
+            assert fs.cat_file(f"{TEST_BUCKET}/obj{i}") == bytes([i]) * 2048
+        fs.disk_cache.evict()
+        blocks = [p for p in cache_dir.rglob("*") if p.is_file() and "." in p.name and p.name[0] != "."
+                  and p.name != "meta.json"]
+        assert sum(p.stat().st_size for p in blocks) <= 4096
+        # The most recent object survives.
+        fs.client.calls.clear()
+        fs.cat_file(f"{TEST_BUCKET}/obj4")
+        assert fs.client.calls["get_object"] == 0
+
+    def test_eviction_uses_index(self, fs, tmp_path):
+        fs.disk_cache = DiskCache(str(tmp_path / "cache"), max_bytes=4096, block_size=1024)
+        with patch("cosfs.caching.os.walk", wraps=os.walk) as walk:
+            for i in range(8):
+                fs.pipe_file(f"{TEST_BUCKET}/obj{i}", bytes([i]) * 2048)
+                fs.cat_file(f"{TEST_BUCKET}/obj{i}")
+        assert walk.call_count == 1  # built once, then kept up to date
+        assert fs.disk_cache._index_bytes <= 4096
+
+    def test_default_ttl(self, tmp_path):
+        assert DiskCache(str(tmp_path)).ttl > 0
+
+    def test_pinned_read(self, dfs):
+        path = f"{TEST_BUCKET}/big.bin"
+        with dfs.open(path, block_size=1024, cache_type="none") as f:
+            assert f.read(10) == self.DATA[:10]
+            dfs.client.calls.clear()
+            f.seek(2048)
+            assert f.read(10) == self.DATA[2048:2058]
+            # The cached ETag equals the pinned one: no revalidation HEAD.
+            assert dfs.client.calls["head_object"] == 0
+            dfs.client.put_object(Bucket=TEST_BUCKET, Key="big.bin", Body=b"changed")
+            f.seek(4096)
+            with pytest.raises(FileExpired):
+                f.read(10)
+
+    def test_missing_object(self, dfs):
+        with pytest.raises(FileNotFoundError):
+            dfs.cat_file(f"{TEST_BUCKET}/nope.bin")
+
+
+def _disk_reader(directory, data, rounds):
+    cache = DiskCache(directory, max_bytes=6 * 1024, block_size=1024)
+    for i in range(rounds):
+        start = (i * 733) % len(data)
+        got = cache.read("b", "k", start, start + 1500, lambda: ('"e"', len(data)),
+                         lambda s, e: (data[s:e], '"e"'))
+        assert got == data[start:start + 1500]
+
+
+def test_disk_cache_multiprocess(tmp_path):
+    """Concurrent processes share one cache directory without corrupting it."""
+    multiprocessing = pytest.importorskip("multiprocessing")
+    data = bytes(range(256)) * 40
+    ctx = multiprocessing.get_context("fork")
+    procs = [ctx.Process(target=_disk_reader, args=(str(tmp_path), data, 200)) for _ in range(4)]
+    for p in procs:
+        p.start()
+    for p in procs:
+        p.join()
+    assert [p.exitcode for p in procs] == [0] * 4
+    _disk_reader(str(tmp_path), data, 50)
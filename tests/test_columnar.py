@@ -0,0 +1,328 @@
+"""Tests for format-aware prefetch (``cache_type="columnar"``)."""
+
+import logging
+import struct
+import warnings
+import zlib
+
+import pytest
+
+from cosfs import columnar
+
+from .conftest import TEST_BUCKET
+
+CHUNK = 100 * 2 ** 10  # larger than the default 64 KiB tail GET
+
+
+def _chunk(tag, length=CHUNK):
+    return (tag.encode() * length)[:length]
+
+
+# ----------------------------------------------------------------------
+# Minimal encoders for building synthetic files
+# ----------------------------------------------------------------------
+
+def _varint(n):
+    out = bytearray()
+    while True:
+        b = n & 0x7F
+        n >>= 7
+        if n:
+            out.append(b | 0x80)
+        else:
+            out.append(b)
+            return bytes(out)
+
+
+def _thrift(fields):
+    """Encode ``[(field_id, type, value), ...]`` as a Thrift compact struct."""
+    out = bytearray()
+    last = 0
+    for fid, ftype, value in fields:
+        if ftype == 1:
+            ftype = 1 if value else 2
+        delta = fid - last
+        out += bytes([(delta << 4) | ftype]) if 0 < delta <= 15 else bytes([ftype]) + _varint(fid << 1)
+        last = fid
+        out += _thrift_value(ftype, value)
+    return bytes(out + b"\x00")
+
+
+def _thrift_value(ftype, value):
+    if ftype in (1, 2):
+        return b""
+    if ftype in (5, 6):
+        return _varint((value << 1) ^ (value >> 63))
+    if ftype == 8:
+        return _varint(len(value)) + value
+    if ftype == 9:
+        etype, items = value
+        header = bytes([(len(items) << 4) | etype]) if len(items) < 15 else bytes([0xF0 | etype]) + _varint(len(items))
+        return header + b"".join(_thrift(i) if etype == 12 else _thrift_value(etype, i) for i in items)
+    if ftype == 12:
+        return _thrift(value)
+    raise ValueError(ftype)
+
+
+def _pb(fields):
+    """Encode ``[(field, value), ...]`` as protobuf; ints are varints, bytes length-delimited."""
+    out = bytearray()
+    for field, value in fields:
+        if isinstance(value, int):
+            out += _varint(field << 3) + _varint(value)
+        else:
+            out += _varint(field << 3 | 2) + _varint(len(value)) + value
+    return bytes(out)
+
+
+def _orc_compress(data):
+    compressor = zlib.compressobj(wbits=-15)
+    body = compressor.compress(data) + compressor.flush()
+    header = len(body) << 1
+    return bytes([header & 0xFF, header >> 8 & 0xFF, header >> 16 & 0xFF]) + body
+
+
+# ----------------------------------------------------------------------
+# Synthetic files
+# ----------------------------------------------------------------------
+
+def make_parquet(row_groups=3, columns=("a", "b", "c")):
+    """Return ``(file_bytes, {(row_group, column): (start, end)})``."""
+    body = bytearray(b"PAR1")
+    layout = {}
+    groups = []
+    for rg in range(row_groups):
+        chunks = []
+        for col in columns:
+            start = len(body)
+            body += _chunk(f"{rg}{col}")
+            layout[rg, col] = (start, len(body))
+            meta = [
+                (1, 5, 1), (2, 9, (5, [0])), (3, 9, (8, [col.encode()])), (4, 5, 0),
+                (5, 6, 10), (6, 6, CHUNK), (7, 6, CHUNK),
+            ]
+            if col == "b":
+                # Dictionary page first, data page 1 KiB later.
+                meta += [(9, 6, start + 1024), (11, 6, start)]
+            else:
+                meta += [(9, 6, start)]
+            chunks.append([(2, 6, start), (3, 12, meta)])
+        groups.append([(1, 9, (12, chunks)), (2, 6, CHUNK * len(columns)), (3, 6, 10)])
+    footer = _thrift([
+        (1, 5, 1),
+        (2, 9, (12, [[(4, 8, b"schema")]] + [[(4, 8, c.encode())] for c in columns])),
+        (3, 6, 10 * row_groups),
+        (4, 9, (12, groups)),
+        (6, 8, b"cosfs-test"),
+    ])
+    return bytes(body + footer + struct.pack("<I", len(footer)) + b"PAR1"), layout
+
+
+def make_orc(stripes=3, compress=False):
+    """Return ``(file_bytes, {(stripe, column_id): (start, end)}, stripe_footer_ranges)``."""
+    pack = _orc_compress if compress else (lambda data: data)
+    body = bytearray(b"ORC")
+    layout = {}
+    footers = []
+    stripe_infos = []
+    lengths = {1: CHUNK, 2: 2048, 3: CHUNK}
+    for s in range(stripes):
+        offset = len(body)
+        streams = []
+        for column, length in lengths.items():
+            layout[s, column] = (len(body), len(body) + length)
+            body += _chunk(f"{s}{column}", length)
+            streams.append(_pb([(1, 1), (2, column), (3, length)]))
+        stripe_footer = pack(_pb([(1, st) for st in streams]))
+        footers.append((len(body), len(body) + len(stripe_footer)))
+        body += stripe_footer
+        stripe_infos.append(_pb([(1, offset), (2, 0), (3, sum(lengths.values())),
+                                 (4, len(stripe_footer)), (5, 10)]))
+    types = [
+        _pb([(1, 12), (2, _varint(1) + _varint(2)), (3, b"a"), (3, b"b")]),
+        _pb([(1, 3)]),
+        _pb([(1, 10), (2, _varint(3))]),
+        _pb([(1, 7)]),
+    ]
+    footer = pack(_pb([(1, 3), (2, len(body))] + [(3, s) for s in stripe_infos] + [(4, t) for t in types]
+                      + [(6, 10 * stripes)]))
+    postscript = _pb([(1, len(footer)), (2, 1 if compress else 0), (3, 262144), (5, 0), (8000, b"ORC")])
+    return bytes(body + footer + postscript + bytes([len(postscript)])), layout, footers
+
+
+def make_feather(batches=3):
+    """Return ``(file_bytes, dictionary_range, [batch_ranges])``."""
+    body = bytearray(b"ARROW1\x00\x00") + b"S" * 64
+    dictionary = (len(body), len(body) + CHUNK)
+    body += _chunk("d")
+    batch_ranges = []
+    for i in range(batches):
+        batch_ranges.append((len(body), len(body) + CHUNK))
+        body += _chunk(f"r{i}")
+
+    def blocks(ranges):
+        out = struct.pack("<I", len(ranges))
+        for start, end in ranges:
+            out += struct.pack("<qi4xq", start, 256, end - start - 256)
+        return out
+
+    # Flatbuffer Footer: root offset, vtable at 4, table at 16, vectors after it.
+    dict_vector = blocks([dictionary])
+    table = 16
+    dict_pos = table + 16
+    batch_pos = dict_pos + len(dict_vector)
+    footer = bytearray(struct.pack("<I", table))
+    footer += struct.pack("<HHHHHH", 12, 16, 4, 0, 8, 12)
+    footer += struct.pack("<iH2xII", table - 4, 4, dict_pos - (table + 8), batch_pos - (table + 12))
+    footer += dict_vector + blocks(batch_ranges)
+    return (bytes(body + footer + struct.pack("<i", len(footer)) + b"ARROW1"), dictionary, batch_ranges)
+
+
+# ----------------------------------------------------------------------
+# Footer parsing
+# ----------------------------------------------------------------------
+
+def _planned(data, **kwargs):
+    """Run ``columnar.prefetch`` over *data* and return the parts and fetch batches."""
+    batches = []
+
+    def fetch(ranges):
+        batches.append(list(ranges))
+        return [data[s:e] for s, e in ranges]
+
+    tail = data[-(64 * 2 ** 10):]
+    parts = columnar.prefetch(tail, len(data), fetch, **kwargs)
+    for (start, end), part in parts.items():
+        assert part == data[start:end]
+    return parts, batches
+
+
+def _covers(parts, rng):
+    return any(s <= rng[0] and rng[1] <= e for s, e in parts)
+
+
+class TestFooterParsing:
+
+    @pytest.mark.parametrize("data, fmt", [
+        (make_parquet()[0], "parquet"),
+        (make_orc()[0], "orc"),
+        (make_feather()[0], "feather"),
+        (b"plain text", None),
+    ])
+    def test_detect_format(self, data, fmt):
+        assert columnar.detect_format(data[-64:]) == fmt
+
+    def test_parquet_selection(self):
+        data, layout = make_parquet()
+        parts, batches = _planned(data, columns=["b"], row_groups=[0, 2])
+        assert len(batches) == 1
+        for (rg, col), rng in layout.items():
+            assert _covers(parts, rng) == (col == "b" and rg in (0, 2)) or rng[1] > len(data) - 64 * 2 ** 10
+
+    def test_parquet_all(self):
+        data, layout = make_parquet(row_groups=2)
+        parts, _ = _planned(data)
+        assert all(_covers(parts, rng) for rng in layout.values())
+
+    def test_parquet_footer_longer_than_tail(self):
+        data, layout = make_parquet(row_groups=2)
+        batches = []
+
+        def fetch(ranges):
+            batches.append(ranges)
+            return [data[s:e] for s, e in ranges]
+
+        parts = columnar.prefetch(data[-16:], len(data), fetch, columns=["a"])
+        assert batches[0] == [(len(data) - struct.unpack("<I", data[-8:-4])[0] - 8, len(data) - 16)]
+        assert _covers(parts, layout[1, "a"]) and not _covers(parts, layout[1, "c"])
+
+    @pytest.mark.parametrize("compress", [False, True])
+    def test_orc_selection(self, compress):
+        data, layout, footers = make_orc(compress=compress)
+        parts, batches = _planned(data, columns=["b"], row_groups=[1])
+        # Stripe footers first, then the selected streams.
+        assert batches[0] == [footers[1]]
+        assert _covers(parts, layout[1, 2]) and _covers(parts, layout[1, 3])
+        assert not _covers(parts, layout[1, 1])
+        assert not _covers(parts, layout[0, 2])
+
+    def test_orc_whole_stripes(self):
+        data, layout, _ = make_orc()
+        parts, batches = _planned(data, row_groups=[0])
+        assert len(batches) == 1
+        assert all(_covers(parts, layout[0, c]) for c in (1, 2, 3))
+        assert not _covers(parts, layout[1, 1])
+
+    def test_feather_batches(self):
+        data, dictionary, batch_ranges = make_feather()
+        parts, _ = _planned(data, row_groups=[1])
+        assert _covers(parts, dictionary) and _covers(parts, batch_ranges[1])
+        assert not _covers(parts, batch_ranges[0])
+
+    def test_unknown_or_malformed(self):
+        with pytest.raises(ValueError):
+            _planned(b"x" * 100)
+        with pytest.raises(ValueError):
+            _planned(b"garbage" + struct.pack("<I", 5) + b"PAR1")
+
+
+# ----------------------------------------------------------------------
+# COSFile integration
+# ----------------------------------------------------------------------
+
+class TestColumnarOpen:
+
+    @pytest.fixture
+    def parquet(self, fs):
+        data, layout = make_parquet()
+        fs.pipe_file(f"{TEST_BUCKET}/t.parquet", data)
+        fs.client.calls.clear()
+        return fs, data, layout
+
+    def test_prefetch_selected_columns(self, parquet):
+        fs, data, layout = parquet
+        with warnings.catch_warnings():
+            warnings.simplefilter("error")
+            with fs.open(f"{TEST_BUCKET}/t.parquet", cache_type="columnar",
+                         cache_options={"columns": ["a", "c"], "row_groups": [1]}) as f:
+                # One tail GET plus one coalesced GET for both column chunks.
+                assert fs.client.calls["get_object"] == 2
+                f.seek(-8, 2)
+                footer_length = struct.unpack("<I", f.read(4))[0]
+                f.seek(-8 - footer_length, 2)
+                f.read(footer_length)
+                for col in ("a", "c"):
+                    start, end = layout[1, col]
+                    f.seek(start)
+                    assert f.read(end - start) == data[start:end]
+        assert fs.client.calls["get_object"] == 2
+
+    def test_unselected_reads_still_work(self, parquet):
+        fs, data, layout = parquet
+        with fs.open(f"{TEST_BUCKET}/t.parquet", cache_type="columnar", cache_options={"columns": ["a"]}) as f:
+            start, end = layout[0, "b"]
+            with warnings.catch_warnings():
+                warnings.simplefilter("error")  # served by the fallback cache, not a warned parts-cache miss
+                f.seek(start)
+                assert f.read(end - start) == data[start:end]
+                gets = fs.client.calls["get_object"]
+                f.seek(start)
+                assert f.read(end - start) == data[start:end]
+            assert fs.client.calls["get_object"] == gets
+
+    def test_unrecognised_format_falls_back(self, fs, caplog):
+        fs.pipe_file(f"{TEST_BUCKET}/t.bin", b"0123456789" * 30_000)
+        with caplog.at_level(logging.WARNING, logger="cosfs"):
+            with fs.open(f"{TEST_BUCKET}/t.bin", cache_type="columnar") as f:
+                assert type(f.cache).__name__ == "ReadAheadCache"
+                with warnings.catch_warnings():
+                    warnings.simplefilter("error")  # no parts-cache misses outside the footer
+                    f.seek(9000)
+                    assert f.read(10) == b"0123456789"
+        assert "Columnar prefetch disabled" in caplog.text
+
+    def test_other_cache_types_unchanged(self, parquet):
+        fs, data, _ = parquet
+        with fs.open(f"{TEST_BUCKET}/t.parquet", cache_type="bytes") as f:
+            assert f.read(4) == b"PAR1"
+            assert f.read(10) == data[4:14]
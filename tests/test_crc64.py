@@ -0,0 +1,166 @@
+"""Tests for CRC64 checksums and end-to-end transfer verification."""
+
+import os
+
+import pytest
+
+from cosfs import ChecksumMismatch
+from cosfs.buffers import PartBuffer
+from cosfs.crc64 import CRC64, combine, crc64
+from cosfs.emulator import CRC64_HEADER
+
+from .conftest import TEST_BUCKET
+
+
+class TestCRC64:
+
+    def test_check_value(self):
+        # CRC-64/XZ check value, as reported by COS.
+        assert crc64(b"123456789") == 0x995DC9BBDF1939FA
+
+    @pytest.mark.parametrize("split", [0, 1, 4095, 65536, 100_000])
+    def test_combine(self, split):
+        data = os.urandom(100_000)
+        a, b = data[:split], data[split:]
+        assert combine(crc64(a), crc64(b), len(b)) == crc64(data)
+
+    def test_running(self):
+        data = os.urandom(10_000)
+        running = CRC64()
+        running.update(data[:3000])
+        running.append(crc64(data[3000:7000]), 4000)
+        running.update(memoryview(data)[7000:])
+        assert running.crc == crc64(data) and running.length == len(data)
+
+
+class TestPartBufferCrc:
+
+    def test_sequential_writes(self):
+        buf = PartBuffer(checksum=True)
+        data = os.urandom(200_000)
+        for i in range(0, len(data), 7000):
+            buf.write(data[i:i + 7000])
+        assert buf._crc == crc64(data)  # maintained while writing
+        buf.clear()
+        buf.write(b"next part")
+        assert buf.crc == crc64(b"next part")
+
+    def test_overwrite_falls_back_to_contents(self):
+        buf = PartBuffer(checksum=True)
+        buf.write(b"hello world")
+        buf.seek(0)
+        buf.write(b"J")
+        assert buf.crc == crc64(b"Jello world")
+        buf.seek(5)
+        buf.truncate()
+        assert buf.crc == crc64(b"Jello")
+
+    def test_spilled(self):
+        buf = PartBuffer(checksum=False, spill_dir=None)
+        buf._spill()
+        buf.write(b"on disk")
+        assert buf.crc == crc64(b"on disk")
+
+
+@pytest.fixture
+def vfs(fs):
+    fs.verify_crc64 = True
+    return fs
+
+
+class TestVerifiedReads:
+
+    def test_whole_reads(self, vfs):
+        assert vfs.cat_file(f"{TEST_BUCKET}/file1.txt") == b"hello, world!"
+        with vfs.open(f"{TEST_BUCKET}/data/a.csv", "rb") as f:
+            assert f.read() == b"col1,col2\n1,2\n3,4\n"
+
+    def test_corruption_detected(self, vfs):
+        vfs.client._objects.meta((TEST_BUCKET, "file1.txt"))["crc64"] = "1"
+        with pytest.raises(ChecksumMismatch) as exc:
+            vfs.cat_file(f"{TEST_BUCKET}/file1.txt")
+        assert exc.value.path == f"{TEST_BUCKET}/file1.txt" and exc.value.remote == 1
+        # A range cannot be checked against the object's checksum.
+        assert vfs.cat_file(f"{TEST_BUCKET}/file1.txt", start=0, end=5) == b"hello"
+
+    def test_get_file(self, vfs, tmp_path):
+        target = tmp_path / "out.txt"
+        vfs.get_file(f"{TEST_BUCKET}/file1.txt", str(target))
+        assert target.read_bytes() == b"hello, world!"
+        assert vfs.client.calls["download_file"] == 0
+
+        vfs.client._objects.meta((TEST_BUCKET, "file1.txt"))["crc64"] = "1"
+        target.unlink()
+        with pytest.raises(ChecksumMismatch):
+            vfs.get_file(f"{TEST_BUCKET}/file1.txt", str(target))
+        assert not target.exists()
+
+    def test_get_file_in_parts(self, vfs, tmp_path):
+        data = os.urandom(10_000)
+        vfs.pipe_file(f"{TEST_BUCKET}/big.bin", data)
+        vfs.download_part_size = 3000
+        vfs.client.calls.clear()
+        target = tmp_path / "big.bin"
+        vfs.get_file(f"{TEST_BUCKET}/big.bin", str(target))
+        assert target.read_bytes() == data
+        assert vfs.client.calls["get_object"] == 4 and vfs.client.calls["head_object"] == 0
+
+        vfs.client._objects.meta((TEST_BUCKET, "big.bin"))["crc64"] = "1"
+        with pytest.raises(ChecksumMismatch):
+            vfs.get_file(f"{TEST_BUCKET}/big.bin", str(target))
+        assert not target.exists()
+
+    def test_get_empty_file(self, vfs, tmp_path):
+        vfs.pipe_file(f"{TEST_BUCKET}/empty.bin", b"")
+        target = tmp_path / "empty.bin"
+        vfs.get_file(f"{TEST_BUCKET}/empty.bin", str(target))
+        assert target.read_bytes() == b""
+
+
+class TestVerifiedWrites:
+
+    @staticmethod
+    def _corrupt(client, method):
+        original = getattr(client, method)
+
+        def corrupted(**kwargs):
+            out = original(**kwargs)
+            out[CRC64_HEADER] = str(int(out[CRC64_HEADER]) ^ 1)
+            return out
+
+        setattr(client, method, corrupted)
+
+    def test_pipe_file(self, vfs):
+        data = os.urandom(35_000)
+        vfs.pipe_file(f"{TEST_BUCKET}/small.bin", data[:100])
+        vfs.pipe_file(f"{TEST_BUCKET}/parts.bin", data, block_size=10_000)
+        assert vfs.cat_file(f"{TEST_BUCKET}/parts.bin") == data
+
+    def test_pipe_file_bad_part_aborts(self, vfs):
+        self._corrupt(vfs.client, "upload_part")
+        with pytest.raises(ChecksumMismatch):
+            vfs.pipe_file(f"{TEST_BUCKET}/parts.bin", b"x" * 35, block_size=10)
+        assert vfs.client.calls["abort_multipart_upload"] == 1
+        assert not vfs.exists(f"{TEST_BUCKET}/parts.bin")
+
+    def test_file_parts_are_combined(self, vfs):
+        data = os.urandom(50_000)
+        with vfs.open(f"{TEST_BUCKET}/w.bin", "wb", block_size=16_384) as f:
+            for i in range(0, len(data), 3000):
+                f.write(data[i:i + 3000])
+            assert 0 < f._crc64.length < len(data)  # combined from the parts so far
+        assert vfs.client.calls["upload_part"] > 1
+        assert vfs.cat_file(f"{TEST_BUCKET}/w.bin") == data
+
+    def test_bad_assembly_detected(self, vfs):
+        self._corrupt(vfs.client, "complete_multipart_upload")
+        f = vfs.open(f"{TEST_BUCKET}/w.bin", "wb", block_size=10)
+        f.write(b"y" * 25)
+        with pytest.raises(ChecksumMismatch):
+            f.close()
+
+    def test_single_put(self, vfs):
+        self._corrupt(vfs.client, "put_object")
+        with pytest.raises(ChecksumMismatch):
+            with vfs.open(f"{TEST_BUCKET}/one.bin", "wb") as f:
+                f.write(b"small")
@@ -4,8 +4,8 @@ import asyncio
 
 import pytest
 
+from cosfs.emulator import MockCosClient
 from tests.conftest import TEST_BUCKET
-from tests.mock_cos import MockCosClient
 from tests.conftest import _make_fs
 
 
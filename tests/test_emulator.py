@@ -0,0 +1,246 @@
+"""Tests for the COS emulator in ``cosfs/emulator.py``: sorted listing index,
+thread safety, latency / bandwidth / fault injection and the HTTP front-end."""
+
+import threading
+import time
+from unittest.mock import patch
+
+import pytest
+from qcloud_cos import CosConfig, CosS3Client
+
+from cosfs import COSFileSystem
+from cosfs.emulator import MockCosClient, serve_http
+from cosfs.exceptions import FileExpired
+from tests.conftest import TEST_BUCKET, _make_fs
+
+
+# ======================================================================
+# Listing index
+# ======================================================================
+
+class TestListing:
+
+    @pytest.fixture
+    def client(self):
+        keys = ["a/1", "a/2", "a/b/3", "a/b/4", "a/c/5", "b/6", "c"]
+        return MockCosClient(buckets={TEST_BUCKET}, objects={(TEST_BUCKET, k): b"x" for k in keys})
+
+    def test_prefix_seek(self, client):
+        resp = client.list_objects(Bucket=TEST_BUCKET, Prefix="a/b/")
+        assert [c["Key"] for c in resp["Contents"]] == ["a/b/3", "a/b/4"]
+
+    def test_delimiter_pagination_has_no_duplicates(self, client):
+        """MaxKeys counts keys and common prefixes; a prefix marker skips its subtree."""
+        seen = []
+        marker = ""
+        while True:
+            resp = client.list_objects(Bucket=TEST_BUCKET, Prefix="a/", Delimiter="/", Marker=marker, MaxKeys=1)
+            seen += [c["Key"] for c in resp.get("Contents", [])]
+            seen += [p["Prefix"] for p in resp.get("CommonPrefixes", [])]
+            if resp["IsTruncated"] != "true":
+                break
+            marker = resp["NextMarker"]
+        assert seen == ["a/1", "a/2", "a/b/", "a/c/"]
+
+    def test_direct_store_mutation_updates_index(self, client):
+        client._objects[(TEST_BUCKET, "a/0")] = b"new"
+        client._objects.pop((TEST_BUCKET, "a/1"))
+        resp = client.list_objects(Bucket=TEST_BUCKET, Prefix="a/", Delimiter="/")
+        assert [c["Key"] for c in resp["Contents"]] == ["a/0", "a/2"]
+
+    def test_bulk_delete_and_recreate(self):
+        client = MockCosClient(buckets={TEST_BUCKET},
+                               objects={(TEST_BUCKET, f"k{i:05d}"): b"x" for i in range(5000)})
+        for i in range(0, 5000, 2):
+            client.delete_object(Bucket=TEST_BUCKET, Key=f"k{i:05d}")
+        client.put_object(Bucket=TEST_BUCKET, Key="k00000", Body=b"back")
+        resp = client.list_objects(Bucket=TEST_BUCKET, MaxKeys=3)
+        assert [c["Key"] for c in resp["Contents"]] == ["k00000", "k00001", "k00003"]
+        assert client._objects.count(TEST_BUCKET) == 2501
+
+    def test_etag_is_stable_until_overwritten(self, client):
+        first = client.head_object(Bucket=TEST_BUCKET, Key="c")["ETag"]
+        assert client.head_object(Bucket=TEST_BUCKET, Key="c")["ETag"] == first
+        client.put_object(Bucket=TEST_BUCKET, Key="c", Body=b"changed")
+        assert client.head_object(Bucket=TEST_BUCKET, Key="c")["ETag"] != first
+
+    def test_large_bucket_listing_is_fast(self):
+        n = 200_000
+        client = MockCosClient(buckets={TEST_BUCKET},
+                               objects={(TEST_BUCKET, f"k{i:07d}"): b"" for i in range(n)})
+        start = time.perf_counter()
+        for i in range(0, n, n // 50):
+            client.list_objects(Bucket=TEST_BUCKET, Marker=f"k{i:07d}", MaxKeys=10)
+        assert time.perf_counter() - start < 1.0
+
+
+# ======================================================================
+# Concurrency, latency, bandwidth and faults
+# ======================================================================
+
+class TestEmulation:
+
+    def test_concurrent_writes(self):
+        client = MockCosClient(buckets={TEST_BUCKET})
+
+        def writer(n):
+            for i in range(200):
+                client.put_object(Bucket=TEST_BUCKET, Key=f"t{n}/{i:03d}", Body=b"x")
+
+        threads = [threading.Thread(target=writer, args=(n,)) for n in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        assert client._objects.count(TEST_BUCKET) == 1600
+        assert client.calls["put_object"] == 1600
+
+    def test_latency(self):
+        client = MockCosClient(buckets={TEST_BUCKET}, latency=0.05)
+        start = time.perf_counter()
+        client.put_object(Bucket=TEST_BUCKET, Key="k", Body=b"x")
+        assert time.perf_counter() - start >= 0.05
+
+    def test_bandwidth_cap(self):
+        client = MockCosClient(buckets={TEST_BUCKET}, bandwidth=1_000_000)
+        start = time.perf_counter()
+        client.put_object(Bucket=TEST_BUCKET, Key="k", Body=b"x" * 100_000)
+        assert time.perf_counter() - start >= 0.1
+
+    def test_scripted_slowdown_is_retried_by_cosfs(self):
+        client = MockCosClient(buckets={TEST_BUCKET}, objects={(TEST_BUCKET, "k"): b"data"})
+        client.fail_next("SlowDown", count=2, methods=["get_object"])
+        fs = _make_fs(client)
+        with patch("cosfs.core.time.sleep"):
+            assert fs.cat_file(f"{TEST_BUCKET}/k") == b"data"
+        assert client.calls["get_object"] == 3
+
+    def test_failure_rate_is_reproducible(self):
+        def outcomes(seed):
+            client = MockCosClient(buckets={TEST_BUCKET}, failure_rate=0.3, slowdown_rate=0.2, seed=seed)
+            result = []
+            for i in range(50):
+                try:
+                    client.put_object(Bucket=TEST_BUCKET, Key=str(i), Body=b"")
+                    result.append("ok")
+                except ConnectionError:
+                    result.append("net")
+                except Exception:  # pylint: disable=broad-except
+                    result.append("cos")
+            return result
+
+        assert outcomes(7) == outcomes(7)
+        assert {"ok", "net", "cos"} <= set(outcomes(7))
+
+
+# ======================================================================
+# HTTP front-end with the real SDK client
+# ======================================================================
+
+class TestHttpEmulator:
+
+    @pytest.fixture
+    def http_fs(self):
+        client = MockCosClient(buckets={TEST_BUCKET}, objects={(TEST_BUCKET, "dir/a b+c.txt"): b"hello"})
+        server = serve_http(client)
+        try:
+            yield _make_fs(CosS3Client(CosConfig(**server.cos_config_kwargs()))), client
+        finally:
+            server.stop()
+
+    def test_read_and_list(self, http_fs):
+        fs, _ = http_fs
+        assert fs.ls(f"{TEST_BUCKET}/dir", detail=False) == [f"{TEST_BUCKET}/dir/a b+c.txt"]
+        assert fs.cat_file(f"{TEST_BUCKET}/dir/a b+c.txt", start=1, end=3) == b"el"
+        assert fs.info(f"{TEST_BUCKET}/dir/a b+c.txt")["size"] == 5
+        with pytest.raises(FileNotFoundError):
+            fs.cat_file(f"{TEST_BUCKET}/missing")
+
+    def test_if_match_precondition(self, http_fs):
+        fs, client = http_fs
+        path = f"{TEST_BUCKET}/dir/a b+c.txt"
+        etag = fs.info(path)["ETag"]
+        assert fs.cat_file(path, start=0, end=2, etag=etag) == b"he"
+        client.put_object(Bucket=TEST_BUCKET, Key="dir/a b+c.txt", Body=b"other")
+        with pytest.raises(FileExpired):
+            fs.cat_file(path, start=0, end=2, etag=etag)
+
+    def test_write_copy_delete(self, http_fs):
+        fs, client = http_fs
+        fs.pipe_file(f"{TEST_BUCKET}/mp.bin", b"y" * 35, block_size=10)
+        assert client.calls["upload_part"] == 4
+        fs.cp_file(f"{TEST_BUCKET}/mp.bin", f"{TEST_BUCKET}/copy.bin")
+        assert fs.cat_file(f"{TEST_BUCKET}/copy.bin") == b"y" * 35
+        fs.rm([f"{TEST_BUCKET}/mp.bin", f"{TEST_BUCKET}/copy.bin"])
+        assert fs.find(f"{TEST_BUCKET}") == [f"{TEST_BUCKET}/dir/a b+c.txt"]
+
+    def test_crc64_verification(self, http_fs, tmp_path):
+        fs, client = http_fs
+        fs.verify_crc64 = True
+        data = bytes(range(256)) * 40
+        fs.pipe_file(f"{TEST_BUCKET}/mp.bin", data, block_size=4096)
+        with fs.open(f"{TEST_BUCKET}/w.bin", "wb", block_size=4096) as f:
+            f.write(data)
+        assert client.calls["upload_part"] == 5
+        assert fs.cat_file(f"{TEST_BUCKET}/w.bin") == data
+        fs.get_file(f"{TEST_BUCKET}/mp.bin", str(tmp_path / "mp.bin"))
+        assert (tmp_path / "mp.bin").read_bytes() == data
+
+
+# ======================================================================
+# HTTP connection pool
+# ======================================================================
+
+class TestConnections:
+
+    @pytest.fixture
+    def server(self):
+        client = MockCosClient(buckets={TEST_BUCKET}, objects={(TEST_BUCKET, f"k{n}"): b"v" for n in range(8)})
+        server = serve_http(client)
+        accepted = []
+        process_request = server.process_request
+        server.process_request = lambda request, address: accepted.append(address) or process_request(request,
+                                                                                                       address)
+        server.accepted = accepted
+        try:
+            yield server
+        finally:
+            server.stop()
+
+    @staticmethod
+    def _fs(server=None, **kwargs):
+        url = server.url if server else "http://127.0.0.1:9"  # clients only, no requests
+        return COSFileSystem(secret_id="emulator", secret_key="emulator", region="ap-guangzhou",
+                             config_kwargs={"Scheme": "http", "Proxies": {"http": url}},
+                             skip_instance_cache=True, **kwargs)
+
+    def test_settings_reach_the_client(self):
+        fs = self._fs(max_concurrency=4, connect_timeout=2, read_timeout=60, keep_alive=False)
+        conf = fs.client._conf
+        assert fs.connection_pool_size == 8 and conf._pool_maxsize == 8
+        assert conf._timeout == (2, 60) and conf._keep_alive is False
+        adapter = fs.client._session.get_adapter("http://example.com")
+        assert adapter._pool_maxsize == 8
+        assert self._fs(pool_size=3).client._session.get_adapter("http://x")._pool_maxsize == 3
+        assert self._fs().client._conf._timeout is None
+
+    def test_own_session_per_filesystem(self):
+        first, second = self._fs(pool_size=2), self._fs(pool_size=5)
+        assert first.client._session is not second.client._session
+        assert second.client._session.get_adapter("http://x")._pool_maxsize == 5
+
+    def test_prewarmed_connections_are_reused(self, server):
+        server.client.latency = 0.05  # keep the warming requests in flight together
+        fs = self._fs(server, max_concurrency=2)  # a pool of 4
+        assert fs.prewarm_connections(TEST_BUCKET) == 4
+        assert len(server.accepted) == 4
+        fs.cat([f"{TEST_BUCKET}/k{n}" for n in range(8)])
+        assert len(server.accepted) == 4
+
+    def test_prewarm_at_startup(self, server):
+        server.client.latency = 0.05
+        self._fs(server, bucket_regions={TEST_BUCKET: "ap-guangzhou"}, prewarm=3)
+        deadline = time.monotonic() + 5
+        while server.client.calls["head_bucket"] < 3 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert server.client.calls["head_bucket"] == 3 and len(server.accepted) == 3
@@ -2,16 +2,23 @@
 invalidate_cache, error translation, retry logic, path parsing."""
 
 import errno
+import multiprocessing
+import os
+import pickle
+import subprocess
+import sys
 from unittest.mock import patch
 
+import fsspec.asyn
 import pytest
 
+from cosfs import core
 from cosfs.core import (
-    translate_cos_error, _call_cos,
+    COSFileSystem, translate_cos_error, _call_cos,
     _ensure_part_size, COS_MAX_PARTS,
 )
-from tests.conftest import TEST_BUCKET
-from tests.mock_cos import make_cos_error
+from cosfs.emulator import MockCosClient, make_cos_error
+from tests.conftest import TEST_BUCKET, _make_fs
 
 
 # ======================================================================
@@ -65,6 +72,182 @@ class TestCpFile:
         assert fs.cat_file(dst) == b"hello, world!"
 
 
+# ======================================================================
+# Region routing
+# ======================================================================
+
+OTHER_BUCKET = "shanghai-bucket-1250000000"
+
+
+@pytest.fixture
+def routed_fs():
+    """A filesystem in ap-guangzhou whose credentials reach a second region, ap-shanghai."""
+    clients = {
+        "ap-guangzhou": MockCosClient(buckets={TEST_BUCKET}, objects={(TEST_BUCKET, "here.txt"): b"here"}),
+        "ap-shanghai": MockCosClient(buckets={OTHER_BUCKET}, objects={(OTHER_BUCKET, "there.txt"): b"there"},
+                                     region="ap-shanghai"),
+    }
+    fs = _make_fs(clients["ap-guangzhou"])
+    fs.config_kwargs = {}
+    fs._credentials = ("id", "key", None)
+    fs._new_client = lambda region, *credentials: clients[region]
+    return fs, clients
+
+
+class TestRegionRouting:
+
+    def test_configured_region(self, routed_fs):
+        fs, clients = routed_fs
+        fs._bucket_regions = {OTHER_BUCKET: "ap-shanghai"}
+        assert fs.cat_file(f"{OTHER_BUCKET}/there.txt") == b"there"
+        fs.pipe_file(f"{OTHER_BUCKET}/new.txt", b"new")
+        assert clients["ap-shanghai"]._objects[(OTHER_BUCKET, "new.txt")] == b"new"
+        assert fs.cat_file(f"{TEST_BUCKET}/here.txt") == b"here"
+        assert clients["ap-guangzhou"].calls["head_bucket"] == 1  # only the unconfigured bucket
+
+    def test_discovered_once(self, routed_fs):
+        fs, clients = routed_fs
+        home = clients["ap-guangzhou"]
+        # HEAD Bucket fails at the wrong endpoint; the account's bucket list has the location.
+        home.list_buckets = lambda **kwargs: {"Buckets": {"Bucket": [
+            {"Name": TEST_BUCKET, "Location": "ap-guangzhou"},
+            {"Name": OTHER_BUCKET, "Location": "ap-shanghai"},
+        ]}}
+        for _ in range(3):
+            assert fs.cat_file(f"{OTHER_BUCKET}/there.txt") == b"there"
+            assert fs.cat_file(f"{TEST_BUCKET}/here.txt") == b"here"
+        assert fs.bucket_region(OTHER_BUCKET) == "ap-shanghai"
+        assert home.calls["head_bucket"] == 1  # the other bucket's region came from the list
+        assert clients["ap-shanghai"].calls["get_object"] == 3
+
+    def test_cross_region_copy_names_source_region(self, routed_fs):
+        fs, clients = routed_fs
+        fs._bucket_regions = {OTHER_BUCKET: "ap-shanghai", TEST_BUCKET: "ap-guangzhou"}
+        sent = []
+        clients["ap-guangzhou"].copy = lambda **kwargs: sent.append(kwargs) or {}
+        fs.cp_file(f"{OTHER_BUCKET}/there.txt", f"{TEST_BUCKET}/copy.txt")
+        assert sent[0]["Bucket"] == TEST_BUCKET
+        assert sent[0]["CopySource"] == {"Bucket": OTHER_BUCKET, "Key": "there.txt", "Region": "ap-shanghai"}
+
+    def test_clients_per_region(self, tmp_path):
+        (tmp_path / ".cos.yaml").write_text(
+            "cos:\n"
+            "  base: {secretid: id, secretkey: key, sessiontoken: ''}\n"
+            "  buckets:\n"
+            "    - {name: a-1250000000, region: ap-guangzhou}\n"
+            "    - {name: b-1250000000, region: ap-beijing}\n")
+        fs = COSFileSystem(conf_path=str(tmp_path), bucket_regions={"c-1250000000": "ap-beijing"},
+                           skip_instance_cache=True)
+        assert fs.region == "ap-guangzhou" and fs._client_for("a-1250000000/x") is fs.client
+        beijing = fs._client_for("b-1250000000/x")
+        assert beijing._conf._region == "ap-beijing" and fs._client_for("c-1250000000") is beijing
+
+
+# ======================================================================
+# Lazy start-up
+# ======================================================================
+
+class TestLazyStartup:
+
+    def test_sdk_imported_on_first_request(self):
+        script = (
+            "import sys, cosfs\n"
+            "fs = cosfs.COSFileSystem(secret_id='id', secret_key='key', region='ap-guangzhou')\n"
+            "print(sorted(m for m in ('qcloud_cos', 'yaml', 'requests') if m in sys.modules))\n"
+            "fs.client\n"
+            "print('qcloud_cos' in sys.modules)\n"
+        )
+        out = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True, check=True)
+        assert out.stdout.split() == ["[]", "True"]
+
+    def test_config_parsed_once_per_path(self, tmp_path):
+        conf = tmp_path / ".cos.yaml"
+        conf.write_text("cos:\n"
+                        "  base: {secretid: id, secretkey: key, sessiontoken: ''}\n"
+                        "  buckets: [{name: a-1250000000, region: ap-guangzhou}]\n")
+        with patch("cosfs.core._read_coscli", wraps=core._read_coscli) as read:
+            for _ in range(3):
+                fs = COSFileSystem(conf_path=str(tmp_path), skip_instance_cache=True)
+            assert read.call_count == 1 and fs._credentials == ("id", "key", "")
+            conf.write_text(conf.read_text().replace("ap-guangzhou", "ap-beijing"))
+            os.utime(conf, ns=(0, 0))  # a distinct mtime even on coarse-grained filesystems
+            assert COSFileSystem(conf_path=str(tmp_path), skip_instance_cache=True).region == "ap-beijing"
+            assert read.call_count == 2
+
+
+# ======================================================================
+# Fork safety and pickling
+# ======================================================================
+
+_FORKED = {}
+
+
+def _read_in_child(path):
+    fs = _FORKED["fs"]
+    return fs.cat_file(path), getattr(fs.client, "tag", None), fs._pid == os.getpid()
+
+
+def _fsspec_state_in_child(_):
+    fs = _FORKED["fs"]
+    fs.cat_file(f"{TEST_BUCKET}/file1.txt")
+    return id(fsspec.asyn.loop[0]), id(fsspec.asyn.lock)
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="needs fork")
+class TestForkAndPickle:
+
+    def test_forked_workers(self, fs):
+        fs.block_cache = core.BlockCache(2 ** 20)
+        with fs.open(f"{TEST_BUCKET}/file1.txt", "rb", cache_type="shared") as f:
+            f.read()  # starts the IO loop and warms the cache in the parent
+        _FORKED["fs"] = fs
+        try:
+            with multiprocessing.get_context("fork").Pool(2) as pool:
+                results = pool.map(_read_in_child, [f"{TEST_BUCKET}/file1.txt", f"{TEST_BUCKET}/data/a.csv"])
+        finally:
+            _FORKED.clear()
+        assert [r[0] for r in results] == [b"hello, world!", b"col1,col2\n1,2\n3,4\n"]
+        assert all(r[2] for r in results)
+        assert fs.cat_file(f"{TEST_BUCKET}/file1.txt") == b"hello, world!"  # the parent is unaffected
+
+    @pytest.mark.skipif(hasattr(fsspec.asyn, "reset_lock"), reason="fsspec resets its own loop")
+    def test_fsspec_state_left_to_fsspec(self, fs):
+        fs.cat_file(f"{TEST_BUCKET}/file1.txt")  # starts fsspec's IO loop in the parent
+        parent = id(fsspec.asyn.loop[0]), id(fsspec.asyn.lock)
+        _FORKED["fs"] = fs
+        try:
+            with multiprocessing.get_context("fork").Pool(1) as pool:
+                child = pool.map(_fsspec_state_in_child, [None])[0]
+        finally:
+            _FORKED.clear()
+        # The child read through a loop of cosfs's own, leaving fsspec's globals alone.
+        assert child == parent
+
+    def test_clients_rebuilt_after_fork(self):
+        fs = COSFileSystem(secret_id="id", secret_key="key", region="ap-guangzhou", skip_instance_cache=True)
+        fs.client.tag = "parent"
+        fs._new_client = lambda *args: MockCosClient(buckets={TEST_BUCKET},
+                                                      objects={(TEST_BUCKET, "k"): b"child"})
+        _FORKED["fs"] = fs
+        try:
+            with multiprocessing.get_context("fork").Pool(1) as pool:
+                assert pool.map(_read_in_child, [f"{TEST_BUCKET}/k"]) == [(b"child", None, True)]
+        finally:
+            _FORKED.clear()
+        assert fs.client.tag == "parent"
+
+    def test_pickle_carries_resolved_config(self, tmp_path):
+        (tmp_path / ".cos.conf").write_text("[common]\nsecret_id = id\nsecret_key = key\nregion = ap-beijing\n")
+        fs = COSFileSystem(conf_path=str(tmp_path), skip_instance_cache=True)
+        fs._bucket_regions["b-1250000000"] = "ap-shanghai"  # as if discovered
+        (tmp_path / ".cos.conf").unlink()
+        clone = pickle.loads(pickle.dumps(fs))
+        assert clone._credentials == ("id", "key", None) and clone.region == "ap-beijing"
+        assert clone.bucket_region("b-1250000000") == "ap-shanghai"
+        assert clone._client is None  # no client until first use
+        assert pickle.loads(pickle.dumps(fs)) is clone  # unpickled through the instance cache
+
+
 # ======================================================================
 # _mkdir / _makedirs
 # ======================================================================
@@ -313,3 +496,83 @@ class TestSplitPath:
         bucket, key = fs.split_path("cosn://mybucket/a/b/")
         assert bucket == "mybucket"
         assert key == "a/b/"
+
+
+# ======================================================================
+# Tracing hooks
+# ======================================================================
+
+class TestTracing:
+
+    @pytest.fixture
+    def events(self):
+        from cosfs import tracing
+
+        recorded = []
+        hook = tracing.add_request_hook(lambda event, span: recorded.append((event, dict(span))))
+        yield recorded
+        tracing.remove_request_hook(hook)
+
+    def test_call_cos_emits_start_and_end(self, fs, events):
+        fs.cat_file(f"{TEST_BUCKET}/file1.txt", start=0, end=5)
+        assert [e for e, _ in events] == ["start", "end"]
+        span = events[-1][1]
+        assert span["operation"] == "get_object"
+        assert span["bucket"] == TEST_BUCKET
+        assert span["key"] == "file1.txt"
+        assert span["range"] == "bytes=0-4"
+        assert span["outcome"] == "ok"
+        assert span["duration"] >= 0
+
+    def test_retry_attempts_are_separate_spans(self, events):
+        call_count = 0
+
+        def throttled(**kwargs):
+            nonlocal call_count
+            call_count += 1
+            if call_count < 2:
+                raise make_cos_error("SlowDown", 503, "slow down")
+            return "ok"
+
+        with patch("cosfs.core.time.sleep"):
+            _call_cos(throttled, Bucket="b", Key="k", retries=3)
+        ends = [span for e, span in events if e == "end"]
+        assert [(s["attempt"], s["outcome"]) for s in ends] == [(0, "retry"), (1, "ok")]
+
+    def test_non_retryable_error_outcome(self, fs, events):
+        with pytest.raises(FileNotFoundError):
+            fs.cat_file(f"{TEST_BUCKET}/missing.txt")
+        span = events[-1][1]
+        assert span["outcome"] == "error"
+        assert span["error"] is not None
+
+    def test_file_read_span(self, fs, events):
+        with fs.open(f"{TEST_BUCKET}/file1.txt", "rb", size=13, cache_type="none") as f:
+            f.read()
+        file_spans = [s for e, s in events if e == "end" and s["operation"] == "COSFile.fetch_range"]
+        assert len(file_spans) == 1
+        assert file_spans[0]["range"] == (0, 13)
+
+    def test_file_probe_span(self, fs, events):
+        with fs.open(f"{TEST_BUCKET}/file1.txt", "rb") as f:
+            f.read()
+        ops = [s["operation"] for e, s in events if e == "end" and s["operation"].startswith("COSFile.")]
+        # The probe at open covers the whole file, so no further fetch is needed.
+        assert ops == ["COSFile.probe"]
+
+    def test_disabled_tracing_builds_no_file_spans(self, fs):
+        with fs.open(f"{TEST_BUCKET}/file1.txt", "rb", size=13, cache_type="none") as f:
+            with patch("cosfs.core.trace_span", side_effect=AssertionError("span built")):
+                assert f.read() == b"hello, world!"
+
+    def test_hook_failure_does_not_break_request(self, fs):
+        from cosfs import tracing
+
+        def broken(event, span):
+            raise RuntimeError("hook bug")
+
+        tracing.add_request_hook(broken)
+        try:
+            assert fs.cat_file(f"{TEST_BUCKET}/file1.txt") == b"hello, world!"
+        finally:
+            tracing.remove_request_hook(broken)
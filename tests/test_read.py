@@ -1,7 +1,12 @@
-"""Tests for read operations: cat_file, get_file, info, exists, ls, find."""
+"""Tests for read operations: cat_file, get_file, info, exists, ls, find, walk, du, glob."""
+
+import time
 
 import pytest
+from fsspec.spec import AbstractFileSystem
 
+from cosfs.caching import BlockCache
+from cosfs.exceptions import FileExpired
 from tests.conftest import TEST_BUCKET
 
 
@@ -29,6 +34,281 @@ class TestCatFile:
             fs.cat_file(f"{TEST_BUCKET}/nonexistent.txt")
 
 
+# ======================================================================
+# _cat_ranges
+# ======================================================================
+
+class TestCatRanges:
+
+    DATA = bytes(range(256)) * 4096  # 1 MiB
+
+    @pytest.fixture
+    def rfs(self, fs):
+        fs.pipe_file(f"{TEST_BUCKET}/blob.bin", self.DATA)
+        fs.client.calls.clear()
+        return fs
+
+    def test_nearby_ranges_single_get(self, rfs):
+        path = f"{TEST_BUCKET}/blob.bin"
+        starts = list(range(0, 400_000, 4000))
+        ends = [s + 100 for s in starts]
+        out = rfs.cat_ranges([path] * len(starts), starts, ends)
+        assert out == [self.DATA[s:e] for s, e in zip(starts, ends)]
+        assert rfs.client.calls["get_object"] == 1
+
+    def test_gap_and_block_limits(self, rfs):
+        path = f"{TEST_BUCKET}/blob.bin"
+        starts, ends = [0, 10, 500_000], [5, 20, 500_010]
+        out = rfs.cat_ranges([path] * 3, starts, ends, max_gap=1000)
+        assert out == [self.DATA[0:5], self.DATA[10:20], self.DATA[500_000:500_010]]
+        assert rfs.client.calls["get_object"] == 2
+
+        rfs.client.calls.clear()
+        rfs.cat_ranges([path] * 3, starts, ends, max_gap=0, max_block=2 ** 20)
+        assert rfs.client.calls["get_object"] == 3
+
+        rfs.client.calls.clear()
+        rfs.cat_ranges([path] * 3, starts, ends, max_gap=2 ** 20, max_block=100)
+        assert rfs.client.calls["get_object"] == 2
+
+    def test_views_share_the_merged_response(self, rfs):
+        path = f"{TEST_BUCKET}/blob.bin"
+        out = rfs.cat_ranges([path] * 3, [0, 100, 200], [50, 150, 250], views=True)
+        assert all(isinstance(o, memoryview) for o in out)
+        assert len({id(o.obj) for o in out}) == 1
+        assert [bytes(o) for o in out] == [self.DATA[0:50], self.DATA[100:150], self.DATA[200:250]]
+        assert rfs.client.calls["get_object"] == 1
+
+    def test_positional_arguments_keep_fsspec_order(self, rfs):
+        path = f"{TEST_BUCKET}/blob.bin"
+        # fsspec's signature is (paths, starts, ends, max_gap, batch_size).
+        out = rfs.cat_ranges([path] * 2, [0, 10], [5, 20], 0, 1)
+        assert out == [self.DATA[0:5], self.DATA[10:20]]
+        with pytest.raises(TypeError):
+            rfs.cat_ranges([path] * 2, [0, 10], [5, 20], 0, 1, 2 ** 20)
+
+    def test_unsorted_overlapping_and_multiple_paths(self, rfs):
+        blob = f"{TEST_BUCKET}/blob.bin"
+        other = f"{TEST_BUCKET}/file1.txt"
+        paths = [blob, other, blob, blob, other]
+        starts = [900, 0, 100, 150, 7]
+        ends = [1000, 5, 200, 160, 12]
+        out = rfs.cat_ranges(paths, starts, ends)
+        assert out == [self.DATA[900:1000], b"hello", self.DATA[100:200], self.DATA[150:160], b"world"]
+        assert rfs.client.calls["get_object"] == 2
+
+    def test_open_bounds_and_empty_ranges(self, rfs):
+        path = f"{TEST_BUCKET}/file1.txt"
+        out = rfs.cat_ranges([path] * 4, [None, 7, 5, 0], [5, None, 5, 100])
+        assert out == [b"hello", b"world!", b"", b"hello, world!"]
+
+    def test_scalar_bounds(self, rfs):
+        out = rfs.cat_ranges([f"{TEST_BUCKET}/file1.txt", f"{TEST_BUCKET}/blob.bin"], 0, 3)
+        assert out == [b"hel", self.DATA[:3]]
+
+    def test_missing_object(self, rfs):
+        with pytest.raises(FileNotFoundError):
+            rfs.cat_ranges([f"{TEST_BUCKET}/missing.bin"], [0], [10])
+
+    def test_windows_fetched_concurrently(self, rfs):
+        rfs.client.latency = 0.1
+        path = f"{TEST_BUCKET}/blob.bin"
+        starts = [i * 100_000 for i in range(8)]
+        start = time.perf_counter()
+        out = rfs.cat_ranges([path] * 8, starts, [s + 10 for s in starts], max_gap=0)
+        assert time.perf_counter() - start < 0.5
+        assert out == [self.DATA[s:s + 10] for s in starts]
+        assert rfs.client.calls["get_object"] == 8
+
+    def test_cat_many_small_files_concurrently(self, rfs):
+        paths = [f"{TEST_BUCKET}/small/{i}" for i in range(8)]
+        for i, path in enumerate(paths):
+            rfs.pipe_file(path, b"%d" % i)
+        rfs.client.latency = 0.1
+        start = time.perf_counter()
+        out = rfs.cat(paths)
+        assert time.perf_counter() - start < 0.5
+        assert out == {path: b"%d" % i for i, path in enumerate(paths)}
+
+    def test_bad_arguments(self, rfs):
+        with pytest.raises(TypeError):
+            rfs.cat_ranges(f"{TEST_BUCKET}/file1.txt", [0], [1])
+        with pytest.raises(ValueError):
+            rfs.cat_ranges([f"{TEST_BUCKET}/file1.txt"], [0, 1], [1, 2])
+
+
+# ======================================================================
+# ETag-pinned reads
+# ======================================================================
+
+class TestPinnedReads:
+
+    DATA = bytes(range(256)) * 40
+
+    @pytest.fixture
+    def pfs(self, fs):
+        fs.pipe_file(f"{TEST_BUCKET}/pinned.bin", self.DATA)
+        fs.client.calls.clear()
+        return fs
+
+    def test_overwrite_mid_read_raises(self, pfs):
+        path = f"{TEST_BUCKET}/pinned.bin"
+        etag = pfs.info(path)["ETag"]
+        with pfs.open(path, block_size=1024, cache_type="none", size=len(self.DATA), etag=etag) as f:
+            assert f.read(100) == self.DATA[:100]
+            pfs.client.put_object(Bucket=TEST_BUCKET, Key="pinned.bin", Body=b"x" * len(self.DATA))
+            f.seek(5000)
+            with pytest.raises(FileExpired) as exc:
+                f.read(100)
+        assert exc.value.path == path and exc.value.etag == f.etag
+        with pfs.open(path) as f:
+            assert f.read(3) == b"xxx"
+
+    def test_if_match_sent_without_extra_heads(self, pfs):
+        path = f"{TEST_BUCKET}/pinned.bin"
+        etag = pfs.info(path)["ETag"]
+        pfs.client.calls.clear()
+        seen = []
+        get_object = pfs.client.get_object
+
+        def spy(**kwargs):
+            seen.append(kwargs.get("IfMatch"))
+            return get_object(**kwargs)
+
+        pfs.client.get_object = spy
+        with pfs.open(path, block_size=1024, cache_type="none", size=len(self.DATA), etag=etag) as f:
+            for off in (0, 4000, 9000):
+                f.seek(off)
+                assert f.read(10) == self.DATA[off:off + 10]
+        assert seen == [etag] * 3
+        assert pfs.client.calls["head_object"] == 0
+
+    def test_size_given_skips_head(self, pfs):
+        with pfs.open(f"{TEST_BUCKET}/pinned.bin", size=len(self.DATA)) as f:
+            assert f.etag is None
+            assert f.read(10) == self.DATA[:10]
+        assert pfs.client.calls["head_object"] == 0
+
+    def test_cat_file_etag(self, pfs):
+        path = f"{TEST_BUCKET}/pinned.bin"
+        etag = pfs.info(path)["ETag"]
+        assert pfs.cat_file(path, start=0, end=4, etag=etag) == self.DATA[:4]
+        with pytest.raises(FileExpired):
+            pfs.cat_file(path, etag='"stale"')
+        with pytest.raises(FileExpired):
+            pfs.cat_ranges([path, path], [0, 100], [10, 110], etag='"stale"')
+
+
+# ======================================================================
+# Opening for read
+# ======================================================================
+
+class TestOpenRead:
+
+    DATA = bytes(range(256)) * 2048  # 512 KiB, larger than one probe
+
+    @pytest.fixture
+    def ofs(self, fs):
+        fs.pipe_file(f"{TEST_BUCKET}/big/obj.bin", self.DATA)
+        fs.client.calls.clear()
+        return fs
+
+    def test_small_file_single_request(self, fs):
+        with fs.open(f"{TEST_BUCKET}/file1.txt") as f:
+            assert f.size == 13
+            assert f.read() == b"hello, world!"
+        assert dict(fs.client.calls) == {"get_object": 1}
+
+    def test_size_from_content_range(self, ofs):
+        etag = ofs.info(f"{TEST_BUCKET}/big/obj.bin")["ETag"]
+        ofs.client.calls.clear()
+        with ofs.open(f"{TEST_BUCKET}/big/obj.bin", block_size=2 ** 20) as f:
+            assert f.size == len(self.DATA) and f.etag == etag
+            assert f.read() == self.DATA
+        # The probe plus one GET for the remainder of the first block.
+        assert dict(ofs.client.calls) == {"get_object": 2}
+
+    def test_size_from_listing_cache(self, ofs):
+        ofs.ls(f"{TEST_BUCKET}/big")
+        ofs.client.calls.clear()
+        with ofs.open(f"{TEST_BUCKET}/big/obj.bin") as f:
+            assert f.size == len(self.DATA) and f.etag
+            f.seek(100_000)
+            assert f.read(10) == self.DATA[100_000:100_010]
+        assert dict(ofs.client.calls) == {"get_object": 1}
+
+    def test_empty_file_probe_heads_once(self, fs):
+        fs.pipe_file(f"{TEST_BUCKET}/empty.bin", b"")
+        fs.client.calls.clear()
+        with fs.open(f"{TEST_BUCKET}/empty.bin") as f:
+            assert f.size == 0 and f.etag
+            assert f.read() == b""
+        # The probe's InvalidRange is answered by one HEAD, not a full info().
+        assert dict(fs.client.calls) == {"get_object": 1, "head_object": 1}
+
+    def test_stale_listing_falls_back_to_probe(self, ofs):
+        ofs.ls(f"{TEST_BUCKET}/big")
+        ofs.client.put_object(Bucket=TEST_BUCKET, Key="big/new.bin", Body=b"fresh")
+        with ofs.open(f"{TEST_BUCKET}/big/new.bin") as f:
+            assert f.read() == b"fresh"
+
+    def test_tail_probe_for_columnar(self, ofs):
+        with ofs.open(f"{TEST_BUCKET}/big/obj.bin", cache_type="columnar",
+                      cache_options={"footer_size": 1000}) as f:
+            assert f.size == len(self.DATA)
+            f.seek(-1000, 2)
+            assert f.read() == self.DATA[-1000:]
+        assert ofs.client.calls["get_object"] == 1
+
+    def test_small_file_whole_from_listing(self, fs):
+        fs.pipe_file(f"{TEST_BUCKET}/lines.txt", b"".join(b"line %d\n" % i for i in range(1000)))
+        fs.ls(TEST_BUCKET)
+        fs.client.calls.clear()
+        with fs.open(f"{TEST_BUCKET}/lines.txt", block_size=1024) as f:
+            assert f.readline() == b"line 0\n"
+            f.seek(-9, 2)
+            assert f.readline() == b"line 999\n"
+            f.seek(0)
+            assert len(f.readlines()) == 1000
+        # One GET of the whole object, without a Range header.
+        assert dict(fs.client.calls) == {"get_object": 1}
+
+    def test_small_file_guessed_whole(self, fs):
+        data = b"y" * 200_000
+        fs.pipe_file(f"{TEST_BUCKET}/guess.bin", data)
+        fs.client.calls.clear()
+        with fs.open(f"{TEST_BUCKET}/guess.bin", block_size=4096) as f:
+            f.seek(150_000)
+            assert f.read(100) == data[150_000:150_100]
+            f.seek(0)
+            assert f.read() == data
+        assert dict(fs.client.calls) == {"get_object": 1}
+
+    def test_small_object_size_zero_disables(self, fs):
+        fs.small_object_size = 0
+        with fs.open(f"{TEST_BUCKET}/file1.txt", cache_type="bytes", size=13) as f:
+            assert f.cache.name == "bytes"
+            assert f.read() == b"hello, world!"
+
+    def test_explicit_cache_type_not_overridden(self, fs):
+        with fs.open(f"{TEST_BUCKET}/file1.txt", cache_type="none") as f:
+            assert f.cache.name == "none"
+            assert f.read() == b"hello, world!"
+        fs.block_cache = BlockCache(2 ** 20)
+        with fs.open(f"{TEST_BUCKET}/file1.txt", cache_type="shared") as f:
+            assert f.read() == b"hello, world!"
+        assert len(fs.block_cache) == 1
+
+    def test_missing_file(self, fs):
+        with pytest.raises(FileNotFoundError):
+            fs.open(f"{TEST_BUCKET}/missing.bin")
+
+    def test_empty_file(self, fs):
+        fs.pipe_file(f"{TEST_BUCKET}/empty.bin", b"")
+        with fs.open(f"{TEST_BUCKET}/empty.bin") as f:
+            assert f.size == 0 and f.read() == b""
+
+
 # ======================================================================
 # _get_file
 # ======================================================================
@@ -126,7 +406,7 @@ class TestLs:
 
         We seed a fresh filesystem with >2 objects and patch MaxKeys.
         """
-        from tests.mock_cos import MockCosClient
+        from cosfs.emulator import MockCosClient
         from tests.conftest import _make_fs
 
         objs = {
@@ -215,7 +495,7 @@ class TestFind:
 
     def test_find_with_prefix_param(self):
         """The prefix parameter should filter results server-side."""
-        from tests.mock_cos import MockCosClient
+        from cosfs.emulator import MockCosClient
         from tests.conftest import _make_fs
 
         objs = {
@@ -239,7 +519,7 @@ class TestFind:
 
     def test_find_withdirs_no_duplicates(self):
         """withdirs=True should not produce duplicate directory entries."""
-        from tests.mock_cos import MockCosClient
+        from cosfs.emulator import MockCosClient
         from tests.conftest import _make_fs
 
         objs = {
@@ -260,7 +540,7 @@ class TestFind:
 
     def test_find_withdirs_populates_dircache(self):
         """withdirs=True without prefix should populate dircache with dir entries."""
-        from tests.mock_cos import MockCosClient
+        from cosfs.emulator import MockCosClient
         from tests.conftest import _make_fs
 
         objs = {
@@ -278,7 +558,7 @@ class TestFind:
 
     def test_find_withdirs_with_prefix_no_dircache(self):
         """withdirs=True with prefix should NOT populate dircache."""
-        from tests.mock_cos import MockCosClient
+        from cosfs.emulator import MockCosClient
         from tests.conftest import _make_fs
 
         objs = {
@@ -291,3 +571,159 @@ class TestFind:
         test_fs.find(f"{TEST_BUCKET}/dir", withdirs=True, prefix="alpha")
         # dircache should not be populated when prefix is used
         assert len(test_fs.dircache) == 0
+
+
+# ======================================================================
+# _walk
+# ======================================================================
+
+class TestWalk:
+
+    @pytest.mark.parametrize("kwargs", [{}, {"detail": True}, {"maxdepth": 1}, {"maxdepth": 2, "detail": True}])
+    def test_matches_generic_walk(self, fs, kwargs):
+        expected = list(AbstractFileSystem.walk(fs, TEST_BUCKET, **kwargs))
+        fs.invalidate_cache()
+        assert list(fs.walk(TEST_BUCKET, **kwargs)) == expected
+
+    def test_completion_order(self, fs):
+        walked = {root: (dirs, files) for root, dirs, files in fs.walk(TEST_BUCKET, ordered=False)}
+        assert walked == {root: (dirs, files) for root, dirs, files in AbstractFileSystem.walk(fs, TEST_BUCKET)}
+
+    def test_fills_dircache(self, fs):
+        list(fs.walk(TEST_BUCKET))
+        calls = fs.client.calls["list_objects"]
+        assert fs.ls(f"{TEST_BUCKET}/data/sub", detail=False) == [f"{TEST_BUCKET}/data/sub/deep.json"]
+        assert fs.find(TEST_BUCKET, maxdepth=3) == [f"{TEST_BUCKET}/{k}" for k in fs.client._objects.keys_of(TEST_BUCKET)]
+        assert fs.client.calls["list_objects"] == calls
+
+    def test_lists_siblings_concurrently(self):
+        from cosfs.emulator import MockCosClient
+        from tests.conftest import _make_fs
+
+        objs = {(TEST_BUCKET, f"users/u{i:02d}/{d}/f.txt"): b"x" for i in range(40) for d in ("in", "out")}
+        client = MockCosClient(buckets={TEST_BUCKET}, objects=objs, latency=0.02)
+        test_fs = _make_fs(client)
+
+        start = time.perf_counter()
+        walked = list(test_fs.walk(f"{TEST_BUCKET}/users"))
+        elapsed = time.perf_counter() - start
+        assert len(walked) == 1 + 40 + 80
+        assert client.calls["list_objects"] == len(walked)
+        assert client.busy > 4 * elapsed  # requests overlapped
+
+    def test_early_exit(self, fs):
+        walker = fs.walk(TEST_BUCKET)
+        root, dirs, files = next(walker)
+        assert root == TEST_BUCKET and dirs == ["data"] and files == ["file1.txt"]
+        walker.close()
+
+
+# ======================================================================
+# _du / prefix_stats
+# ======================================================================
+
+class TestDu:
+
+    @pytest.mark.parametrize("kwargs", [{}, {"total": False}, {"maxdepth": 1}, {"total": False, "maxdepth": 1}])
+    def test_matches_generic_du(self, fs, kwargs):
+        for path in (TEST_BUCKET, f"{TEST_BUCKET}/data", f"{TEST_BUCKET}/missing"):
+            assert fs.du(path, **kwargs) == AbstractFileSystem.du(fs, path, **kwargs)
+
+    def test_single_file(self, fs):
+        assert fs.du(f"{TEST_BUCKET}/file1.txt") == 13
+        assert fs.du(f"{TEST_BUCKET}/file1.txt", total=False) == {f"{TEST_BUCKET}/file1.txt": 13}
+
+    def test_streams_listing_without_heads(self, fs):
+        fs.client._objects[(TEST_BUCKET, "data/sub/")] = b""
+        assert fs.du(TEST_BUCKET) == 13 + 18 + 18 + 25
+        assert set(fs.client.calls) == {"list_objects"} and fs.client.calls["list_objects"] == 1
+
+
+class TestPrefixStats:
+
+    def _fs(self):
+        from cosfs.emulator import MockCosClient
+        from tests.conftest import _make_fs
+
+        objs = {(TEST_BUCKET, "top.txt"): b"t" * 3}
+        objs.update({(TEST_BUCKET, f"users/u{i}/f{j}"): b"x" * (100 * j) for i in range(4) for j in range(5)})
+        objs[(TEST_BUCKET, "users/README")] = b"r" * 1000
+        client = MockCosClient(buckets={TEST_BUCKET}, objects=objs)
+        list_objects = client.list_objects
+
+        def archive_f4(**kw):
+            kw["MaxKeys"] = 3
+            resp = list_objects(**kw)
+            for obj in resp.get("Contents", []):
+                if obj["Key"].endswith("f4"):
+                    obj["StorageClass"] = "ARCHIVE"
+            return resp
+
+        client.list_objects = archive_f4
+        return _make_fs(client)
+
+    def test_totals(self):
+        stats = self._fs().prefix_stats(f"{TEST_BUCKET}/users")
+        assert stats["count"] == 21
+        assert stats["size"] == 4 * 1000 + 1000
+        assert stats["histogram"] == {0: 4, 128: 4, 256: 4, 512: 8, 1024: 1}
+        assert stats["storage_classes"] == {"STANDARD": {"count": 17, "size": 2400 + 1000},
+                                            "ARCHIVE": {"count": 4, "size": 1600}}
+
+    def test_grouped_by_depth(self):
+        fs = self._fs()
+        groups = fs.prefix_stats(TEST_BUCKET, depth=2)
+        assert list(groups) == [TEST_BUCKET, f"{TEST_BUCKET}/users"] + [f"{TEST_BUCKET}/users/u{i}" for i in range(4)]
+        assert groups[TEST_BUCKET]["size"] == 3
+        assert groups[f"{TEST_BUCKET}/users"]["count"] == 1
+        assert all(groups[f"{TEST_BUCKET}/users/u{i}"]["size"] == 1000 for i in range(4))
+        assert sum(g["count"] for g in groups.values()) == fs.prefix_stats(TEST_BUCKET)["count"]
+
+
+# ======================================================================
+# _glob
+# ======================================================================
+
+class TestGlob:
+
+    PATTERNS = ["*", "data/*", "data/*.csv", "*/sub/*", "data/?.csv", "data/[ab].csv", "*/*/deep.json",
+                "**/*.json", "data/**", "d*/s*", "file1.txt", "missing*", "data/sub/"]
+
+    @pytest.mark.parametrize("pattern", PATTERNS)
+    def test_matches_generic_glob(self, fs, pattern):
+        expected = AbstractFileSystem.glob(fs, f"{TEST_BUCKET}/{pattern}")
+        fs.invalidate_cache()
+        assert fs.glob(f"{TEST_BUCKET}/{pattern}") == expected
+
+    def test_detail(self, fs):
+        out = fs.glob(f"{TEST_BUCKET}/d*/*", detail=True)
+        assert out[f"{TEST_BUCKET}/data/a.csv"]["size"] == 18
+        assert out[f"{TEST_BUCKET}/data/sub"]["type"] == "directory"
+
+    def test_lists_only_matching_prefixes(self):
+        from cosfs.emulator import MockCosClient
+        from tests.conftest import _make_fs
+
+        objs = {
+            (TEST_BUCKET, f"logs/2026-{m:02d}-{d:02d}/part-{i}.parquet"): b"x"
+            for m in (9, 10, 11) for d in range(1, 29) for i in range(3)
+        }
+        objs[(TEST_BUCKET, "logs/2026-10-01/_SUCCESS")] = b""
+        client = MockCosClient(buckets={TEST_BUCKET}, objects=objs)
+        prefixes = []
+        list_objects = client.list_objects
+
+        def spy(**kw):
+            prefixes.append(kw["Prefix"])
+            kw["MaxKeys"] = 10
+            return list_objects(**kw)
+
+        client.list_objects = spy
+        test_fs = _make_fs(client)
+
+        result = test_fs.glob(f"{TEST_BUCKET}/logs/2026-10-*/part-*.parquet")
+        assert len(result) == 28 * 3
+        assert all("/2026-10-" in r and r.endswith(".parquet") for r in result)
+        assert all(p.startswith("logs/2026-10-") for p in prefixes)
+        # Three pages of day prefixes, then one listing per day.
+        assert len(prefixes) == 3 + 28
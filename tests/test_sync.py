@@ -0,0 +1,155 @@
+"""Tests for incremental sync between local directories and COS."""
+
+import os
+import time
+
+import pytest
+from fsspec.callbacks import Callback
+
+from cosfs.sync import local_entries, merge, parse_last_modified
+
+from .conftest import TEST_BUCKET
+
+REMOTE = f"cosn://{TEST_BUCKET}/mirror"
+
+TREE = {
+    "a.txt": b"alpha",
+    "a-b.txt": b"dash",
+    "a/b.txt": b"nested",
+    "a/c/d.bin": b"\x00" * 100,
+    "z.txt": b"last",
+}
+
+
+def _make_tree(root, files=TREE):
+    for rel, data in files.items():
+        path = root / rel
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(data)
+
+
+def _remote_tree(fs, prefix="mirror/"):
+    return {key[len(prefix):]: fs.client._objects[(TEST_BUCKET, key)]
+            for key in fs.client._objects.keys_of(TEST_BUCKET)
+            if key.startswith(prefix) and (TEST_BUCKET, key) in fs.client._objects}
+
+
+class TestListings:
+
+    def test_local_entries_in_key_order(self, tmp_path):
+        _make_tree(tmp_path)
+        rels = [rel for rel, _ in local_entries(str(tmp_path))]
+        assert rels == sorted(TREE)
+        assert list(local_entries(str(tmp_path / "missing"))) == []
+
+    def test_merge(self):
+        src = iter([("a", 1), ("c", 3)])
+        dst = iter([("b", 2), ("c", 30), ("d", 4)])
+        assert list(merge(src, dst)) == [("a", 1, None), ("b", None, 2), ("c", 3, 30), ("d", None, 4)]
+
+    def test_parse_last_modified(self):
+        assert parse_last_modified("1970-01-02T00:00:01.000Z") == 86401.0
+        assert parse_last_modified(None) == 0.0
+
+
+class TestUpload:
+
+    def test_initial_and_noop_resync(self, fs, tmp_path):
+        _make_tree(tmp_path)
+        actions = fs.sync(str(tmp_path), REMOTE)
+        assert sorted(a["dst"] for a in actions) == sorted(f"{TEST_BUCKET}/mirror/{rel}" for rel in TREE)
+        assert _remote_tree(fs) == TREE
+
+        fs.client.calls.clear()
+        assert fs.sync(str(tmp_path), REMOTE) == []
+        assert fs.client.calls == {"list_objects": 1}
+
+    def test_changed_files_only(self, fs, tmp_path):
+        _make_tree(tmp_path)
+        fs.sync(str(tmp_path), REMOTE)
+        (tmp_path / "a" / "b.txt").write_bytes(b"nested, longer")
+        future = time.time() + 60
+        os.utime(tmp_path / "z.txt", (future, future))
+
+        fs.client.calls.clear()
+        actions = fs.sync(str(tmp_path), REMOTE)
+        assert [(a["action"], a["src"]) for a in actions] == [
+            ("upload", str(tmp_path / "a" / "b.txt")), ("upload", str(tmp_path / "z.txt"))]
+        assert fs.client.calls["upload_file"] == 2
+        assert fs.cat_file(f"{TEST_BUCKET}/mirror/a/b.txt") == b"nested, longer"
+
+    def test_checksum_ignores_touched_files(self, fs, tmp_path):
+        _make_tree(tmp_path)
+        fs.sync(str(tmp_path), REMOTE)
+        future = time.time() + 60
+        os.utime(tmp_path / "z.txt", (future, future))
+        assert fs.sync(str(tmp_path), REMOTE, checksum=True) == []
+        (tmp_path / "z.txt").write_bytes(b"LAST")
+        assert [a["src"] for a in fs.sync(str(tmp_path), REMOTE, checksum=True)] == [str(tmp_path / "z.txt")]
+
+    def test_checksum_multipart_by_crc64(self, fs, tmp_path):
+        data = bytes(range(256)) * 40
+        (tmp_path / "big.bin").write_bytes(data)
+        fs.pipe_file(f"{TEST_BUCKET}/mirror/big.bin", data, block_size=4096)  # multipart ETag
+        future = time.time() + 60
+        os.utime(tmp_path / "big.bin", (future, future))
+        fs.client.calls.clear()
+        assert fs.sync(str(tmp_path), REMOTE, checksum=True) == []
+        assert fs.client.calls["head_object"] == 1
+        (tmp_path / "big.bin").write_bytes(data[::-1])
+        assert [a["src"] for a in fs.sync(str(tmp_path), REMOTE, checksum=True)] == [str(tmp_path / "big.bin")]
+
+    def test_delete_and_dry_run(self, fs, tmp_path):
+        _make_tree(tmp_path)
+        fs.sync(str(tmp_path), REMOTE)
+        fs.pipe_file(f"{TEST_BUCKET}/mirror/extra.txt", b"stale")
+        (tmp_path / "new.txt").write_bytes(b"new")
+
+        fs.client.calls.clear()
+        planned = fs.sync(str(tmp_path), REMOTE, delete=True, dry_run=True)
+        assert [(a["action"], a["dst"]) for a in planned] == [
+            ("delete", f"{TEST_BUCKET}/mirror/extra.txt"), ("upload", f"{TEST_BUCKET}/mirror/new.txt")]
+        assert fs.client.calls == {"list_objects": 1}
+
+        assert len(fs.sync(str(tmp_path), REMOTE)) == 1  # deletions are opt-in
+        assert "extra.txt" in _remote_tree(fs)
+        fs.sync(str(tmp_path), REMOTE, delete=True)
+        assert _remote_tree(fs) == dict(TREE, **{"new.txt": b"new"})
+
+    def test_progress(self, fs, tmp_path):
+        _make_tree(tmp_path)
+        updates = []
+
+        class Progress(Callback):
+            def call(self, *args, **kwargs):
+                updates.append((self.size, self.value))
+
+        fs.sync(str(tmp_path), REMOTE, callback=Progress())
+        assert updates[-1] == (len(TREE), len(TREE))
+
+
+class TestDownload:
+
+    def test_download_and_resync(self, fs, tmp_path):
+        fs.pipe({f"{TEST_BUCKET}/mirror/{rel}": data for rel, data in TREE.items()})
+        actions = fs.sync(REMOTE, str(tmp_path))
+        assert {a["action"] for a in actions} == {"download"}
+        assert {rel: data for rel, data in TREE.items() if (tmp_path / rel).read_bytes() == data} == TREE
+        assert fs.sync(REMOTE, f"file://{tmp_path}") == []
+
+        (tmp_path / "local-only.txt").write_bytes(b"x")
+        old = time.time() - 3600
+        os.utime(tmp_path / "a.txt", (old, old))
+        fs.pipe_file(f"{TEST_BUCKET}/mirror/a.txt", b"ALPHA")
+        actions = fs.sync(REMOTE, str(tmp_path), delete=True)
+        assert [(a["action"], a["dst"]) for a in actions] == [
+            ("download", os.path.join(str(tmp_path), "a.txt")),
+            ("delete", str(tmp_path / "local-only.txt"))]
+        assert (tmp_path / "a.txt").read_bytes() == b"ALPHA"
+        assert not (tmp_path / "local-only.txt").exists()
+
+    def test_needs_one_remote_side(self, fs, tmp_path):
+        with pytest.raises(ValueError):
+            fs.sync(str(tmp_path), str(tmp_path / "other"))
+        with pytest.raises(ValueError):
+            fs.sync(REMOTE, REMOTE)
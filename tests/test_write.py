@@ -1,5 +1,8 @@
 """Tests for write operations: pipe_file, put_file, touch, open write/append."""
 
+import time
+from unittest.mock import patch
+
 import pytest
 
 from tests.conftest import TEST_BUCKET
@@ -30,7 +33,7 @@ class TestPipeFile:
         We use a tiny blocksize to force multipart even with small data.
         """
         from tests.conftest import _make_fs
-        from tests.mock_cos import MockCosClient
+        from cosfs.emulator import MockCosClient
 
         client = MockCosClient(buckets={TEST_BUCKET})
         test_fs = _make_fs(client)
@@ -44,7 +47,7 @@ class TestPipeFile:
     def test_pipe_file_multipart_abort_on_error(self, empty_fs):
         """Multipart upload failure triggers abort."""
         from tests.conftest import _make_fs
-        from tests.mock_cos import MockCosClient
+        from cosfs.emulator import MockCosClient
 
         client = MockCosClient(buckets={TEST_BUCKET})
         test_fs = _make_fs(client)
@@ -69,6 +72,14 @@ class TestPipeFile:
         # Verify the multipart upload was aborted (no pending uploads remain)
         assert len(client._pending_uploads) == 0
 
+    def test_concurrent_pipes_overlap(self, fs):
+        # Requests run on the worker pool, so they do not serialise on the IO loop.
+        fs.client.latency = 0.1
+        start = time.monotonic()
+        fs.pipe({f"{TEST_BUCKET}/many/{i}": b"x" for i in range(8)})
+        assert time.monotonic() - start < 0.5
+        assert fs.client.calls["put_object"] == 8
+
 
 # ======================================================================
 # _touch
@@ -122,6 +133,65 @@ class TestPutFile:
         assert fs.cat_file(f"{TEST_BUCKET}/dest/myfile.dat") == b"data here"
 
 
+# ======================================================================
+# Skipping unchanged uploads
+# ======================================================================
+
+class TestSkipUnchanged:
+
+    def _uploads(self, fs):
+        calls = fs.client.calls
+        return calls["put_object"] + calls["upload_file"] + calls["create_multipart_upload"]
+
+    def test_pipe_file(self, fs):
+        path = f"{TEST_BUCKET}/file1.txt"
+        fs.client.calls.clear()
+        fs.pipe_file(path, b"hello, world!", skip_unchanged=True)
+        assert self._uploads(fs) == 0 and fs.client.calls["head_object"] == 1
+        fs.pipe_file(path, b"hello, World!", skip_unchanged=True)  # same size, other content
+        fs.pipe_file(f"{TEST_BUCKET}/new.txt", b"new", skip_unchanged=True)
+        assert self._uploads(fs) == 2
+        assert fs.cat_file(path) == b"hello, World!"
+
+    def test_multipart_object_compared_by_crc64(self, fs):
+        path = f"{TEST_BUCKET}/parts.bin"
+        data = bytes(range(256)) * 10
+        fs.pipe_file(path, data, block_size=1000)
+        assert "-" in fs.info(path)["ETag"]
+        fs.client.calls.clear()
+        fs.pipe_file(path, data, block_size=1000, skip_unchanged=True)
+        assert self._uploads(fs) == 0
+
+    def test_listing_answers_without_head(self, fs):
+        fs.ls(f"{TEST_BUCKET}/data")
+        fs.client.calls.clear()
+        fs.pipe({f"{TEST_BUCKET}/data/a.csv": b"col1,col2\n1,2\n3,4\n",
+                 f"{TEST_BUCKET}/data/missing.csv": b"x"}, skip_unchanged=True)
+        assert fs.client.calls == {"put_object": 1}
+
+    def test_put_batch(self, fs, tmp_path):
+        local = [str(tmp_path / f"f{n:02d}.txt") for n in range(20)]
+        remote = [f"{TEST_BUCKET}/publish/f{n:02d}.txt" for n in range(20)]
+        for n, path in enumerate(local):
+            with open(path, "wb") as f:
+                f.write(b"%d" % n)
+        fs.put(local, remote)
+        (tmp_path / "f03.txt").write_bytes(b"changed")
+        fs.client.calls.clear()
+        fs.put(local, remote, skip_unchanged=True)
+        assert fs.client.calls["upload_file"] == 1
+        assert fs.cat_file(f"{TEST_BUCKET}/publish/f03.txt") == b"changed"
+
+    def test_default_from_attribute(self, fs, tmp_path):
+        local = tmp_path / "same.txt"
+        local.write_bytes(b"hello, world!")
+        fs.skip_unchanged = True
+        fs.put_file(str(local), f"{TEST_BUCKET}/file1.txt")
+        assert fs.client.calls["upload_file"] == 0
+        fs.put_file(str(local), f"{TEST_BUCKET}/file1.txt", skip_unchanged=False)
+        assert fs.client.calls["upload_file"] == 1
+
+
 # ======================================================================
 # COSFile: open write / append / commit / discard
 # ======================================================================
@@ -135,6 +205,46 @@ class TestOpenWrite:
             f.write(b"hello from open")
         assert fs.cat_file(path) == b"hello from open"
 
+    def test_small_write_single_put(self, fs):
+        """A file that fits in one block is written with one PUT, overwriting in place."""
+        path = f"{TEST_BUCKET}/file1.txt"
+        fs.client.calls.clear()
+        with fs.open(path, "wb") as f:
+            f.write(b"x" * 1024)
+        assert dict(fs.client.calls) == {"put_object": 1}
+        assert fs.cat_file(path) == b"x" * 1024
+
+    def test_multipart_created_lazily(self, fs):
+        path = f"{TEST_BUCKET}/parts.bin"
+        fs.client.calls.clear()
+        with fs.open(path, "wb", block_size=8) as f:
+            f.write(b"abc")
+            f.flush()
+            assert f.upload_id is None
+            f.write(b"d" * 10)
+            f.flush()
+            assert f.upload_id is not None
+            f.write(b"tail")
+        assert fs.cat_file(path) == b"abc" + b"d" * 10 + b"tail"
+        assert fs.client.calls["create_multipart_upload"] == 1
+        assert fs.client.calls["upload_part"] == 2
+        assert fs.client.calls["put_object"] == 0
+
+    def test_empty_write(self, fs):
+        path = f"{TEST_BUCKET}/empty.txt"
+        with fs.open(path, "wb"):
+            pass
+        assert fs.cat_file(path) == b""
+
+    def test_deferred_commit_uses_multipart(self, fs):
+        path = f"{TEST_BUCKET}/deferred.txt"
+        f = fs.open(path, "wb", autocommit=False)
+        f.write(b"later")
+        f.close()
+        assert not fs.exists(path)
+        f.commit()
+        assert fs.cat_file(path) == b"later"
+
     def test_open_append(self, fs):
         """Append to an existing file via fs.open() in 'ab' mode."""
         path = f"{TEST_BUCKET}/file1.txt"
@@ -152,6 +262,72 @@ class TestOpenWrite:
         assert fs.cat_file(path) == b"first chunk"
 
 
+class TestAppendWriter:
+
+    def test_position_tracked_locally(self, fs):
+        path = f"{TEST_BUCKET}/log.txt"
+        fs.client.calls.clear()
+        with fs.open(path, "ab", block_size=10) as f:
+            for i in range(5):
+                f.write(b"line %02d\n" % i)
+        assert fs.cat_file(path) == b"".join(b"line %02d\n" % i for i in range(5))
+        # One HEAD for the starting position, then appends only.
+        assert fs.client.calls["head_object"] == 1
+        assert fs.client.calls["append_object"] == 3
+        assert fs.client.calls["object_exists"] == 0
+
+    def test_start_position_from_listing(self, fs):
+        path = f"{TEST_BUCKET}/file1.txt"
+        fs.ls(TEST_BUCKET)
+        fs.client.calls.clear()
+        with fs.open(path, "ab") as f:
+            f.write(b"!")
+        assert dict(fs.client.calls) == {"append_object": 1}
+        assert fs.cat_file(path) == b"hello, world!!"
+
+    def test_resync_after_concurrent_append(self, fs):
+        path = f"{TEST_BUCKET}/file1.txt"
+        with fs.open(path, "ab", block_size=4) as f:
+            f.write(b" one")
+            fs.client.append_object(Bucket=TEST_BUCKET, Key="file1.txt", Position=17, Data=b" other")
+            f.write(b" two")
+        assert fs.cat_file(path) == b"hello, world! one other two"
+
+    def test_stale_position_fails_after_one_resync(self, fs):
+        path = f"{TEST_BUCKET}/file1.txt"
+        f = fs.open(path, "ab")
+        f.write(b"x")
+        with patch.object(f, "_object_length", return_value=0):
+            f.offset = 0
+            with pytest.raises(OSError):
+                f.flush(force=True)
+
+    def test_flush_interval(self, fs):
+        path = f"{TEST_BUCKET}/timed.log"
+        with fs.open(path, "ab", flush_interval=60) as f:
+            f.write(b"a")
+            f.flush()
+            assert fs.client.calls["append_object"] == 0
+            f.flush_interval = 0
+            f.write(b"b")
+            assert fs.client.calls["append_object"] == 1
+            assert fs.cat_file(path) == b"ab"
+        assert fs.client.calls["append_object"] == 1
+
+    def test_flush_interval_idle_writer(self, fs):
+        path = f"{TEST_BUCKET}/idle.log"
+        with fs.open(path, "ab", flush_interval=0.05) as f:
+            f.write(b"a")
+            deadline = time.monotonic() + 5
+            while fs.client.calls["append_object"] == 0 and time.monotonic() < deadline:
+                time.sleep(0.01)
+            assert fs.client.calls["append_object"] == 1
+            assert fs.cat_file(path) == b"a"
+            f.write(b"b")
+        assert fs.client.calls["append_object"] == 2
+        assert fs.cat_file(path) == b"ab"
+
+
 class TestCOSFile:
 
     def test_cosfile_discard(self, fs):